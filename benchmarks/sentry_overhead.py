@@ -0,0 +1,178 @@
+"""
+Накладные расходы Sentry на запрос при разных долях трассировки и профилирования.
+
+Запросы выполняются в процессе через WSGI-приложение Django (так же, как в gunicorn,
+включая обертку интеграции Sentry) на временной базе SQLite. События не уходят в сеть:
+``sentry_sdk.init`` получает транспорт, который только считает конверты.
+
+Сначала измеряется запрос без Sentry, затем уровни из ``LEVELS``: политика по умолчанию
+из настроек (musicTrainee.sentry) и фиксированные доли. Профили короче нескольких
+миллисекунд SDK отбрасывает, поэтому для быстрых эндпоинтов они не попадают в счетчик.
+
+    cd musicTrainee
+    python ../benchmarks/sentry_overhead.py --path /api/catalog/ --requests 2000
+"""
+
+import argparse
+import io
+import os
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter
+
+BASE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'musicTrainee')
+sys.path.insert(0, BASE_DIR)
+
+TEMP_DIR = tempfile.mkdtemp(prefix='sentry-bench-')
+os.environ.update({
+    'DJANGO_SETTINGS_MODULE': 'musicTrainee.settings',
+    'DB_ENGINE': 'django.db.backends.sqlite3',
+    'DB_NAME': os.path.join(TEMP_DIR, 'db.sqlite3'),
+    'CACHE_BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    'CACHE_LOCATION': 'sentry-bench',
+    'LOGLEVEL': 'WARNING',
+    # Sentry инициализируется ниже для каждого уровня
+    'SENTRY_DSN': '',
+})
+
+import django  # noqa: E402
+
+django.setup()
+
+import sentry_sdk  # noqa: E402
+from django.conf import settings  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.core.wsgi import get_wsgi_application  # noqa: E402
+from sentry_sdk.transport import Transport  # noqa: E402
+
+from musicTrainee.sentry import django_integration, traces_sampler  # noqa: E402
+
+DUMMY_DSN = 'https://public@sentry.invalid/1'
+
+# Название, доля трассировки (None - traces_sampler из настроек), доля профилирования
+LEVELS = [
+    ('policy (settings)', None, settings.SENTRY_PROFILES_SAMPLE_RATE),
+    ('traces 0', 0.0, 0.0),
+    ('traces 0.01', 0.01, 0.0),
+    ('traces 0.1', 0.1, 0.0),
+    ('traces 1.0', 1.0, 0.0),
+    ('traces 1.0 + profiles 1.0', 1.0, 1.0),
+]
+
+
+class CountingTransport(Transport):
+    """
+    Транспорт, который считает конверты по типу элементов вместо отправки.
+    """
+
+    def __init__(self, options=None):
+        super().__init__(options)
+        self.counts = Counter()
+
+    def capture_envelope(self, envelope):
+        for item in envelope.items:
+            self.counts[item.type or 'unknown'] += 1
+
+
+def seed():
+    call_command('migrate', verbosity=0)
+    from accounts.models import CustomAccount
+    from accounts.serializers import AccountTokenObtainPairSerializer
+    from catalog.perfdata import Fanout, generate_perf_data
+
+    generate_perf_data(Fanout(
+        users=100, creators=2, courses=10, drafts=0, modules=3, lessons=3, enrollments=20, ratings=10,
+        submissions=5, reviews=2, comments=2,
+    ), prefix='bench')
+    user = CustomAccount.objects.get(username='bench-student-0')
+    return str(AccountTokenObtainPairSerializer.get_token(user).access_token)
+
+
+def make_environ(path: str, token: str) -> dict:
+    path, _, query = path.partition('?')
+    return {
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': path,
+        'QUERY_STRING': query,
+        'SCRIPT_NAME': '',
+        'SERVER_NAME': '127.0.0.1',
+        'SERVER_PORT': '8001',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': '127.0.0.1',
+        'HTTP_ACCEPT': 'application/json',
+        'HTTP_AUTHORIZATION': f'Bearer {token}',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': False,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+
+
+def measure(application, path: str, token: str, requests: int, warmup: int) -> list:
+    statuses = Counter()
+
+    def start_response(status, headers, exc_info=None):
+        statuses[status.split()[0]] += 1
+
+    durations = []
+    for index in range(warmup + requests):
+        started = time.perf_counter()
+        response = application(make_environ(path, token), start_response)
+        b''.join(response)
+        if hasattr(response, 'close'):
+            response.close()
+        if index >= warmup:
+            durations.append(time.perf_counter() - started)
+    if set(statuses) != {'200'}:
+        raise SystemExit(f'Unexpected responses for {path}: {dict(statuses)}')
+    return durations
+
+
+def report(name: str, durations: list, baseline, counts=None) -> None:
+    mean = statistics.fmean(durations) * 1e6
+    p95 = sorted(durations)[int(len(durations) * 0.95)] * 1e6
+    overhead = f'{(mean / baseline - 1) * 100:+6.1f}%' if baseline else '     -'
+    sent = ', '.join(f'{kind}={count}' for kind, count in sorted((counts or {}).items())) or '-'
+    print(f'{name:<28} {mean:9.1f} {p95:9.1f} {overhead:>8}   {sent}')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Per-request overhead of Sentry sampling levels.')
+    parser.add_argument('--path', default='/api/catalog/', help='Endpoint to request')
+    parser.add_argument('--requests', type=int, default=1000, help='Measured requests per level')
+    parser.add_argument('--warmup', type=int, default=100, help='Warmup requests per level')
+    args = parser.parse_args()
+
+    token = seed()
+    application = get_wsgi_application()
+
+    print(f'{args.path}, {args.requests} requests per level')
+    print(f'{"level":<28} {"mean us":>9} {"p95 us":>9} {"overhead":>8}   sent envelopes items')
+    baseline_durations = measure(application, args.path, token, args.requests, args.warmup)
+    baseline = statistics.fmean(baseline_durations) * 1e6
+    report('no sentry', baseline_durations, None)
+
+    for name, traces_rate, profiles_rate in LEVELS:
+        transport = CountingTransport()
+        options = {'traces_sampler': traces_sampler} if traces_rate is None else {'traces_sample_rate': traces_rate}
+        sentry_sdk.init(
+            dsn=DUMMY_DSN,
+            transport=transport,
+            integrations=[django_integration()],
+            profiles_sample_rate=profiles_rate,
+            **options,
+        )
+        durations = measure(application, args.path, token, args.requests, args.warmup)
+        sentry_sdk.flush()
+        report(name, durations, baseline, transport.counts)
+
+    sentry_sdk.init(dsn=None)
+
+
+if __name__ == '__main__':
+    main()
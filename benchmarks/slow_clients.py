@@ -0,0 +1,140 @@
+"""
+Сравнение синхронного (WSGI) и асинхронного (ASGI) развертывания под медленными клиентами.
+
+Скрипт открывает ``--slow`` соединений, которые передают заголовки запроса по одному байту
+с паузой ``--interval`` (медленный клиент на плохой сети), и одновременно измеряет задержку
+``--requests`` обычных запросов к ``--url``. Синхронный воркер gunicorn занят медленным
+клиентом, пока тот не дочитает запрос, поэтому при ``--slow`` не меньше числа воркеров
+обычные запросы ждут или отваливаются по таймауту. Воркер uvicorn читает запросы
+в цикле событий и продолжает обслуживать остальных клиентов.
+
+Серверы запускаются рядом из каталога musicTrainee, без nginx перед ними
+(nginx сам буферизует медленных клиентов):
+
+    gunicorn musicTrainee.wsgi:application --workers 4 --bind 127.0.0.1:8001
+    gunicorn musicTrainee.asgi:application --workers 4 --worker-class uvicorn_worker.UvicornWorker \\
+        --bind 127.0.0.1:8002
+
+    python ../benchmarks/slow_clients.py --url http://127.0.0.1:8001/api/catalog/ --token <access>
+    python ../benchmarks/slow_clients.py --url http://127.0.0.1:8002/api/catalog/ --token <access>
+
+Токен доступа выдает ``POST /api/token/``. Скрипт использует только стандартную библиотеку.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from urllib.parse import urlsplit
+
+
+def build_request(host: str, path: str, token: str = '') -> bytes:
+    lines = [f'GET {path} HTTP/1.1', f'Host: {host}', 'Accept: application/json', 'Connection: close']
+    if token:
+        lines.append(f'Authorization: Bearer {token}')
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode('ascii')
+
+
+async def slow_client(host: str, port: int, path: str, interval: float, stop: asyncio.Event) -> None:
+    """
+    Держит соединение, передавая заголовки по байту, пока не установлен ``stop``.
+    Запрос не завершается: после основных заголовков идет бесконечный заголовок-заполнитель.
+    """
+    try:
+        reader, writer = await asyncio.open_connection(host, port)
+    except OSError:
+        return
+    head = build_request(f'{host}:{port}', path)[:-2] + b'X-Padding: '
+    try:
+        position = 0
+        while not stop.is_set():
+            byte = head[position:position + 1] or b'a'
+            position += 1
+            writer.write(byte)
+            await writer.drain()
+            await asyncio.sleep(interval)
+    except (ConnectionError, OSError):
+        pass
+    finally:
+        writer.close()
+
+
+async def fetch(host: str, port: int, request: bytes, timeout: float):
+    """
+    Выполняет один запрос.
+
+    :return: Код ответа и время в секундах; код None, если соединение не удалось или истек таймаут.
+    """
+    started = time.perf_counter()
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+        try:
+            writer.write(request)
+            await writer.drain()
+            response = await asyncio.wait_for(reader.read(), timeout - (time.perf_counter() - started))
+        finally:
+            writer.close()
+    except (asyncio.TimeoutError, ConnectionError, OSError):
+        return None, time.perf_counter() - started
+    status_line = response.split(b'\r\n', 1)[0].split()
+    status = int(status_line[1]) if len(status_line) > 1 and status_line[1].isdigit() else None
+    return status, time.perf_counter() - started
+
+
+def percentile(values, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def run(args) -> None:
+    url = urlsplit(args.url)
+    host, port = url.hostname, url.port or 80
+    path = url.path + (f'?{url.query}' if url.query else '')
+    request = build_request(f'{host}:{port}', path, args.token)
+
+    stop = asyncio.Event()
+    slow = [asyncio.create_task(slow_client(host, port, path, args.interval, stop)) for _ in range(args.slow)]
+    await asyncio.sleep(args.warmup)
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def probe():
+        async with semaphore:
+            return await fetch(host, port, request, args.timeout)
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(probe() for _ in range(args.requests)))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await asyncio.gather(*slow, return_exceptions=True)
+
+    ok = [duration for status, duration in results if status == 200]
+    failed = len(results) - len(ok)
+    statuses = sorted({str(status) for status, _ in results if status not in (200, None)})
+    print(f'url:            {args.url}')
+    print(f'slow clients:   {args.slow} (1 byte / {args.interval}s)')
+    print(f'requests:       {len(results)} at concurrency {args.concurrency}, {elapsed:.2f}s total')
+    print(f'ok:             {len(ok)} ({len(ok) / elapsed:.1f} req/s)')
+    print(f'failed/timeout: {failed}' + (f' (statuses: {", ".join(statuses)})' if statuses else ''))
+    if ok:
+        print(f'latency p50:    {statistics.median(ok) * 1000:.1f} ms')
+        print(f'latency p95:    {percentile(ok, 0.95) * 1000:.1f} ms')
+        print(f'latency max:    {max(ok) * 1000:.1f} ms')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Latency of regular requests while slow clients hold connections.')
+    parser.add_argument('--url', required=True, help='Endpoint to probe, e.g. http://127.0.0.1:8001/api/catalog/')
+    parser.add_argument('--token', default='', help='JWT access token for authenticated endpoints')
+    parser.add_argument('--slow', type=int, default=16, help='Number of slow clients')
+    parser.add_argument('--interval', type=float, default=0.5, help='Pause between bytes sent by a slow client')
+    parser.add_argument('--requests', type=int, default=200, help='Number of regular requests')
+    parser.add_argument('--concurrency', type=int, default=8, help='Concurrent regular requests')
+    parser.add_argument('--timeout', type=float, default=5.0, help='Timeout of a regular request, seconds')
+    parser.add_argument('--warmup', type=float, default=1.0, help='Delay before probing, seconds')
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
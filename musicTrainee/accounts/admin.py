@@ -3,6 +3,8 @@ from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.admin import UserAdmin
 
+from accounts.models import OutboundEmail
+
 user_model = get_user_model()
 # print("Кастомная модель пользователя:", user_model)
 
@@ -27,4 +29,11 @@ class AccountAdmin(admin.ModelAdmin):
 
 # @admin.site.register(user_model)
 # class AccountAdmin(UserAdmin):
-    # ordering = 'username'
\ No newline at end of file
+    # ordering = 'username'
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ('to_email', 'subject', 'kind', 'status', 'attempts', 'created_at', 'sent_at')
+    list_filter = ('status', 'kind')
+    search_fields = ('to_email',)
+    readonly_fields = ('created_at', 'sent_at', 'last_error')
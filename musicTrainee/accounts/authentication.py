@@ -0,0 +1,172 @@
+"""
+Аутентификация по JWT без запроса пользователя к базе.
+
+Токен доступа содержит подписанные claims ``user_id``, ``is_moderator``, ``is_activated`` и ``is_staff``
+(добавляются в AccountTokenObtainPairSerializer). По ним строится ``LazyAccount``:
+проверки прав и фильтры по ``request.user`` работают без SELECT, а строка CustomAccount
+загружается только при обращении к остальным полям.
+
+При выходе, сбросе пароля, блокировке (``is_active=False``) и удалении пользователя в таблицу
+TokenRevocation записывается время отзыва его токенов: токены, выданные раньше, отклоняются
+при аутентификации и обновлении. Время отзыва читается из общего кэша без локального уровня
+(отзыв действует сразу во всех воркерах), при промахе - из таблицы, так что вытеснение
+записи из кэша не возвращает силу отозванным токенам. Время выдачи сравнивается по claim
+``issued_at`` с точностью до микросекунд, поэтому токен, полученный сразу после выхода, принимается.
+Роли перечитываются из базы при обновлении токена доступа (AccountTokenRefreshSerializer),
+поэтому их изменение вступает в силу не позже чем через ACCESS_TOKEN_LIFETIME.
+"""
+
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, pre_save
+from django.dispatch import receiver
+from django.utils.functional import LazyObject, empty
+from rest_framework import exceptions
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import CustomAccount, TokenRevocation
+
+# Claims, по которым пользователь строится без запроса к базе
+TOKEN_USER_CLAIMS = ('is_moderator', 'is_activated', 'is_staff')
+# Время выдачи токена с дробной частью: стандартный iat хранится в целых секундах
+ISSUED_AT_CLAIM = 'issued_at'
+
+
+def _revocation_key(user_id) -> str:
+    return f'jwt-revoked:{user_id}'
+
+
+def revoke_user_tokens(user_id) -> None:
+    """
+    Отзывает все токены пользователя, выданные до текущего момента.
+    Запись в кэше живет столько же, сколько токен обновления, после этого старые токены истекают сами.
+
+    :param user_id: Идентификатор пользователя.
+    """
+    revoked_at = time.time()
+    TokenRevocation.objects.bulk_create(
+        [TokenRevocation(user_id=user_id, revoked_at=revoked_at)],
+        update_conflicts=True, unique_fields=['user_id'], update_fields=['revoked_at'],
+    )
+    # Время пишется в кэш сразу и повторно после коммита: чтение таблицы параллельным запросом
+    # до коммита не должно оставить в кэше время предыдущего отзыва
+    lifetime = int(api_settings.REFRESH_TOKEN_LIFETIME.total_seconds())
+    key = _revocation_key(user_id)
+    cache.set(key, revoked_at, lifetime)
+    transaction.on_commit(lambda: cache.set(key, revoked_at, lifetime))
+
+
+def get_revoked_at(user_id) -> float:
+    """
+    Время последнего отзыва токенов пользователя или 0, если токены не отзывались.
+    """
+    key = _revocation_key(user_id)
+    revoked_at = cache.get(key)
+    if revoked_at is None:
+        revoked_at = TokenRevocation.objects.filter(user_id=user_id).values_list('revoked_at', flat=True).first()
+        # add не затирает отзыв, записанный в кэш после чтения таблицы
+        cache.add(key, revoked_at or 0, getattr(settings, 'CACHE_DEFAULT_TIMEOUT', 300))
+    return revoked_at or 0
+
+
+def is_token_revoked(token) -> bool:
+    """
+    Выдан ли токен (доступа или обновления) раньше последнего отзыва токенов пользователя.
+    """
+    user_id = token.get(api_settings.USER_ID_CLAIM)
+    if user_id is None:
+        return False
+    revoked_at = get_revoked_at(CustomAccount._meta.pk.to_python(user_id))
+    if not revoked_at:
+        return False
+    if ISSUED_AT_CLAIM in token:
+        return token[ISSUED_AT_CLAIM] <= revoked_at
+    # У токенов без issued_at iat округлен до секунды: выданные в секунду отзыва тоже отзываются
+    return token.get('iat', 0) <= int(revoked_at)
+
+
+@receiver(pre_save, sender=CustomAccount)
+def revoke_deactivated_user_tokens(sender, instance, **kwargs):
+    if instance.pk and not instance.is_active and 'is_active' in instance.get_dirty_fields():
+        revoke_user_tokens(instance.pk)
+
+
+@receiver(post_delete, sender=CustomAccount)
+def revoke_deleted_user_tokens(sender, instance, **kwargs):
+    revoke_user_tokens(instance.pk)
+
+
+class LazyAccount(LazyObject):
+    """
+    Пользователь из claims токена. ``id``, ``pk``, роли и признаки аутентификации
+    берутся из токена, остальные атрибуты загружают CustomAccount.
+
+    Объект выдает себя за CustomAccount (``isinstance``), поэтому его можно передавать
+    в фильтры и внешние ключи: для них нужен только ``pk``.
+    """
+
+    def __init__(self, claims: dict):
+        super().__init__()
+        self.__dict__['_claims'] = claims
+
+    def _setup(self):
+        try:
+            self._wrapped = CustomAccount.objects.get(pk=self._claims[api_settings.USER_ID_CLAIM])
+        except CustomAccount.DoesNotExist:
+            raise exceptions.AuthenticationFailed('User not found', code='user_not_found')
+
+    @property
+    def __class__(self):
+        return CustomAccount
+
+    def __bool__(self):
+        # IsAuthenticated проверяет ``request.user`` на истинность до is_authenticated
+        return True
+
+    def __getattr__(self, name):
+        if self._wrapped is empty:
+            claims = self.__dict__['_claims']
+            if name in ('id', 'pk'):
+                # simplejwt хранит user_id строкой
+                return CustomAccount._meta.pk.to_python(claims[api_settings.USER_ID_CLAIM])
+            if name == '_meta':
+                return CustomAccount._meta
+            if name in TOKEN_USER_CLAIMS:
+                return claims[name]
+            if name == 'is_authenticated':
+                return True
+            if name == 'is_anonymous':
+                return False
+            # hasattr(user, 'resolve_expression') в фильтрах ORM не должен загружать пользователя
+            if not name.startswith('_') and not hasattr(CustomAccount, name):
+                raise AttributeError(name)
+        return super().__getattr__(name)
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication, которая не загружает пользователя из базы.
+
+    Токены без claims из ``TOKEN_USER_CLAIMS`` (выданные до их появления) обрабатываются
+    как в JWTAuthentication, с запросом пользователя.
+    """
+
+    def get_validated_token(self, raw_token):
+        token = super().get_validated_token(raw_token)
+        if is_token_revoked(token):
+            raise exceptions.AuthenticationFailed('Token is revoked', code='token_revoked')
+        return token
+
+    def get_user(self, validated_token):
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise exceptions.AuthenticationFailed('Token contained no recognizable user identification')
+        if not all(claim in validated_token for claim in TOKEN_USER_CLAIMS):
+            return super().get_user(validated_token)
+        return LazyAccount({
+            api_settings.USER_ID_CLAIM: validated_token[api_settings.USER_ID_CLAIM],
+            **{claim: validated_token[claim] for claim in TOKEN_USER_CLAIMS},
+        })
@@ -1,12 +1,16 @@
 """
 Этот модуль предоставляет общие функциональные возможности, используемые другими модулями.
+
+Письма не отправляются в запросе, а ставятся в очередь accounts.outbox.
 """
 
 import secrets
 import string
 
 from django.conf import settings
-from django.core.mail import send_mail
+
+from accounts.models import OutboundEmail
+from accounts.outbox import enqueue_email
 
 # from musicTrainee import settings
 
@@ -23,7 +27,7 @@ def generate_reset_code(length=6):
 
 def send_reset_code_email(email, reset_code):
     """
-    Функция отправления письма с кодом восстановления на указанную почту.
+    Функция постановки в очередь письма с кодом восстановления на указанную почту.
 
     :param email: Почта пользователя.
     :param reset_code: Код восстановления.
@@ -34,18 +38,12 @@ def send_reset_code_email(email, reset_code):
                )
     # from_email = settings.EMAIL_HOST_USER
     from_email = 'pyaninyury@yandex.ru'
-    recipient_list = [email]
-    send_mail(
-        subject=subject,
-        message=message,
-        from_email=from_email,
-        recipient_list=recipient_list,
-    )
+    enqueue_email(email, subject, message, kind=OutboundEmail.KIND_RESET, from_email=from_email)
 
 
 def send_confirm_code_email(email, confirm_code):
     """
-    Функция отправления письма с кодом восстановления на указанную почту.
+    Функция постановки в очередь письма с кодом подтверждения на указанную почту.
 
     :param confirm_code: Код подтверждения
     :param email: Почта пользователя.
@@ -55,10 +53,4 @@ def send_confirm_code_email(email, confirm_code):
                f'Ваш код для подтверждения учетной пароля: {confirm_code}'
                )
     from_email = settings.EMAIL_HOST_USER
-    recipient_list = [email]
-    send_mail(
-        subject=subject,
-        message=message,
-        from_email=from_email,
-        recipient_list=recipient_list,
-    )
+    enqueue_email(email, subject, message, kind=OutboundEmail.KIND_CONFIRM, from_email=from_email)
@@ -0,0 +1,41 @@
+from django.core.management import BaseCommand
+from django.utils import timezone
+
+from accounts.models import OutboundEmail, PasswordResetRequest
+from accounts.outbox import expire_code_emails, finished_emails
+
+
+class Command(BaseCommand):
+    help = 'Delete expired confirmation and password reset codes and finished outbox emails in bounded batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows deleted per query')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        now = timezone.now()
+
+        deleted = self.delete_in_batches(PasswordResetRequest.objects.filter(expires_at__lte=now), batch_size)
+
+        # Письма с истекшими кодами не отправляются, их текст с кодом стирается
+        expired = sum(
+            expire_code_emails(kind, PasswordResetRequest.get_ttl(kind))
+            for kind in (OutboundEmail.KIND_CONFIRM, OutboundEmail.KIND_RESET)
+        )
+        emails = self.delete_in_batches(finished_emails(), batch_size)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully deleted {deleted} expired codes and {emails} finished emails, '
+            f'cancelled {expired} emails with expired codes'
+        ))
+
+    @staticmethod
+    def delete_in_batches(queryset, batch_size: int) -> int:
+        deleted = 0
+        while True:
+            # Выборка по индексу, удаление по первичному ключу: короткие транзакции без долгих блокировок
+            ids = list(queryset.values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                break
+            deleted += queryset.model.objects.filter(pk__in=ids).delete()[0]
+        return deleted
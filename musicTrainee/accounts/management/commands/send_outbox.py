@@ -0,0 +1,55 @@
+import time
+
+from django.core.mail import get_connection
+from django.core.management import BaseCommand
+
+from accounts.outbox import claim_batch, deliver_batch, release_batch
+
+
+class Command(BaseCommand):
+    help = 'Send queued emails from the outbox in batches over one mail server connection'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50, help='Emails claimed at once')
+        parser.add_argument('--loop', action='store_true', help='Keep polling the outbox instead of exiting')
+        parser.add_argument('--interval', type=float, default=5, help='Seconds between polls of an empty outbox')
+
+    def handle(self, *args, **options):
+        total_sent = total_failed = 0
+        while True:
+            sent, failed = self.drain(options['batch_size'])
+            total_sent += sent
+            total_failed += failed
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS(f'Successfully sent {total_sent} emails, {total_failed} failed'))
+
+    def drain(self, batch_size: int) -> tuple:
+        """
+        Отправляет письма, пока очередь не опустеет; соединение открывается только при наличии писем.
+        """
+        sent = failed = 0
+        mail_connection = None
+        try:
+            while True:
+                batch = claim_batch(batch_size)
+                if not batch:
+                    break
+                if mail_connection is None:
+                    mail_connection = get_connection()
+                    try:
+                        mail_connection.open()
+                    except Exception as error:
+                        release_batch(batch)
+                        mail_connection = None
+                        self.stderr.write(f'Mail server is unavailable: {error}')
+                        break
+                batch_sent, batch_failed = deliver_batch(batch, mail_connection)
+                sent += batch_sent
+                failed += batch_failed
+        finally:
+            if mail_connection is not None:
+                mail_connection.close()
+        return sent, failed
@@ -0,0 +1,91 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils.crypto import salted_hmac
+
+
+def _hash_code(value):
+    return salted_hmac('accounts.PasswordResetRequest', value, algorithm='sha256').hexdigest()
+
+
+def hash_existing_codes(apps, schema_editor):
+    """
+    Переводит выданные коды в хешированный вид. Вид кода определяется по тому,
+    подтвердил ли пользователь почту; от нескольких кодов почты остается последний.
+    """
+    PasswordResetRequest = apps.get_model('accounts', 'PasswordResetRequest')
+    CustomAccount = apps.get_model('accounts', 'CustomAccount')
+    unconfirmed = set(CustomAccount.objects.filter(is_activated=False).values_list('email', flat=True))
+
+    latest = {}
+    for request in PasswordResetRequest.objects.order_by('created_at', 'id'):
+        kind = 'confirm' if request.email in unconfirmed else 'reset'
+        latest[(request.email, kind)] = (request, kind)
+    PasswordResetRequest.objects.exclude(pk__in=[request.pk for request, _ in latest.values()]).delete()
+
+    for request, kind in latest.values():
+        if kind == 'reset':
+            ttl = getattr(settings, 'RESET_CODE_TTL', 15 * 60)
+        else:
+            ttl = getattr(settings, 'CONFIRM_CODE_TTL', 24 * 60 * 60)
+        request.kind = kind
+        request.code_hash = _hash_code(f'{kind}:{request.email.lower()}:{request.reset_code}')
+        request.lookup_hash = _hash_code(f'{kind}:{request.reset_code}')
+        request.expires_at = request.created_at + timedelta(seconds=ttl)
+        request.save(update_fields=['kind', 'code_hash', 'lookup_hash', 'expires_at'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_outbound_email'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='passwordresetrequest',
+            name='kind',
+            field=models.CharField(choices=[('confirm', 'Account confirmation'), ('reset', 'Password reset')], default='confirm', max_length=16),
+        ),
+        migrations.AddField(
+            model_name='passwordresetrequest',
+            name='code_hash',
+            field=models.CharField(max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='passwordresetrequest',
+            name='lookup_hash',
+            field=models.CharField(max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='passwordresetrequest',
+            name='expires_at',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.RunPython(hash_existing_codes, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='passwordresetrequest',
+            name='reset_code',
+        ),
+        migrations.AlterField(
+            model_name='passwordresetrequest',
+            name='email',
+            field=models.EmailField(db_index=True, max_length=254),
+        ),
+        migrations.AlterField(
+            model_name='passwordresetrequest',
+            name='code_hash',
+            field=models.CharField(max_length=64, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='passwordresetrequest',
+            name='lookup_hash',
+            field=models.CharField(db_index=True, max_length=64),
+        ),
+        migrations.AlterField(
+            model_name='passwordresetrequest',
+            name='expires_at',
+            field=models.DateTimeField(db_index=True),
+        ),
+    ]
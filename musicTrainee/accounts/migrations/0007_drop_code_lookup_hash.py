@@ -0,0 +1,17 @@
+# Generated by Django 5.0.14 on 2026-10-18 05:56
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_hashed_reset_codes'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='passwordresetrequest',
+            name='lookup_hash',
+        ),
+    ]
@@ -1,13 +1,20 @@
 import os.path
+from datetime import timedelta
 from typing import TYPE_CHECKING
 
 from dirtyfields import DirtyFieldsMixin
 from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import models, transaction
 from django.db.models import Manager
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.crypto import salted_hmac
 from django.conf import settings
 
+from musicTrainee.cache import bump_generation, user_scope
+
 
 def user_avatar_path(instance: AbstractUser, filename: str) -> str:
     """
@@ -94,16 +101,147 @@ class CustomAccount(AbstractUser, DirtyFieldsMixin):
         super().save(*args, **kwargs)
 
 
+def hash_code(value: str) -> str:
+    """
+    HMAC кода подтверждения на SECRET_KEY: в базе коды хранятся только в таком виде.
+    """
+    return salted_hmac('accounts.PasswordResetRequest', value, algorithm='sha256').hexdigest()
+
+
 class PasswordResetRequest(models.Model):
     """
-    Модель для сброса пароля.
+    Модель кода подтверждения почты или сброса пароля.
+
+    Код хранится в виде HMAC по виду, почте и коду (``code_hash``, уникальный индекс),
+    поэтому найти его можно только вместе с почтой, на которую он отправлен.
+    Просроченные коды удаляет команда purge_reset_codes.
     """
-    email = models.EmailField(max_length=254)
-    reset_code = models.CharField(max_length=100)
+    KIND_CONFIRM = 'confirm'
+    KIND_RESET = 'reset'
+    KIND_CHOICES = [
+        (KIND_CONFIRM, 'Account confirmation'),
+        (KIND_RESET, 'Password reset'),
+    ]
+
+    email = models.EmailField(max_length=254, db_index=True)
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES, default=KIND_CONFIRM)
+    code_hash = models.CharField(max_length=64, unique=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
 
     def __str__(self):
         return f"Password reset request for {self.email}"
 
     if TYPE_CHECKING:
         objects: Manager
+
+    @staticmethod
+    def get_ttl(kind: str) -> int:
+        if kind == PasswordResetRequest.KIND_RESET:
+            return getattr(settings, 'RESET_CODE_TTL', 15 * 60)
+        return getattr(settings, 'CONFIRM_CODE_TTL', 24 * 60 * 60)
+
+    @classmethod
+    def issue(cls, email: str, kind: str, code: str) -> "PasswordResetRequest":
+        """
+        Сохраняет новый код для почты, заменяя выданные ранее коды того же вида.
+
+        :param email: Почта пользователя.
+        :param kind: Вид кода (KIND_CONFIRM или KIND_RESET).
+        :param code: Код в открытом виде, отправляется пользователю и не сохраняется.
+        :return: Запрос с кодом.
+        """
+        with transaction.atomic():
+            cls.objects.filter(email=email, kind=kind).delete()
+            return cls.objects.create(
+                email=email,
+                kind=kind,
+                code_hash=hash_code(f'{kind}:{email.lower()}:{code}'),
+                expires_at=timezone.now() + timedelta(seconds=cls.get_ttl(kind)),
+            )
+
+    @classmethod
+    def lookup(cls, code: str, kind: str, email: str) -> "PasswordResetRequest":
+        """
+        Находит действующий код почты по уникальному индексу.
+
+        :raises PasswordResetRequest.DoesNotExist: Код неверный или просрочен.
+        """
+        return cls.objects.get(
+            code_hash=hash_code(f'{kind}:{email.lower()}:{code}'),
+            kind=kind,
+            expires_at__gt=timezone.now(),
+        )
+
+
+class OutboundEmail(models.Model):
+    """
+    Письмо в очереди отправки (accounts.outbox).
+    Записывается в транзакции запроса и отправляется командой send_outbox.
+    Текст стирается после отправки или окончательной неудачи, старые письма удаляет purge_reset_codes.
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_SENT, 'Sent'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    KIND_CONFIRM = 'confirm'
+    KIND_RESET = 'reset'
+
+    kind = models.CharField(max_length=32, blank=True)
+    to_email = models.EmailField(max_length=254)
+    from_email = models.CharField(max_length=254, blank=True)
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # Время следующей попытки; при выдаче письма отправителю сдвигается на время аренды
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Выборка писем к отправке
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx'),
+            # Проверка паузы между повторными письмами
+            models.Index(fields=['to_email', 'kind', 'created_at'], name='outbox_recent_idx'),
+        ]
+
+    if TYPE_CHECKING:
+        objects: Manager
+
+    def __str__(self):
+        return f"{self.subject} -> {self.to_email}"
+
+
+class TokenRevocation(models.Model):
+    """
+    Время последнего отзыва JWT пользователя (accounts.authentication).
+
+    Кэш только ускоряет проверку: вытесненная из него запись перечитывается отсюда,
+    поэтому отозванные токены не начинают снова приниматься. Пользователь хранится
+    идентификатором, а не внешним ключом: запись должна пережить удаление пользователя.
+    """
+    user_id = models.BigIntegerField(unique=True)
+    # Время отзыва в секундах (time.time()), сравнивается с claim issued_at
+    revoked_at = models.FloatField()
+
+    def __str__(self):
+        return f"Tokens of user {self.user_id} revoked at {self.revoked_at}"
+
+    if TYPE_CHECKING:
+        objects: Manager
+
+
+@receiver(post_save, sender=CustomAccount)
+@receiver(post_delete, sender=CustomAccount)
+def invalidate_profile_cache(sender, instance, **kwargs):
+    scope = user_scope(instance.pk)
+    bump_generation(scope)
+    transaction.on_commit(lambda: bump_generation(scope))
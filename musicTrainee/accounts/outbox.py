@@ -0,0 +1,204 @@
+"""
+Очередь исходящих писем.
+
+Запрос только записывает письмо в таблицу OutboundEmail в своей транзакции, поэтому
+медленный или недоступный SMTP не задерживает и не ломает запрос. Команда
+``send_outbox`` забирает письма пачками и отправляет их через одно соединение
+с почтовым сервером; неудачные отправки повторяются с экспоненциальной задержкой.
+
+Параллельные отправители не получают одни и те же письма: выданное письмо арендуется
+сдвигом ``next_attempt_at`` на ``OUTBOX_LEASE_SECONDS`` так же, как ответы в catalog.reviews.
+
+Текст письма с кодом нужен только до отправки: после отправки, окончательной неудачи или
+истечения кода он стирается, а завершенные письма удаляет команда ``purge_reset_codes``.
+"""
+
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage
+from django.db import connection, transaction
+from django.db.models import Count, Min
+from django.utils import timezone
+
+from musicTrainee.timing import timed
+from .models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+
+def _setting(name: str, default: int) -> int:
+    return getattr(settings, name, default)
+
+
+def recently_queued(to_email: str, kind: str) -> bool:
+    """
+    Было ли письмо такого вида на этот адрес поставлено в очередь в течение ``EMAIL_RESEND_COOLDOWN``.
+    """
+    since = timezone.now() - timedelta(seconds=_setting('EMAIL_RESEND_COOLDOWN', 60))
+    return OutboundEmail.objects.filter(to_email=to_email, kind=kind, created_at__gte=since).exists()
+
+
+def enqueue_email(to_email: str, subject: str, body: str, kind: str = '', from_email=None) -> OutboundEmail:
+    """
+    Ставит письмо в очередь отправки.
+
+    :param to_email: Адрес получателя.
+    :param subject: Тема.
+    :param body: Текст письма.
+    :param kind: Вид письма (OutboundEmail.KIND_*), по нему считается пауза между повторами.
+    :param from_email: Адрес отправителя, по умолчанию DEFAULT_FROM_EMAIL.
+    :return: Письмо в очереди.
+    """
+    return OutboundEmail.objects.create(
+        kind=kind,
+        to_email=to_email,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL or '',
+        subject=subject,
+        body=body,
+    )
+
+
+def claim_batch(size: int) -> list:
+    """
+    Арендует до ``size`` писем, время отправки которых наступило.
+
+    :param size: Размер пачки.
+    :return: Арендованные письма.
+    """
+    now = timezone.now()
+    lease_until = now + timedelta(seconds=_setting('OUTBOX_LEASE_SECONDS', 300))
+
+    with transaction.atomic():
+        due = OutboundEmail.objects.filter(
+            status=OutboundEmail.STATUS_PENDING,
+            next_attempt_at__lte=now,
+        ).order_by('next_attempt_at', 'id')
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        ids = list(due.values_list('id', flat=True)[:size])
+        # Время повторно проверяется в UPDATE: без SKIP LOCKED письмо мог забрать другой отправитель
+        OutboundEmail.objects.filter(
+            id__in=ids,
+            status=OutboundEmail.STATUS_PENDING,
+            next_attempt_at__lte=now,
+        ).update(next_attempt_at=lease_until)
+
+    return list(OutboundEmail.objects.filter(id__in=ids, next_attempt_at=lease_until).order_by('id'))
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """
+    Задержка перед следующей попыткой: база, удваиваемая с каждой попыткой, но не больше часа.
+    """
+    base = _setting('OUTBOX_RETRY_BASE_SECONDS', 30)
+    return timedelta(seconds=min(base * 2 ** (attempts - 1), 60 * 60))
+
+
+def deliver_batch(emails, mail_connection) -> tuple:
+    """
+    Отправляет пачку писем через открытое соединение.
+
+    :param emails: Арендованные письма.
+    :param mail_connection: Открытое соединение почтового бэкенда.
+    :return: Число отправленных и неудачных писем.
+    """
+    max_attempts = _setting('OUTBOX_MAX_ATTEMPTS', 5)
+    sent = failed = 0
+    for email in emails:
+        message = EmailMessage(
+            subject=email.subject,
+            body=email.body,
+            from_email=email.from_email or None,
+            to=[email.to_email],
+            connection=mail_connection,
+        )
+        email.attempts += 1
+        try:
+            with timed('smtp'):
+                message.send()
+        except Exception as error:
+            logger.warning('Failed to send email %s to %s: %s', email.pk, email.to_email, error)
+            failed += 1
+            email.last_error = str(error)
+            if email.attempts >= max_attempts:
+                email.status = OutboundEmail.STATUS_FAILED
+                email.body = ''
+            else:
+                email.next_attempt_at = timezone.now() + retry_delay(email.attempts)
+            email.save(update_fields=['attempts', 'last_error', 'status', 'next_attempt_at', 'body'])
+            # Сервер мог разорвать соединение: переподключаемся для следующих писем
+            mail_connection.close()
+            try:
+                mail_connection.open()
+            except Exception as error:
+                logger.warning('Failed to reconnect to the mail server: %s', error)
+            continue
+
+        sent += 1
+        email.status = OutboundEmail.STATUS_SENT
+        email.sent_at = timezone.now()
+        email.last_error = ''
+        # Код в тексте письма не должен храниться после отправки
+        email.body = ''
+        email.save(update_fields=['attempts', 'last_error', 'status', 'sent_at', 'body'])
+    return sent, failed
+
+
+def release_batch(emails) -> None:
+    """
+    Возвращает арендованные, но не отправленные письма в очередь.
+    """
+    OutboundEmail.objects.filter(
+        id__in=[email.pk for email in emails],
+        status=OutboundEmail.STATUS_PENDING,
+    ).update(next_attempt_at=timezone.now())
+
+
+def expire_code_emails(kind: str, ttl: int) -> int:
+    """
+    Не отправляет письма с уже истекшими кодами: стирает текст и помечает их неудачными.
+
+    :param kind: Вид письма (OutboundEmail.KIND_*).
+    :param ttl: Время действия кода этого вида, в секундах.
+    :return: Число снятых с отправки писем.
+    """
+    return OutboundEmail.objects.filter(
+        kind=kind,
+        status=OutboundEmail.STATUS_PENDING,
+        created_at__lte=timezone.now() - timedelta(seconds=ttl),
+    ).update(status=OutboundEmail.STATUS_FAILED, body='', last_error='Code expired before delivery')
+
+
+def finished_emails():
+    """
+    Отправленные и неудачные письма старше ``OUTBOX_RETENTION_SECONDS``.
+    """
+    since = timezone.now() - timedelta(seconds=_setting('OUTBOX_RETENTION_SECONDS', 7 * 24 * 60 * 60))
+    return OutboundEmail.objects.filter(
+        status__in=[OutboundEmail.STATUS_SENT, OutboundEmail.STATUS_FAILED],
+        created_at__lt=since,
+    )
+
+
+def queue_stats() -> dict:
+    """
+    Состояние очереди для метрик (musicTrainee.metrics).
+
+    :return: ``counts`` - число неотправленных писем по статусам,
+        ``oldest_pending_created_at`` - время создания самого старого ожидающего письма или None.
+    """
+    rows = (
+        OutboundEmail.objects.exclude(status=OutboundEmail.STATUS_SENT)
+        .order_by()
+        .values('status')
+        .annotate(count=Count('id'), oldest=Min('created_at'))
+    )
+    counts = {OutboundEmail.STATUS_PENDING: 0, OutboundEmail.STATUS_FAILED: 0}
+    oldest_pending = None
+    for row in rows:
+        counts[row['status']] = row['count']
+        if row['status'] == OutboundEmail.STATUS_PENDING:
+            oldest_pending = row['oldest']
+    return {'counts': counts, 'oldest_pending_created_at': oldest_pending}
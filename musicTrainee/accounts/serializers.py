@@ -1,8 +1,15 @@
+import time
+
 from django.conf import settings
 
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import AccessToken
 
+from accounts.authentication import ISSUED_AT_CLAIM, TOKEN_USER_CLAIMS, is_token_revoked
 from accounts.models import CustomAccount, PasswordResetRequest
 
 
@@ -60,6 +67,48 @@ class ProfileCreateSerializer(serializers.ModelSerializer):
 
 class ProfileConfirmSerializer(serializers.Serializer):
     confirm_code = serializers.CharField(required=True)
+    # Почта, на которую пришел код: код ищется только вместе с ней
+    email = serializers.EmailField(required=True)
+
+
+class AccountTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """
+    Сериализатор выдачи JWT с ролями пользователя в claims (accounts.authentication).
+    """
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        for claim in TOKEN_USER_CLAIMS:
+            token[claim] = getattr(user, claim)
+        # Токен доступа копирует claim из токена обновления
+        token[ISSUED_AT_CLAIM] = time.time()
+        return token
+
+
+class AccountTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Сериализатор обновления JWT, отклоняющий токены, отозванные при выходе.
+    Роли в новом токене доступа берутся из базы, а не из токена обновления.
+    """
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        if is_token_revoked(refresh):
+            raise InvalidToken('Token is revoked')
+        data = super().validate(attrs)
+
+        user = CustomAccount.objects.filter(
+            pk=refresh[jwt_settings.USER_ID_CLAIM],
+            is_active=True,
+        ).only(*TOKEN_USER_CLAIMS).first()
+        if user is None:
+            raise InvalidToken('User not found')
+        access = AccessToken(data['access'])
+        for claim in TOKEN_USER_CLAIMS:
+            access[claim] = getattr(user, claim)
+        data['access'] = str(access)
+        return data
 
 
 class PasswordResetRequestSerializer(serializers.Serializer):
@@ -81,6 +130,7 @@ class PasswordResetConfirmSerializer(serializers.Serializer):
     """
     reset_code = serializers.CharField(required=True)
     new_password = serializers.CharField(required=True)
+    email = serializers.EmailField(required=True)
 
 
 # class UserPatchSerializer(serializers.Serializer):
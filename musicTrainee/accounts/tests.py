@@ -1,3 +1,325 @@
-from django.test import TestCase
+import io
+import re
+import smtplib
+from datetime import timedelta
 
-# Create your tests here.
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend as LocMemEmailBackend
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import OutboundEmail, PasswordResetRequest
+from accounts.outbox import claim_batch, enqueue_email, retry_delay
+from catalog.testing import create_user
+from musicTrainee.cache import clear_local_caches
+
+
+class FailingEmailBackend(LocMemEmailBackend):
+    """
+    Почтовый бэкенд, сервер которого отвергает все письма.
+    """
+
+    def send_messages(self, messages):
+        raise smtplib.SMTPRecipientsRefused({})
+
+
+class DisconnectingEmailBackend(LocMemEmailBackend):
+    """
+    Почтовый бэкенд, сервер которого разрывает соединение на первом письме.
+    """
+    opened = 0
+
+    def open(self):
+        type(self).opened += 1
+        self.connected = True
+
+    def close(self):
+        self.connected = False
+
+    def send_messages(self, messages):
+        if type(self).opened == 1 and self.connected:
+            self.connected = False
+            raise smtplib.SMTPServerDisconnected('Connection unexpectedly closed')
+        if not self.connected:
+            raise smtplib.SMTPServerDisconnected('Please run connect() first')
+        return super().send_messages(messages)
+
+
+@override_settings(
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+    REQUEST_TIMING_SAMPLE_RATE=0,
+)
+class AccountsTestCase(TestCase):
+    """
+    Базовый класс тестов учетных записей.
+    """
+
+    def setUp(self):
+        self.user = create_user('student')
+        self.client = APIClient()
+
+    def reset_confirm(self, code: str, password: str = 'changed', **data):
+        data = {'reset_code': code, 'new_password': password, 'email': self.user.email, **data}
+        return self.client.post('/api/auth/reset-confirm/', data, format='json')
+
+
+class ResetCodeTests(AccountsTestCase):
+    """
+    Коды подтверждения почты и сброса пароля (PasswordResetRequest).
+    """
+
+    def test_code_stored_hashed(self):
+        PasswordResetRequest.issue(self.user.email, PasswordResetRequest.KIND_RESET, '123456')
+        request = PasswordResetRequest.objects.get()
+        self.assertNotIn('123456', request.code_hash)
+        self.assertEqual(PasswordResetRequest.lookup('123456', PasswordResetRequest.KIND_RESET, self.user.email),
+                         request)
+        self.assertEqual(PasswordResetRequest.lookup('123456', PasswordResetRequest.KIND_RESET,
+                                                     self.user.email.upper()), request)
+
+    def test_code_requires_owner_email(self):
+        other = create_user('other')
+        PasswordResetRequest.issue(self.user.email, PasswordResetRequest.KIND_RESET, '123456')
+        PasswordResetRequest.issue(other.email, PasswordResetRequest.KIND_RESET, '123456')
+        response = self.client.post('/api/auth/reset-confirm/', {'reset_code': '123456', 'new_password': 'changed'},
+                                    format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('email', response.data)
+        self.assertEqual(self.reset_confirm('123456', email='nobody@example.com').status_code, 400)
+
+        # Одинаковые коды разных пользователей не мешают друг другу
+        self.assertEqual(self.reset_confirm('123456', email=other.email).status_code, 201)
+        self.assertTrue(PasswordResetRequest.objects.filter(email=self.user.email).exists())
+        self.assertEqual(self.reset_confirm('123456').status_code, 201)
+
+    def test_confirm_requires_email(self):
+        pending = create_user('pending', is_activated=False)
+        PasswordResetRequest.issue(pending.email, PasswordResetRequest.KIND_CONFIRM, '123456')
+        response = self.client.post('/api/auth/signup/confirm', {'confirm_code': '123456'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post('/api/auth/signup/confirm', {'confirm_code': '123456', 'email': pending.email},
+                                    format='json')
+        self.assertEqual(response.status_code, 200)
+        pending.refresh_from_db()
+        self.assertTrue(pending.is_activated)
+
+    def test_code_scoped_by_kind(self):
+        PasswordResetRequest.issue(self.user.email, PasswordResetRequest.KIND_CONFIRM, '123456')
+        self.assertEqual(self.reset_confirm('123456').status_code, 400)
+
+        # Новый код сброса не отменяет код подтверждения
+        PasswordResetRequest.issue(self.user.email, PasswordResetRequest.KIND_RESET, '654321')
+        self.assertEqual(PasswordResetRequest.objects.filter(email=self.user.email).count(), 2)
+        self.assertEqual(self.reset_confirm('654321').status_code, 201)
+        self.assertEqual(self.reset_confirm('654321').status_code, 400)
+
+    def test_reissue_replaces_code(self):
+        PasswordResetRequest.issue(self.user.email, PasswordResetRequest.KIND_RESET, '111111')
+        PasswordResetRequest.issue(self.user.email, PasswordResetRequest.KIND_RESET, '222222')
+        self.assertEqual(self.reset_confirm('111111').status_code, 400)
+        self.assertEqual(self.reset_confirm('222222').status_code, 201)
+
+    def test_expired_code_rejected_and_purged(self):
+        PasswordResetRequest.issue(self.user.email, PasswordResetRequest.KIND_RESET, '123456')
+        PasswordResetRequest.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self.reset_confirm('123456').status_code, 400)
+
+        call_command('purge_reset_codes', stdout=io.StringIO())
+        self.assertFalse(PasswordResetRequest.objects.exists())
+
+
+class OutboxTests(AccountsTestCase):
+    """
+    Коды в тексте писем очереди (accounts.outbox).
+    """
+
+    def test_body_blanked_after_send(self):
+        response = self.client.post('/api/auth/reset-request/', {'email': self.user.email}, format='json')
+        self.assertEqual(response.status_code, 201)
+        call_command('send_outbox', stdout=io.StringIO())
+
+        self.assertEqual(len(mail.outbox), 1)
+        code = re.search(r'\d{6}', mail.outbox[0].body).group()
+        email = OutboundEmail.objects.get()
+        self.assertEqual((email.status, email.body), (OutboundEmail.STATUS_SENT, ''))
+        self.assertEqual(self.reset_confirm(code).status_code, 201)
+
+    def test_purge_expires_and_deletes_emails(self):
+        def queue(kind, status, age):
+            email = OutboundEmail.objects.create(kind=kind, to_email=self.user.email, subject='Code',
+                                                 body='Code 123456', status=status)
+            OutboundEmail.objects.filter(pk=email.pk).update(created_at=timezone.now() - age)
+            return email.pk
+
+        expired = queue(OutboundEmail.KIND_RESET, OutboundEmail.STATUS_PENDING, timedelta(hours=1))
+        fresh_confirm = queue(OutboundEmail.KIND_CONFIRM, OutboundEmail.STATUS_PENDING, timedelta(hours=1))
+        old_sent = queue(OutboundEmail.KIND_RESET, OutboundEmail.STATUS_SENT, timedelta(days=30))
+        old_failed = queue(OutboundEmail.KIND_CONFIRM, OutboundEmail.STATUS_FAILED, timedelta(days=30))
+
+        call_command('purge_reset_codes', stdout=io.StringIO())
+
+        emails = {email.pk: email for email in OutboundEmail.objects.all()}
+        self.assertEqual(set(emails), {expired, fresh_confirm})
+        self.assertEqual((emails[expired].status, emails[expired].body), (OutboundEmail.STATUS_FAILED, ''))
+        self.assertEqual((emails[fresh_confirm].status, emails[fresh_confirm].body),
+                         (OutboundEmail.STATUS_PENDING, 'Code 123456'))
+        self.assertNotIn(old_sent, emails)
+        self.assertNotIn(old_failed, emails)
+
+
+@override_settings(EMAIL_RESEND_COOLDOWN=60, OUTBOX_MAX_ATTEMPTS=3, OUTBOX_RETRY_BASE_SECONDS=30)
+class OutboxDeliveryTests(AccountsTestCase):
+    """
+    Пауза между письмами, повторы, аренда и переподключение очереди писем (accounts.outbox).
+    """
+
+    def send_outbox(self):
+        call_command('send_outbox', stdout=io.StringIO(), stderr=io.StringIO())
+
+    def make_due(self):
+        OutboundEmail.objects.update(next_attempt_at=timezone.now())
+
+    def age_emails(self, seconds: int):
+        OutboundEmail.objects.update(created_at=timezone.now() - timedelta(seconds=seconds))
+
+    def test_login_resend_cooldown(self):
+        pending = create_user('pending', is_activated=False)
+        for _ in range(2):
+            response = self.client.post('/api/auth/login/', {'username': 'pending', 'password': 'password'},
+                                        format='json')
+            self.assertEqual(response.status_code, 201)
+        self.assertEqual(OutboundEmail.objects.filter(to_email=pending.email).count(), 1)
+
+        self.age_emails(61)
+        self.client.post('/api/auth/login/', {'username': 'pending', 'password': 'password'}, format='json')
+        self.assertEqual(OutboundEmail.objects.filter(to_email=pending.email).count(), 2)
+        self.assertEqual(PasswordResetRequest.objects.filter(email=pending.email).count(), 1)
+
+    def test_reset_request_cooldown_keeps_code(self):
+        for _ in range(2):
+            response = self.client.post('/api/auth/reset-request/', {'email': self.user.email}, format='json')
+            self.assertEqual(response.status_code, 201)
+        self.assertEqual(OutboundEmail.objects.count(), 1)
+        self.send_outbox()
+        # Код из первого письма не заменен повторным запросом
+        code = re.search(r'\d{6}', mail.outbox[0].body).group()
+        self.assertEqual(self.reset_confirm(code).status_code, 201)
+
+        self.age_emails(61)
+        self.client.post('/api/auth/reset-request/', {'email': self.user.email}, format='json')
+        self.assertEqual(OutboundEmail.objects.count(), 2)
+
+    @override_settings(EMAIL_BACKEND='accounts.tests.FailingEmailBackend')
+    def test_retry_backoff_and_final_failure(self):
+        email = enqueue_email(self.user.email, 'Code', 'Code 123456', kind=OutboundEmail.KIND_RESET)
+        for attempt, delay in ((1, 30), (2, 60)):
+            before = timezone.now()
+            self.send_outbox()
+            email.refresh_from_db()
+            self.assertEqual((email.status, email.attempts), (OutboundEmail.STATUS_PENDING, attempt))
+            self.assertTrue(email.last_error)
+            self.assertGreaterEqual(email.next_attempt_at, before + timedelta(seconds=delay))
+            self.assertLess(email.next_attempt_at, before + timedelta(seconds=delay + 5))
+            # До наступления времени повтора письмо не отправляется
+            self.send_outbox()
+            email.refresh_from_db()
+            self.assertEqual(email.attempts, attempt)
+            self.make_due()
+
+        self.send_outbox()
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts, email.body), (OutboundEmail.STATUS_FAILED, 3, ''))
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(retry_delay(20), timedelta(hours=1))
+
+    def test_claims_do_not_overlap(self):
+        for index in range(3):
+            enqueue_email(f'user-{index}@example.com', 'Subject', 'Body')
+        first = claim_batch(2)
+        second = claim_batch(2)
+        self.assertEqual(len(first), 2)
+        self.assertEqual(len(second), 1)
+        self.assertFalse({email.pk for email in first} & {email.pk for email in second})
+        self.assertEqual(claim_batch(2), [])
+
+        # Аренда неотправленных писем истекает, и их забирает следующий отправитель
+        self.make_due()
+        self.assertEqual(len(claim_batch(5)), 3)
+
+    @override_settings(EMAIL_BACKEND='accounts.tests.DisconnectingEmailBackend')
+    def test_reconnect_after_smtp_error(self):
+        DisconnectingEmailBackend.opened = 0
+        failed = enqueue_email('first@example.com', 'Subject', 'Body')
+        sent = enqueue_email('second@example.com', 'Subject', 'Body')
+        self.send_outbox()
+
+        self.assertEqual(DisconnectingEmailBackend.opened, 2)
+        self.assertEqual([message.to for message in mail.outbox], [['second@example.com']])
+        failed.refresh_from_db()
+        sent.refresh_from_db()
+        self.assertEqual((failed.status, failed.attempts), (OutboundEmail.STATUS_PENDING, 1))
+        self.assertIn('unexpectedly closed', failed.last_error)
+        self.assertEqual(sent.status, OutboundEmail.STATUS_SENT)
+
+
+class TokenRevocationTests(AccountsTestCase):
+    """
+    Отзыв JWT (accounts.authentication).
+    """
+
+    def login(self, password: str = 'password') -> APIClient:
+        response = self.client.post('/api/token/', {'username': 'student', 'password': password}, format='json')
+        self.assertEqual(response.status_code, 200)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {response.data["access"]}')
+        client.refresh_token = response.data['refresh']
+        return client
+
+    def assertTokenStatus(self, client, status: int):
+        self.assertEqual(client.get('/api/mycourses/').status_code, status)
+        response = self.client.post('/api/token/refresh/', {'refresh': client.refresh_token}, format='json')
+        self.assertEqual(response.status_code, status)
+
+    def setUp(self):
+        super().setUp()
+        clear_local_caches()
+        cache.clear()
+
+    def test_logout_revokes_and_immediate_login_works(self):
+        client = self.login()
+        self.assertTokenStatus(client, 200)
+        self.assertEqual(client.get('/api/auth/logout/').status_code, 200)
+        self.assertTokenStatus(client, 401)
+        # Токен, выданный в ту же секунду после выхода, действует
+        self.assertTokenStatus(self.login(), 200)
+
+    def test_revocation_survives_cache_eviction(self):
+        client = self.login()
+        self.assertEqual(client.get('/api/auth/logout/').status_code, 200)
+        # Запись об отзыве вытеснена из кэша: отзыв читается из таблицы
+        for index in range(1000):
+            cache.set(f'pressure:{index}', index)
+        clear_local_caches()
+        cache.clear()
+        self.assertTokenStatus(client, 401)
+
+    def test_password_reset_revokes(self):
+        client = self.login()
+        PasswordResetRequest.issue(self.user.email, PasswordResetRequest.KIND_RESET, '123456')
+        self.assertEqual(self.reset_confirm('123456', password='changed').status_code, 201)
+        self.assertTokenStatus(client, 401)
+        self.assertTokenStatus(self.login('changed'), 200)
+
+    def test_inactive_user_revoked(self):
+        client = self.login()
+        self.user.is_active = False
+        self.user.save()
+        self.assertTokenStatus(client, 401)
+
+    def test_deleted_user_revoked(self):
+        client = self.login()
+        self.user.delete()
+        self.assertTokenStatus(client, 401)
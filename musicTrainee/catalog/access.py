@@ -0,0 +1,92 @@
+"""
+Кэш прав доступа пользователей к курсам.
+
+Для каждого пользователя хранится множество slug курсов, на которые он записан
+или которые он создал. Множество хранится в двухуровневом кэше
+(musicTrainee.cache), поэтому проверка доступа на горячих эндпоинтах не ходит в базу.
+
+Положительный ответ берется из локального кэша сразу. Отрицательный ответ
+перед отказом перепроверяется по базе, поэтому только что купленный курс
+доступен сразу на всех воркерах. Отзыв доступа доходит до других
+воркеров не позже ``COURSE_ACCESS_LOCAL_TIMEOUT`` секунд.
+"""
+
+from django.conf import settings
+from django.db.models import Q
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from musicTrainee.cache import TwoTierCache
+from .models import Course, Enrollment
+
+access_cache = TwoTierCache(
+    'course-access',
+    timeout=getattr(settings, 'COURSE_ACCESS_CACHE_TIMEOUT', 300),
+    local_timeout=getattr(settings, 'COURSE_ACCESS_LOCAL_TIMEOUT', 30),
+)
+
+
+def _load_course_slugs(user_id) -> frozenset:
+    enrolled = Enrollment.objects.filter(user_id=user_id).values('course_id')
+    slugs = Course.objects.filter(Q(creator_id=user_id) | Q(pk__in=enrolled)).values_list('slug', flat=True)
+    return frozenset(slugs)
+
+
+def get_course_slugs(user_id) -> frozenset:
+    """
+    Возвращает slug курсов, доступных пользователю как студенту или создателю.
+
+    :param user_id: Идентификатор пользователя.
+    :return: Множество slug курсов.
+    """
+    return access_cache.get_or_set(user_id, lambda: _load_course_slugs(user_id))
+
+
+def has_course_access(user_id, slug) -> bool:
+    """
+    Проверяет, записан ли пользователь на курс или является его создателем.
+
+    :param user_id: Идентификатор пользователя.
+    :param slug: Slug курса.
+    :return: Есть ли доступ.
+    """
+    if slug in get_course_slugs(user_id):
+        return True
+    # Перед отказом перечитываем права из базы: кэшированная копия могла устареть
+    invalidate_course_access(user_id)
+    return slug in get_course_slugs(user_id)
+
+
+def invalidate_course_access(*user_ids) -> None:
+    """
+    Сбрасывает кэш доступа пользователей.
+
+    :param user_ids: Идентификаторы пользователей.
+    """
+    access_cache.delete_many(user_id for user_id in user_ids if user_id is not None)
+
+
+@receiver(post_save, sender=Enrollment)
+@receiver(post_delete, sender=Enrollment)
+def invalidate_enrollment_access(sender, instance, **kwargs):
+    invalidate_course_access(instance.user_id)
+
+
+@receiver(post_save, sender=Course)
+def invalidate_course_creator_access(sender, instance, created, **kwargs):
+    # Сохраненные slug и создатель запоминаются в Course.from_db
+    stored_creator_id = getattr(instance, '_stored_creator_id', None)
+    if created or stored_creator_id is None:
+        invalidate_course_access(instance.creator_id)
+    elif stored_creator_id != instance.creator_id:
+        invalidate_course_access(stored_creator_id, instance.creator_id)
+
+    stored_slug = getattr(instance, '_stored_slug', None)
+    if not created and stored_slug is not None and stored_slug != instance.slug:
+        user_ids = Enrollment.objects.filter(course=instance).values_list('user_id', flat=True)
+        invalidate_course_access(instance.creator_id, *user_ids)
+
+
+@receiver(post_delete, sender=Course)
+def invalidate_deleted_course_access(sender, instance, **kwargs):
+    invalidate_course_access(instance.creator_id)
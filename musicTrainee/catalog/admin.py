@@ -1,6 +1,7 @@
 from django.contrib import admin
 from .models import Course, Content, Text, Module, File, Image, Video, Answer, Question, Task, TaskSubmission, ItemBase, \
-    Lesson, CommentContent, CourseRating
+    Lesson, CommentContent, CourseRating, Enrollment
+from .search import search_courses
 
 
 class QuestionsInline(admin.TabularInline):
@@ -39,6 +40,12 @@ class CourseAdmin(admin.ModelAdmin):
     ]
     prepopulated_fields = {'slug': ('title', )}
 
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск по полнотекстовому индексу вместо icontains по search_fields
+        if not search_term:
+            return queryset, False
+        return search_courses(queryset, search_term), False
+
 
 @admin.register(Module)
 class ModuleAdmin(admin.ModelAdmin):
@@ -162,3 +169,16 @@ class CourseRatingAdmin(admin.ModelAdmin):
         "rating",
         "review",
     ]
+
+
+@admin.register(Enrollment)
+class EnrollmentAdmin(admin.ModelAdmin):
+    list_display = [
+        "user",
+        "course",
+        "enrolled_at",
+    ]
+    raw_id_fields = [
+        "user",
+        "course",
+    ]
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class CatalogConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'catalog'
+
+    def ready(self):
+        # Подключение обработчиков сигналов кэша прав доступа, поискового индекса и загрузок
+        from . import access, search, uploads  # noqa: F401
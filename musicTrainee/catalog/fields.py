@@ -28,3 +28,20 @@ class OrderField(models.PositiveIntegerField):
         else:
             return super().pre_save(model_instance, add)
 
+
+
+class FTS5MatchField(models.TextField):
+    """
+    Скрытая колонка виртуальной таблицы SQLite FTS5, совпадающая по имени с самой таблицей.
+    Поддерживает только lookup ``match`` (оператор MATCH по всем колонкам таблицы).
+    """
+
+
+@FTS5MatchField.register_lookup
+class FTS5Match(models.Lookup):
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', [*lhs_params, *rhs_params]
@@ -0,0 +1,11 @@
+from django.core.management import BaseCommand
+
+from catalog.uploads import stale_sessions
+
+
+class Command(BaseCommand):
+    help = 'Delete abandoned upload sessions (older than UPLOAD_SESSION_TTL) and their partial files'
+
+    def handle(self, *args, **options):
+        deleted, _ = stale_sessions().delete()
+        self.stdout.write(self.style.SUCCESS(f'Successfully deleted {deleted} upload sessions'))
@@ -0,0 +1,34 @@
+from django.core.management import BaseCommand
+from django.db import transaction
+from django.db.models import OuterRef, Subquery, Count, Sum, Value
+from django.db.models.functions import Coalesce
+
+from catalog.models import Course, CourseRating
+
+
+class Command(BaseCommand):
+    help = 'Rebuild denormalized rating aggregates (rating_count, rating_sum) of courses'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Courses updated per transaction')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        ratings = CourseRating.objects.filter(course=OuterRef('pk')).order_by().values('course')
+        rating_count = Coalesce(Subquery(ratings.annotate(total=Count('id')).values('total')), Value(0))
+        rating_sum = Coalesce(Subquery(ratings.annotate(total=Sum('rating')).values('total')), Value(0))
+
+        last_id = 0
+        updated = 0
+        while True:
+            ids = list(
+                Course.objects.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            with transaction.atomic():
+                updated += Course.objects.filter(pk__in=ids).update(rating_count=rating_count, rating_sum=rating_sum)
+            last_id = ids[-1]
+
+        self.stdout.write(self.style.SUCCESS(f'Successfully rebuilt ratings for {updated} courses'))
@@ -0,0 +1,39 @@
+import time
+
+from django.core.management import BaseCommand, CommandError
+
+from accounts.models import CustomAccount
+from catalog.perfdata import Fanout, generate_perf_data
+
+
+class Command(BaseCommand):
+    help = 'Generate a large synthetic dataset for benchmarks (about 1M rows with the default fan-out)'
+
+    def add_arguments(self, parser):
+        for name, default in Fanout._field_defaults.items():
+            parser.add_argument(f'--{name}', type=int, default=default, help=f'Fan-out: {name} (default {default})')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed, the same seed gives the same data')
+        parser.add_argument('--prefix', default='perf', help='Prefix of usernames and course slugs')
+        parser.add_argument('--password', default='password', help='Password of all generated users')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per INSERT')
+
+    def handle(self, *args, **options):
+        prefix = options['prefix']
+        if CustomAccount.objects.filter(username__startswith=f'{prefix}-').exists():
+            raise CommandError(f'Users with prefix "{prefix}" already exist, use another --prefix or an empty database')
+
+        fanout = Fanout(**{name: options[name] for name in Fanout._fields})
+        started = time.monotonic()
+        try:
+            counts = generate_perf_data(
+                fanout, seed=options['seed'], prefix=prefix, password=options['password'],
+                batch_size=options['batch_size'], log=self.stdout.write,
+            )
+        except ValueError as error:
+            raise CommandError(error)
+
+        for label, count in counts.items():
+            self.stdout.write(f'  {label}: {count}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully generated {sum(counts.values())} rows in {time.monotonic() - started:.1f}s'
+        ))
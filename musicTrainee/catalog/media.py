@@ -0,0 +1,78 @@
+"""
+Права на скачивание медиа-файлов.
+
+Каталог файла определяет правило доступа (пути задаются upload_to моделей):
+
+* ``users/...`` (аватары) и ``courses/*/logo/...`` (логотипы курсов) - публичные;
+* ``courses/*/images/...`` и ``courses/*/files/...`` - студенты и создатель курса, в урок
+  которого входит изображение или файл, и модераторы;
+* ``courses/*/tasks/...`` - автор ответа, создатель курса с заданием и модераторы.
+
+Владелец файла ищется по имени файла (поле проиндексировано) одним запросом,
+права на курс берутся из кэша catalog.access.
+"""
+
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Q
+
+from .access import has_course_access
+from .models import Content, File, Image, TaskSubmission
+from .reviews import creator_submissions
+
+PUBLIC = 'public'
+PRIVATE = 'private'
+
+LESSON_MEDIA_MODELS = {
+    'images': Image,
+    'files': File,
+}
+
+
+def _is_moderator(user) -> bool:
+    return getattr(user, 'is_moderator', False)
+
+
+def _lesson_media_access(user, model, name: str) -> bool:
+    slugs = set(Content.objects.filter(
+        content_type=ContentType.objects.get_for_model(model),
+        object_id__in=model.objects.filter(file=name).values('id'),
+    ).values_list('course__slug', flat=True))
+    if not slugs:
+        return False
+    return _is_moderator(user) or any(has_course_access(user.pk, slug) for slug in slugs)
+
+
+def _submission_access(user, name: str) -> bool:
+    submissions = TaskSubmission.objects.filter(file=name)
+    if _is_moderator(user):
+        return submissions.exists()
+    return submissions.filter(Q(student=user) | Q(pk__in=creator_submissions(user).values('pk'))).exists()
+
+
+def get_media_access(user, name: str):
+    """
+    Проверяет, может ли пользователь скачать медиа-файл.
+
+    :param user: Пользователь запроса (может быть анонимным).
+    :param name: Имя файла в хранилище относительно MEDIA_ROOT.
+    :return: PUBLIC или PRIVATE, если файл доступен, иначе None.
+    """
+    parts = name.split('/')
+    if any(part in ('', '.', '..') for part in parts):
+        return None
+
+    if parts[0] == 'users':
+        return PUBLIC
+    if parts[0] != 'courses' or len(parts) < 4:
+        return None
+
+    kind = parts[2]
+    if kind == 'logo':
+        return PUBLIC
+    if not user or not user.is_authenticated:
+        return None
+    if kind in LESSON_MEDIA_MODELS:
+        return PRIVATE if _lesson_media_access(user, LESSON_MEDIA_MODELS[kind], name) else None
+    if kind == 'tasks':
+        return PRIVATE if _submission_access(user, name) else None
+    return None
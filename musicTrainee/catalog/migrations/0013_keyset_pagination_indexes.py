@@ -0,0 +1,27 @@
+# Generated by Django 5.0.14 on 2026-10-18 04:21
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0012_courserating'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['approval', 'created', 'id'], name='course_approval_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['creator', 'created', 'id'], name='course_creator_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tasksubmission',
+            index=models.Index(fields=['task', 'submitted_at', 'id'], name='submission_task_submitted_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.0.14 on 2026-10-18 04:22
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Count, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_rating_aggregates(apps, schema_editor):
+    Course = apps.get_model('catalog', 'Course')
+    CourseRating = apps.get_model('catalog', 'CourseRating')
+    ratings = CourseRating.objects.filter(course=OuterRef('pk')).order_by().values('course')
+    Course.objects.update(
+        rating_count=Coalesce(Subquery(ratings.annotate(total=Count('id')).values('total')), Value(0)),
+        rating_sum=Coalesce(Subquery(ratings.annotate(total=Sum('rating')).values('total')), Value(0)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0013_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_rating_aggregates, migrations.RunPython.noop),
+    ]
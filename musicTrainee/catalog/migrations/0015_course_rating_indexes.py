@@ -0,0 +1,23 @@
+# Generated by Django 5.0.14 on 2026-10-18 04:23
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0014_course_rating_aggregates'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='courserating',
+            index=models.Index(fields=['course', 'id'], name='rating_course_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='courserating',
+            index=models.Index(fields=['course', 'rating'], name='rating_course_rating_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.0.14 on 2026-10-18 04:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0015_course_rating_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseTree',
+            fields=[
+                ('course', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='tree', serialize=False, to='catalog.course')),
+                ('data', models.JSONField()),
+                ('built_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,80 @@
+# Generated by Django 5.0.14 on 2026-10-18 04:26
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def copy_owners_to_enrollments(apps, schema_editor):
+    """
+    Переносит связи Course.owner в таблицу Enrollment и заполняет счетчик записей.
+    """
+    Course = apps.get_model('catalog', 'Course')
+    Enrollment = apps.get_model('catalog', 'Enrollment')
+    Owner = Course.owner.through
+
+    batch = []
+    for course_id, user_id in Owner.objects.values_list('course_id', 'customaccount_id').iterator():
+        batch.append(Enrollment(course_id=course_id, user_id=user_id))
+        if len(batch) >= 1000:
+            Enrollment.objects.bulk_create(batch)
+            batch = []
+    Enrollment.objects.bulk_create(batch)
+
+    enrollments = Enrollment.objects.filter(course=OuterRef('pk')).order_by().values('course')
+    Course.objects.update(
+        enrollment_count=Coalesce(Subquery(enrollments.annotate(total=Count('id')).values('total')), Value(0)),
+    )
+
+
+def copy_enrollments_to_owners(apps, schema_editor):
+    Course = apps.get_model('catalog', 'Course')
+    Enrollment = apps.get_model('catalog', 'Enrollment')
+    Owner = Course.owner.through
+    Owner.objects.bulk_create(
+        Owner(course_id=course_id, customaccount_id=user_id)
+        for course_id, user_id in Enrollment.objects.values_list('course_id', 'user_id').iterator()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0016_course_tree'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='enrollment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='Enrollment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('enrolled_at', models.DateTimeField(auto_now_add=True)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='enrollments', to='catalog.course')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='enrollments', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='enrollment',
+            constraint=models.UniqueConstraint(fields=('user', 'course'), name='enrollment_user_course_unique'),
+        ),
+        migrations.RunPython(copy_owners_to_enrollments, copy_enrollments_to_owners),
+        # Нельзя добавить through к существующему ManyToManyField, поэтому поле пересоздается
+        # поверх уже заполненной таблицы Enrollment
+        migrations.RemoveField(
+            model_name='course',
+            name='owner',
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='owner',
+            field=models.ManyToManyField(blank=True, related_name='courses_owner', through='catalog.Enrollment', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 5.0.14 on 2026-10-18 04:33
+
+import catalog.fields
+import django.db.models.deletion
+from django.db import migrations, models
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE catalog_course_fts USING fts5(
+        title, target_description, description,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+    # Веса колонок для rank: заголовок важнее целевого описания, оно важнее полного описания
+    "INSERT INTO catalog_course_fts (catalog_course_fts, rank) VALUES ('rank', 'bm25(10.0, 5.0, 1.0)')",
+    """
+    INSERT INTO catalog_course_fts (rowid, title, target_description, description)
+    SELECT id, title, target_description, description FROM catalog_course
+    """,
+]
+SQLITE_BACKWARD = [
+    'DROP TABLE IF EXISTS catalog_course_fts',
+]
+
+POSTGRES_FORWARD = [
+    """
+    ALTER TABLE catalog_course ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('russian', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('russian', coalesce(target_description, '')), 'B') ||
+        setweight(to_tsvector('russian', coalesce(description, '')), 'C')
+    ) STORED
+    """,
+    'CREATE INDEX course_search_vector_idx ON catalog_course USING GIN (search_vector)',
+]
+POSTGRES_BACKWARD = [
+    'DROP INDEX IF EXISTS course_search_vector_idx',
+    'ALTER TABLE catalog_course DROP COLUMN IF EXISTS search_vector',
+]
+
+
+def run_vendor_sql(statements):
+    def run(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, ()):
+            schema_editor.execute(statement)
+    return run
+
+
+create_search_structures = run_vendor_sql({'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRES_FORWARD})
+drop_search_structures = run_vendor_sql({'sqlite': SQLITE_BACKWARD, 'postgresql': POSTGRES_BACKWARD})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0017_enrollment'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseSearchIndex',
+            fields=[
+                ('course', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_index', serialize=False, to='catalog.course')),
+                ('title', models.TextField()),
+                ('target_description', models.TextField()),
+                ('description', models.TextField()),
+                ('rank', models.FloatField()),
+                ('document', catalog.fields.FTS5MatchField(db_column='catalog_course_fts')),
+            ],
+            options={
+                'db_table': 'catalog_course_fts',
+                'managed': False,
+            },
+        ),
+        # На PostgreSQL поиск идет по сгенерированной колонке tsvector с GIN-индексом,
+        # на SQLite - по виртуальной таблице FTS5; на других СУБД структуры не создаются
+        migrations.RunPython(create_search_structures, drop_search_structures),
+    ]
@@ -0,0 +1,42 @@
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def fill_content_course(apps, schema_editor):
+    """
+    Заполняет Content.course по курсу модуля урока.
+    """
+    Content = apps.get_model('catalog', 'Content')
+    Lesson = apps.get_model('catalog', 'Lesson')
+    course_id = Lesson.objects.filter(pk=OuterRef('lesson_id')).values('module__course_id')[:1]
+    Content.objects.update(course_id=Subquery(course_id))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0019_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='content',
+            name='course',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='contents', to='catalog.course'),
+        ),
+        migrations.RunPython(fill_content_course, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='content',
+            name='course',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='contents', to='catalog.course'),
+        ),
+        migrations.AddIndex(
+            model_name='content',
+            index=models.Index(fields=['content_type', 'object_id'], name='content_item_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='content',
+            index=models.Index(fields=['course', 'content_type'], name='content_course_type_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.0.14 on 2026-10-18 04:37
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef
+
+
+def fill_reviewed(apps, schema_editor):
+    TaskSubmission = apps.get_model('catalog', 'TaskSubmission')
+    TaskReview = apps.get_model('catalog', 'TaskReview')
+    TaskSubmission.objects.update(
+        reviewed=Exists(TaskReview.objects.filter(task_submission=OuterRef('pk'), is_correct__isnull=False)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0020_content_course'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tasksubmission',
+            name='lease_expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='tasksubmission',
+            name='lease_owner',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='tasksubmission',
+            name='reviewed',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(fill_reviewed, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='tasksubmission',
+            index=models.Index(condition=models.Q(('reviewed', False)), fields=['task', 'submitted_at', 'id'], name='submission_pending_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.0.14 on 2026-10-18 04:45
+
+import catalog.models
+import catalog.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0022_upload_sessions'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='course',
+            name='logo',
+            field=models.ImageField(blank=True, max_length=255, null=True, storage=catalog.storage.HashedFileSystemStorage(), upload_to=catalog.models.course_logo_directory_path),
+        ),
+        migrations.AlterField(
+            model_name='file',
+            name='file',
+            field=models.FileField(db_index=True, max_length=255, storage=catalog.storage.HashedFileSystemStorage(), upload_to=catalog.models.course_files_directory_path),
+        ),
+        migrations.AlterField(
+            model_name='image',
+            name='file',
+            field=models.FileField(db_index=True, max_length=255, storage=catalog.storage.HashedFileSystemStorage(), upload_to=catalog.models.course_images_directory_path),
+        ),
+        migrations.AlterField(
+            model_name='tasksubmission',
+            name='file',
+            field=models.FileField(db_index=True, max_length=255, storage=catalog.storage.HashedFileSystemStorage(), upload_to=catalog.models.course_tasks_directory_path),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.14 on 2026-10-18 05:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0023_hashed_media'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='question',
+            name='text',
+            field=models.TextField(blank=True, max_length=3000, null=True, verbose_name='text_question'),
+        ),
+    ]
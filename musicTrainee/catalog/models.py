@@ -1,14 +1,96 @@
 from typing import TYPE_CHECKING
+import contextlib
+import contextvars
+import uuid
 
-from django.db import models
-from django.db.models import Manager
+from django.db import models, transaction, IntegrityError
+from django.db.models import Manager, F, Subquery, Exists, OuterRef, Q
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey
-from django.db.models.signals import post_delete
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
+from django.utils import timezone
 
-from .fields import OrderField
+from .fields import OrderField, FTS5MatchField
+from .storage import hashed_storage
 from django.conf import settings
+from musicTrainee.cache import CATALOG_SCOPE, bump_generation, course_scope
+
+
+def touch(queryset) -> None:
+    """
+    Обновляет updated_at у объектов queryset одним UPDATE, без сигналов.
+    """
+    queryset.update(updated_at=timezone.now())
+
+
+# Корень текущего удаления: объект, для которого выполняется Model.delete(),
+# или модель, для queryset которой выполняется QuerySet.delete()
+_deleting_root = contextvars.ContextVar('deleting_root', default=None)
+
+
+def is_cascade_deleted(instance) -> bool:
+    """
+    Удаляется ли объект каскадно при удалении другого объекта (TouchParentsMixin.delete,
+    Course.delete или QuerySet.delete моделей с DeleteRootQuerySet).
+    """
+    root = _deleting_root.get()
+    if root is None:
+        return False
+    if isinstance(root, type):
+        return not isinstance(instance, root)
+    return root is not instance
+
+
+@contextlib.contextmanager
+def deleting_root(root):
+    """
+    Делает объект или модель корнем удаления на время блока.
+    """
+    token = _deleting_root.set(root)
+    try:
+        yield
+    finally:
+        _deleting_root.reset(token)
+
+
+class DeleteRootQuerySet(models.QuerySet):
+    """
+    QuerySet, при удалении которого (в том числе из админки) удаляемые строки считаются
+    корнями удаления, а их потомки - удаляемыми каскадно (is_cascade_deleted).
+    """
+
+    def delete(self):
+        with deleting_root(self.model):
+            return super().delete()
+
+
+class TouchParentsMixin:
+    """
+    Миксин моделей, изменение которых меняет ответы API родительских объектов.
+
+    При сохранении ``touch_parents`` вызывается в той же транзакции, при удалении -
+    в транзакции удаления из сигнала post_delete. При каскадном удалении потомков
+    объекта их сигналы не обновляют родителей и структуры курсов: родители потомков
+    либо удаляются вместе с ними, либо обновляются обработчиками самого объекта.
+    """
+    touch_parents_on_create = True
+
+    def touch_parents(self) -> None:
+        """
+        Обновляет updated_at родительских объектов. У модели без родителей ничего не делает.
+        """
+
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if self.touch_parents_on_create or not adding:
+                self.touch_parents()
+
+    def delete(self, *args, **kwargs):
+        with deleting_root(self):
+            return super().delete(*args, **kwargs)
 
 
 class CourseRating(models.Model):
@@ -22,6 +104,48 @@ class CourseRating(models.Model):
 
     class Meta:
         unique_together = ('course', 'user')
+        indexes = [
+            models.Index(fields=['course', 'id'], name='rating_course_id_idx'),
+            models.Index(fields=['course', 'rating'], name='rating_course_rating_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Запоминаем сохраненную оценку, чтобы при изменении обновить агрегаты курса на разницу
+        instance._stored_rating = (instance.__dict__.get('course_id'), instance.__dict__.get('rating'))
+        return instance
+
+    def save(self, *args, **kwargs):
+        """
+        Сохраняет отзыв и в той же транзакции обновляет агрегаты оценок курса.
+        """
+        stored_course_id, stored_rating = getattr(self, '_stored_rating', (None, None))
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if stored_course_id is None:
+                Course.objects.filter(pk=self.course_id).update(
+                    rating_count=F('rating_count') + 1,
+                    rating_sum=F('rating_sum') + self.rating,
+                    updated_at=timezone.now(),
+                )
+            elif stored_course_id != self.course_id:
+                Course.objects.filter(pk=stored_course_id).update(
+                    rating_count=F('rating_count') - 1,
+                    rating_sum=F('rating_sum') - stored_rating,
+                    updated_at=timezone.now(),
+                )
+                Course.objects.filter(pk=self.course_id).update(
+                    rating_count=F('rating_count') + 1,
+                    rating_sum=F('rating_sum') + self.rating,
+                    updated_at=timezone.now(),
+                )
+            elif stored_rating != self.rating:
+                Course.objects.filter(pk=self.course_id).update(
+                    rating_sum=F('rating_sum') + (self.rating - stored_rating),
+                    updated_at=timezone.now(),
+                )
+        self._stored_rating = (self.course_id, self.rating)
 
 
 def course_logo_directory_path(instance: "Course", filename: str) -> str:
@@ -71,38 +195,146 @@ class Course(models.Model):
     Модель курса.
     """
     creator = models.ForeignKey(settings.AUTH_USER_MODEL, related_name="courses_creator", on_delete=models.CASCADE)
-    owner = models.ManyToManyField(settings.AUTH_USER_MODEL, blank=True, related_name="courses_owner")
+    owner = models.ManyToManyField(settings.AUTH_USER_MODEL, blank=True, related_name="courses_owner",
+                                   through='Enrollment')
     title = models.CharField(max_length=200)
     slug = models.SlugField(max_length=200, unique=True)
     description = models.TextField()
     target_description = models.CharField(max_length=500)
     price = models.DecimalField(default=0, max_digits=10, decimal_places=2)
     created = models.DateTimeField(auto_now_add=True)
-    logo = models.ImageField(null=True, blank=True, upload_to=course_logo_directory_path)
+    # Время последнего изменения курса или его содержимого, источник ETag/Last-Modified
+    updated_at = models.DateTimeField(auto_now=True)
+    logo = models.ImageField(null=True, blank=True, upload_to=course_logo_directory_path, storage=hashed_storage,
+                             max_length=255)
     approval = models.BooleanField(default=False)
+    # Агрегаты оценок, поддерживаются в CourseRating.save и в сигнале post_delete
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    # Число записей на курс, поддерживается в Enrollment.save и в сигнале post_delete
+    enrollment_count = models.PositiveIntegerField(default=0)
+
+    objects = DeleteRootQuerySet.as_manager()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Запоминаем slug и создателя, чтобы при их изменении сбросить кэш по старому адресу и кэш прав
+        instance._stored_slug = instance.__dict__.get('slug')
+        instance._stored_creator_id = instance.__dict__.get('creator_id')
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Сигналы post_save уже сравнили сохраненные значения с новыми
+        self._stored_slug = self.slug
+        self._stored_creator_id = self.creator_id
+
+    def delete(self, *args, **kwargs):
+        # Модули, уроки, контент, отзывы и записи удаляются вместе с курсом:
+        # их сигналы не обновляют курс и его структуру по каждой строке
+        with deleting_root(self):
+            return super().delete(*args, **kwargs)
 
     def average_rating(self):
-        ratings = self.ratings.all()
-        if ratings.exists():
-            return ratings.aggregate(models.Avg('rating'))['rating__avg']
+        if self.rating_count:
+            return self.rating_sum / self.rating_count
 
     def __str__(self):
         return f"{self.title}"
 
+    class Meta:
+        indexes = [
+            # Индексы под курсорную пагинацию каталога и списка созданных курсов
+            models.Index(fields=['approval', 'created', 'id'], name='course_approval_created_idx'),
+            models.Index(fields=['creator', 'created', 'id'], name='course_creator_created_idx'),
+        ]
+
+
+class Enrollment(models.Model):
+    """
+    Модель записи пользователя на курс.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='enrollments', on_delete=models.CASCADE)
+    course = models.ForeignKey(Course, related_name='enrollments', on_delete=models.CASCADE)
+    enrolled_at = models.DateTimeField(auto_now_add=True)
+
     if TYPE_CHECKING:
         objects: Manager
 
+    class Meta:
+        constraints = [
+            # Индекс (user, course) покрывает проверку доступа и список курсов пользователя
+            models.UniqueConstraint(fields=['user', 'course'], name='enrollment_user_course_unique'),
+        ]
 
-class Module(models.Model):
+    def __str__(self):
+        return f'{self.user_id} -> {self.course_id}'
+
+    def save(self, *args, **kwargs):
+        """
+        Сохраняет запись и в той же транзакции увеличивает счетчик записей курса.
+        """
+        adding = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if adding:
+                Course.objects.filter(pk=self.course_id).update(enrollment_count=F('enrollment_count') + 1)
+
+    @classmethod
+    def enroll(cls, user, course) -> bool:
+        """
+        Идемпотентно записывает пользователя на курс.
+
+        :param user: Пользователь.
+        :param course: Курс.
+        :return: True, если запись создана, False, если пользователь уже записан.
+        """
+        try:
+            with transaction.atomic():
+                cls.objects.create(user=user, course=course)
+        except IntegrityError:
+            return False
+        return True
+
+    @classmethod
+    def is_enrolled(cls, user, course) -> bool:
+        """
+        Проверяет запись пользователя на курс запросом EXISTS по уникальному индексу.
+        """
+        return cls.objects.filter(user=user, course=course).exists()
+
+
+class Module(TouchParentsMixin, models.Model):
     """
     Модель модуля курса.
     """
     course = models.ForeignKey(Course, related_name='modules', on_delete=models.CASCADE)
     title = models.CharField(max_length=200)
     order = OrderField(blank=True, for_fields=['course'])
-
-    if TYPE_CHECKING:
-        objects: Manager
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = DeleteRootQuerySet.as_manager()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._stored_course_id = instance.__dict__.get('course_id')
+        return instance
+
+    def save(self, *args, **kwargs):
+        """
+        Сохраняет модуль и при переносе в другой курс обновляет Content.course его контента.
+        """
+        stored_course_id = getattr(self, '_stored_course_id', None)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if stored_course_id is not None and stored_course_id != self.course_id:
+                Content.objects.filter(lesson__module=self).update(course_id=self.course_id)
+        self._stored_course_id = self.course_id
+
+    def touch_parents(self) -> None:
+        touch(Course.objects.filter(pk=self.course_id))
 
     def __str__(self):
         return f'{self.order}. {self.title}'
@@ -111,13 +343,35 @@ class Module(models.Model):
         ordering = ['order']
 
 
-class Lesson(models.Model):
+class Lesson(TouchParentsMixin, models.Model):
     module = models.ForeignKey(Module, related_name='lessons', on_delete=models.CASCADE)
     title = models.CharField(max_length=200)
     order = OrderField(blank=True, for_fields=['module'])
-
-    if TYPE_CHECKING:
-        objects: Manager
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = DeleteRootQuerySet.as_manager()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._stored_module_id = instance.__dict__.get('module_id')
+        return instance
+
+    def save(self, *args, **kwargs):
+        """
+        Сохраняет урок и при переносе в другой модуль обновляет Content.course его контента.
+        """
+        stored_module_id = getattr(self, '_stored_module_id', None)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if stored_module_id is not None and stored_module_id != self.module_id:
+                course_id = Module.objects.filter(pk=self.module_id).values('course_id')
+                Content.objects.filter(lesson=self).update(course_id=Subquery(course_id[:1]))
+        self._stored_module_id = self.module_id
+
+    def touch_parents(self) -> None:
+        touch(Module.objects.filter(pk=self.module_id))
+        touch(Course.objects.filter(modules=self.module_id))
 
     def __str__(self):
         return f'{self.order}. {self.title}'
@@ -126,11 +380,14 @@ class Lesson(models.Model):
         ordering = ['order']
 
 
-class Content(models.Model):
+class Content(TouchParentsMixin, models.Model):
     """
     Модель контента курса.
     """
     lesson = models.ForeignKey(Lesson, related_name='contents', on_delete=models.CASCADE)
+    # Курс урока, денормализован для выборок по курсу без JOIN через урок и модуль.
+    # Заполняется в save(), при переносе урока или модуля обновляется в их save()
+    course = models.ForeignKey(Course, related_name='contents', on_delete=models.CASCADE, editable=False)
     content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE,
                                      limit_choices_to={
                                          'model__in':
@@ -147,22 +404,67 @@ class Content(models.Model):
     object_id = models.PositiveIntegerField()
     item = GenericForeignKey('content_type', 'object_id')
     order = OrderField(blank=True, for_fields=['lesson'])
-
-    if TYPE_CHECKING:
-        objects: Manager
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = DeleteRootQuerySet.as_manager()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._stored_lesson_id = instance.__dict__.get('lesson_id')
+        return instance
+
+    def save(self, *args, **kwargs):
+        """
+        Сохраняет контент, заполняя курс по уроку при создании и при переносе в другой урок.
+        """
+        if self.course_id is None or getattr(self, '_stored_lesson_id', self.lesson_id) != self.lesson_id:
+            self.course_id = Module.objects.filter(lessons=self.lesson_id).values_list('course_id', flat=True).get()
+        super().save(*args, **kwargs)
+        self._stored_lesson_id = self.lesson_id
+
+    def touch_parents(self) -> None:
+        touch(Lesson.objects.filter(pk=self.lesson_id))
+        touch(Module.objects.filter(lessons=self.lesson_id))
+        touch(Course.objects.filter(pk=self.course_id))
 
     class Meta:
         ordering = ['order']
+        indexes = [
+            # Поиск контента по элементу (GenericForeignKey в обратную сторону)
+            models.Index(fields=['content_type', 'object_id'], name='content_item_idx'),
+            # Выборка контента определенного типа по курсу, например заданий преподавателя
+            models.Index(fields=['course', 'content_type'], name='content_course_type_idx'),
+        ]
 
     def __str__(self):
         return str(self.item)
 
 
-class ItemBase(models.Model):
+def touch_item_parents(model, item_id) -> None:
+    """
+    Обновляет updated_at у контента, уроков, модулей и курсов, в которые входит элемент.
+    """
+    content_type = ContentType.objects.get_for_model(model)
+    touch(Content.objects.filter(content_type=content_type, object_id=item_id))
+    touch(Lesson.objects.filter(contents__content_type=content_type, contents__object_id=item_id))
+    touch(Module.objects.filter(
+        lessons__contents__content_type=content_type,
+        lessons__contents__object_id=item_id,
+    ))
+    touch(Course.objects.filter(contents__content_type=content_type, contents__object_id=item_id))
+
+
+class ItemBase(TouchParentsMixin, models.Model):
     """
     Абстрактная базовая модель контента.
     """
     title = models.CharField(max_length=250)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Новый элемент еще не входит ни в один Content
+    touch_parents_on_create = False
+
+    objects = DeleteRootQuerySet.as_manager()
 
     class Meta:
         abstract = True
@@ -170,6 +472,9 @@ class ItemBase(models.Model):
     def __str__(self):
         return self.title
 
+    def touch_parents(self) -> None:
+        touch_item_parents(type(self), self.pk)
+
 
 class Text(ItemBase):
     """
@@ -182,7 +487,9 @@ class File(ItemBase):
     """
     Модель файла контента.
     """
-    file = models.FileField(upload_to=course_files_directory_path)
+    # Индекс по имени файла нужен проверке прав при скачивании (catalog.media)
+    file = models.FileField(upload_to=course_files_directory_path, storage=hashed_storage, max_length=255,
+                            db_index=True)
 
     def delete(self, *args, **kwargs):
         storage, path = self.file.storage, self.file.path
@@ -194,7 +501,8 @@ class Image(ItemBase):
     """
     Модель изображения контента.
     """
-    file = models.FileField(upload_to=course_images_directory_path)
+    file = models.FileField(upload_to=course_images_directory_path, storage=hashed_storage, max_length=255,
+                            db_index=True)
 
 
 class Video(ItemBase):
@@ -214,7 +522,7 @@ class Question(ItemBase):
     #     return self.text
 
 
-class Answer(models.Model):
+class Answer(TouchParentsMixin, models.Model):
     """
     Модель текста ответа теста.
     """
@@ -222,6 +530,10 @@ class Answer(models.Model):
     text = models.CharField(max_length=300)
     is_true = models.BooleanField(default=False)
 
+    def touch_parents(self) -> None:
+        touch(Question.objects.filter(pk=self.question_id))
+        touch_item_parents(Question, self.question_id)
+
     # def __str__(self):
     #     return self.text
 
@@ -259,16 +571,42 @@ class TaskSubmission(models.Model):
     """
     task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name="submissions")
     student = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="submissions")
-    file = models.FileField(upload_to=course_tasks_directory_path)
+    file = models.FileField(upload_to=course_tasks_directory_path, storage=hashed_storage, max_length=255,
+                            db_index=True)
     submitted_at = models.DateTimeField(auto_now_add=True)
+    # Есть ли оценка (TaskReview с is_correct), поддерживается в TaskReview.save и в сигнале post_delete
+    reviewed = models.BooleanField(default=False)
+    # Аренда ответа проверяющим из очереди проверки (catalog.reviews)
+    lease_owner = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL,
+                                    related_name='+')
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         unique_together = ("task", "student")
         ordering = ["-submitted_at"]
+        indexes = [
+            models.Index(fields=['task', 'submitted_at', 'id'], name='submission_task_submitted_idx'),
+            # Частичный индекс очереди проверки: в нем только ответы без оценки
+            models.Index(fields=['task', 'submitted_at', 'id'], condition=Q(reviewed=False),
+                         name='submission_pending_idx'),
+        ]
 
     if TYPE_CHECKING:
         objects: Manager
 
+    @classmethod
+    def refresh_review_state(cls, submission_ids) -> None:
+        """
+        Пересчитывает флаг reviewed по оценкам и снимает аренду с ответов.
+
+        :param submission_ids: Идентификаторы ответов.
+        """
+        cls.objects.filter(pk__in=submission_ids).update(
+            reviewed=Exists(TaskReview.objects.filter(task_submission=OuterRef('pk'), is_correct__isnull=False)),
+            lease_owner=None,
+            lease_expires_at=None,
+        )
+
 
 class TaskReview(models.Model):
     """
@@ -281,22 +619,281 @@ class TaskReview(models.Model):
     if TYPE_CHECKING:
         objects: Manager
 
+    def save(self, *args, **kwargs):
+        """
+        Сохраняет оценку и в той же транзакции обновляет состояние проверки ответа.
+        """
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            TaskSubmission.refresh_review_state([self.task_submission_id])
+
 
 def comments_content_directory_path(instance: "Comment", filename: str):
     ...
 
 
-class CommentContent(models.Model):
+class CommentContent(TouchParentsMixin, models.Model):
     """
     Модель комментария к занятию
     """
     content = models.ForeignKey(Content, related_name="comments", on_delete=models.CASCADE)
     author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     text = models.TextField()
+
+    def touch_parents(self) -> None:
+        # Комментарии показываются только в ответе контента
+        touch(Content.objects.filter(pk=self.content_id))
     # attach_file = models.FileField(upload_to=comments_content_directory_path)
 
 
+class UploadSession(models.Model):
+    """
+    Сессия загрузки файла частями (catalog.uploads).
+    Части пишутся сразу в итоговый файл хранилища ``path``, ``offset`` - число записанных байт.
+    После завершения файл прикрепляется к ответу на задание, файлу или изображению урока.
+    """
+    TARGET_SUBMISSION = 'submission'
+    TARGET_FILE = 'file'
+    TARGET_IMAGE = 'image'
+    TARGET_CHOICES = [
+        (TARGET_SUBMISSION, 'Task submission'),
+        (TARGET_FILE, 'Lesson file'),
+        (TARGET_IMAGE, 'Lesson image'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='upload_sessions')
+    target = models.CharField(max_length=16, choices=TARGET_CHOICES)
+    # Задание (для ответа) или урок (для файла и изображения)
+    content = models.ForeignKey(Content, null=True, blank=True, on_delete=models.CASCADE, related_name='+')
+    lesson = models.ForeignKey(Lesson, null=True, blank=True, on_delete=models.CASCADE, related_name='+')
+    title = models.CharField(max_length=250, blank=True)
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    offset = models.PositiveBigIntegerField(default=0)
+    # Ожидаемая SHA-256 всего файла в hex, проверяется при завершении
+    sha256 = models.CharField(max_length=64, blank=True)
+    path = models.CharField(max_length=500)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    if TYPE_CHECKING:
+        objects: Manager
+
+
+class CourseTree(models.Model):
+    """
+    Материализованная структура курса: модули -> уроки -> заголовки контента.
+    Строится в catalog.tree и сбрасывается сигналами при изменении структуры.
+    """
+    course = models.OneToOneField(Course, primary_key=True, related_name='tree', on_delete=models.CASCADE)
+    data = models.JSONField()
+    built_at = models.DateTimeField(auto_now=True)
+
+    if TYPE_CHECKING:
+        objects: Manager
+
+
+class CourseSearchIndex(models.Model):
+    """
+    Полнотекстовый индекс курсов на SQLite: виртуальная таблица FTS5, rowid которой равен id курса.
+    Таблица создается миграцией только на SQLite и заполняется сигналами catalog.search.
+    Используется только для чтения через ORM.
+    """
+    course = models.OneToOneField(Course, primary_key=True, db_column='rowid', related_name='search_index',
+                                  on_delete=models.DO_NOTHING, db_constraint=False)
+    title = models.TextField()
+    target_description = models.TextField()
+    description = models.TextField()
+    # Скрытые колонки FTS5: ранг bm25 (меньше - лучше) и колонка для MATCH
+    rank = models.FloatField()
+    document = FTS5MatchField(db_column='catalog_course_fts')
+
+    class Meta:
+        managed = False
+        db_table = 'catalog_course_fts'
+
+    if TYPE_CHECKING:
+        objects: Manager
+
+
 @receiver(post_delete, sender=File)
 def auto_delete_file(sender, instance, **kwargs):
     if instance.file:
         instance.file.delete(False)
+
+
+@receiver(post_delete, sender=Enrollment)
+def decrease_course_enrollment(sender, instance, **kwargs):
+    if is_cascade_deleted(instance):
+        return
+    Course.objects.filter(pk=instance.course_id).update(enrollment_count=F('enrollment_count') - 1)
+
+
+@receiver(post_delete, sender=TaskReview)
+def refresh_submission_review_state(sender, instance, **kwargs):
+    if is_cascade_deleted(instance):
+        return
+    TaskSubmission.refresh_review_state([instance.task_submission_id])
+
+
+@receiver(post_delete, sender=CourseRating)
+def decrease_course_rating(sender, instance, **kwargs):
+    if is_cascade_deleted(instance):
+        return
+    Course.objects.filter(pk=instance.course_id).update(
+        rating_count=F('rating_count') - 1,
+        rating_sum=F('rating_sum') - instance.rating,
+        updated_at=timezone.now(),
+    )
+
+
+@receiver(post_delete, sender=Module)
+@receiver(post_delete, sender=Lesson)
+@receiver(post_delete, sender=Content)
+@receiver(post_delete, sender=Text)
+@receiver(post_delete, sender=File)
+@receiver(post_delete, sender=Image)
+@receiver(post_delete, sender=Video)
+@receiver(post_delete, sender=Question)
+@receiver(post_delete, sender=Task)
+@receiver(post_delete, sender=Answer)
+@receiver(post_delete, sender=CommentContent)
+def touch_deleted_parents(sender, instance, **kwargs):
+    if not is_cascade_deleted(instance):
+        instance.touch_parents()
+
+
+def invalidate_course_caches(slugs, catalog=False) -> None:
+    """
+    Сбрасывает поколения кэша ответов по курсам (и каталогу) сразу и повторно после коммита,
+    чтобы ответ, закэшированный параллельно по незакоммиченным данным, не пережил транзакцию.
+    """
+    scopes = [course_scope(slug) for slug in slugs]
+    if catalog:
+        scopes.append(CATALOG_SCOPE)
+    if not scopes:
+        return
+    bump_generation(*scopes)
+    transaction.on_commit(lambda: bump_generation(*scopes))
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+def invalidate_course_cache(sender, instance, **kwargs):
+    slugs = {instance.slug, getattr(instance, '_stored_slug', None)} - {None}
+    invalidate_course_caches(slugs, catalog=True)
+
+
+# Поля пользователя, из которых сериализаторы курса собирают creator_username
+CREATOR_NAME_FIELDS = ('username', 'first_name', 'last_name')
+
+
+@receiver(pre_save, sender=settings.AUTH_USER_MODEL)
+def remember_creator_name_change(sender, instance, **kwargs):
+    # После сохранения DirtyFieldsMixin сбрасывает состояние, поэтому изменения определяются до него
+    dirty_fields = instance.get_dirty_fields() if instance.pk else {}
+    instance._creator_name_changed = any(field in dirty_fields for field in CREATOR_NAME_FIELDS)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def touch_creator_courses(sender, instance, created, **kwargs):
+    # Имя создателя входит в кэшированные ответы и ETag курсов
+    if created or not getattr(instance, '_creator_name_changed', False):
+        return
+    courses = Course.objects.filter(creator_id=instance.pk)
+    slugs = list(courses.values_list('slug', flat=True))
+    if slugs:
+        touch(courses)
+        invalidate_course_caches(slugs, catalog=True)
+
+
+@receiver(post_save, sender=CourseRating)
+@receiver(post_delete, sender=CourseRating)
+def invalidate_rating_course_cache(sender, instance, **kwargs):
+    if is_cascade_deleted(instance):
+        return
+    slugs = Course.objects.filter(pk=instance.course_id).values_list('slug', flat=True)
+    invalidate_course_caches(list(slugs), catalog=True)
+
+
+@receiver(post_save, sender=Enrollment)
+@receiver(post_delete, sender=Enrollment)
+def invalidate_enrollment_catalog_cache(sender, instance, **kwargs):
+    if is_cascade_deleted(instance):
+        return
+    # Карточки каталога показывают число записей на курс
+    invalidate_course_caches((), catalog=True)
+
+
+def invalidate_course_trees(courses) -> None:
+    """
+    Сбрасывает материализованные структуры курсов и поколения их кэша сразу и повторно
+    после коммита, чтобы структура, собранная параллельно по незакоммиченным данным,
+    не осталась в таблице.
+    """
+    courses = list(courses.values_list('id', 'slug').distinct())
+    if not courses:
+        return
+    trees = CourseTree.objects.filter(course_id__in=[course_id for course_id, _ in courses])
+    trees.delete()
+    transaction.on_commit(trees.delete)
+    invalidate_course_caches([slug for _, slug in courses])
+
+
+@receiver(post_save, sender=Course)
+def invalidate_saved_course_tree(sender, instance, created, **kwargs):
+    # Структура хранит название и slug курса; поколения кэша сбрасывает invalidate_course_cache
+    if created:
+        return
+    trees = CourseTree.objects.filter(course_id=instance.pk)
+    trees.delete()
+    transaction.on_commit(trees.delete)
+
+
+@receiver(post_save, sender=Module)
+@receiver(post_delete, sender=Module)
+def invalidate_module_course_tree(sender, instance, **kwargs):
+    if is_cascade_deleted(instance):
+        return
+    invalidate_course_trees(Course.objects.filter(pk=instance.course_id))
+
+
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Lesson)
+def invalidate_lesson_course_tree(sender, instance, **kwargs):
+    if is_cascade_deleted(instance):
+        return
+    invalidate_course_trees(Course.objects.filter(modules=instance.module_id))
+
+
+@receiver(post_save, sender=Content)
+@receiver(post_delete, sender=Content)
+def invalidate_content_course_tree(sender, instance, **kwargs):
+    if is_cascade_deleted(instance):
+        return
+    invalidate_course_trees(Course.objects.filter(modules__lessons=instance.lesson_id))
+
+
+@receiver(post_save, sender=Text)
+@receiver(post_save, sender=File)
+@receiver(post_save, sender=Image)
+@receiver(post_save, sender=Video)
+@receiver(post_save, sender=Question)
+@receiver(post_save, sender=Task)
+@receiver(post_delete, sender=Text)
+@receiver(post_delete, sender=File)
+@receiver(post_delete, sender=Image)
+@receiver(post_delete, sender=Video)
+@receiver(post_delete, sender=Question)
+@receiver(post_delete, sender=Task)
+def invalidate_item_course_tree(sender, instance, created=False, **kwargs):
+    if created:
+        # Новый элемент попадает в структуру только вместе с Content
+        return
+    content_type = ContentType.objects.get_for_model(sender)
+    invalidate_course_trees(Course.objects.filter(
+        modules__lessons__contents__content_type=content_type,
+        modules__lessons__contents__object_id=instance.pk,
+    ))
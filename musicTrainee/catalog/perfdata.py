@@ -0,0 +1,253 @@
+"""
+Генератор синтетических данных для бенчмарков и тестов числа запросов.
+
+Создает пользователей, курсы с модулями, уроками и контентом всех типов, ответы на вопросы,
+записи на курсы, оценки, ответы на задания с проверками и комментарии. Строки вставляются
+через ``bulk_create`` пачками, пароли всех пользователей - один заранее посчитанный хеш,
+выбор студентов определяется ``seed``: одинаковые параметры дают одинаковые данные.
+
+``bulk_create`` не вызывает ``save()`` и не отправляет сигналы, поэтому генератор сам
+заполняет то, что обычно поддерживают модели: порядок (OrderField), ``Content.course``,
+агрегаты оценок и записей курса, ``TaskSubmission.reviewed`` и индекс поиска FTS5.
+Структуры курсов (CourseTree) строятся при первом запросе. Файлы заданий, изображений
+и файлов контента на диск не пишутся, в базе сохраняются только пути.
+
+Генератор рассчитан на пустую базу (или новый ``prefix``): кэши ответов уже запущенного
+сервера не сбрасываются.
+"""
+
+import random
+import time
+from typing import Callable, NamedTuple, Optional
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+
+from accounts.models import CustomAccount, user_avatar_path_default
+from .models import Course, Enrollment, CourseRating, Module, Lesson, Content, Text, File, Image, Video, Question, \
+    Answer, Task, TaskSubmission, TaskReview, CommentContent
+from .search import bulk_update_course_search_index
+
+# Примерное число строк, вставляемых в одной транзакции
+CHUNK_ROWS = 50000
+
+
+class Fanout(NamedTuple):
+    """
+    Размеры генерируемых данных. Значения по умолчанию дают около миллиона строк.
+    """
+    # Студентов
+    users: int = 10000
+    # Авторов курсов
+    creators: int = 100
+    # Курсов у автора, из них последние ``drafts`` не опубликованы
+    courses: int = 10
+    drafts: int = 1
+    # Модулей в курсе и уроков в модуле
+    modules: int = 5
+    lessons: int = 5
+    # Ответов на вопрос урока (в каждом уроке по одному элементу каждого типа)
+    answers: int = 3
+    # Записей и оценок на курс
+    enrollments: int = 100
+    ratings: int = 30
+    # Ответов на задание, из них ``reviews`` проверены
+    submissions: int = 10
+    reviews: int = 5
+    # Комментариев к заданию урока
+    comments: int = 2
+
+
+class PerfDataGenerator:
+    """
+    Генератор данных по размерам ``Fanout``.
+
+    :param fanout: Размеры данных.
+    :param seed: Зерно выбора студентов и оценок.
+    :param prefix: Префикс имен пользователей и slug курсов.
+    :param password: Пароль всех пользователей.
+    :param batch_size: Строк в одном INSERT.
+    :param log: Функция вывода прогресса.
+    """
+
+    def __init__(self, fanout: Fanout = Fanout(), seed: int = 0, prefix: str = 'perf', password: str = 'password',
+                 batch_size: int = 1000, log: Optional[Callable[[str], None]] = None):
+        if fanout.ratings > fanout.enrollments or fanout.submissions > fanout.enrollments:
+            raise ValueError('ratings and submissions must not exceed enrollments')
+        if fanout.enrollments > fanout.users:
+            raise ValueError('enrollments must not exceed users')
+        if fanout.reviews > fanout.submissions or fanout.drafts > fanout.courses:
+            raise ValueError('reviews must not exceed submissions, drafts must not exceed courses')
+        self.fanout = fanout
+        self.random = random.Random(seed)
+        self.prefix = prefix
+        self.password = password
+        self.batch_size = batch_size
+        self.log = log or (lambda message: None)
+        self.counts = {}
+        self.content_types = {
+            model: ContentType.objects.get_for_model(model).id
+            for model in (Text, File, Image, Video, Question, Answer, Task)
+        }
+
+    def bulk_create(self, model, objects: list) -> list:
+        objects = model.objects.bulk_create(objects, batch_size=self.batch_size)
+        label = model._meta.label
+        self.counts[label] = self.counts.get(label, 0) + len(objects)
+        return objects
+
+    def create_users(self) -> tuple:
+        password = make_password(self.password)
+        avatar = user_avatar_path_default()
+
+        def account(username: str, **kwargs) -> CustomAccount:
+            return CustomAccount(username=username, email=f'{username}@example.com', password=password, avatar=avatar,
+                                 is_activated=True, **kwargs)
+
+        with transaction.atomic():
+            self.bulk_create(CustomAccount, [
+                account(f'{self.prefix}-moderator', is_moderator=True),
+                account(f'{self.prefix}-admin', is_staff=True),
+            ])
+            creators = self.bulk_create(CustomAccount, [
+                account(f'{self.prefix}-creator-{index}') for index in range(self.fanout.creators)
+            ])
+            students = self.bulk_create(CustomAccount, [
+                account(f'{self.prefix}-student-{index}') for index in range(self.fanout.users)
+            ])
+        return creators, students
+
+    def create_courses(self, creators: list, students: list) -> list:
+        """
+        Создает курсы с записями и оценками. Агрегаты курса считаются до вставки.
+        """
+        fanout = self.fanout
+        courses, enrollments, ratings = [], [], []
+        for creator_index, creator in enumerate(creators):
+            for index in range(fanout.courses):
+                number = creator_index * fanout.courses + index
+                enrolled = self.random.sample(students, fanout.enrollments)
+                scores = [(student, self.random.randint(1, 5)) for student in enrolled[:fanout.ratings]]
+                course = Course(
+                    creator=creator, title=f'Course {number}', slug=f'{self.prefix}-course-{number}',
+                    description=f'Description of course {number}', target_description='Synthetic course',
+                    price=0 if number % 2 else 10, approval=index < fanout.courses - fanout.drafts,
+                    rating_count=len(scores), rating_sum=sum(score for _, score in scores),
+                    enrollment_count=len(enrolled),
+                )
+                courses.append((course, enrolled))
+                enrollments.extend(Enrollment(user=student, course=course) for student in enrolled)
+                ratings.extend(
+                    CourseRating(course=course, user=student, rating=score, review=f'Review {score}')
+                    for student, score in scores
+                )
+
+        with transaction.atomic():
+            self.bulk_create(Course, [course for course, _ in courses])
+            bulk_update_course_search_index([course for course, _ in courses])
+            self.bulk_create(Enrollment, enrollments)
+            self.bulk_create(CourseRating, ratings)
+        # Студенты курса нужны для ответов на задания и комментариев
+        self.enrolled = {course.pk: enrolled for course, enrolled in courses}
+        return [course for course, _ in courses]
+
+    def create_lessons(self, courses: list) -> list:
+        modules = [
+            Module(course=course, title=f'Module {index}', order=index)
+            for course in courses for index in range(self.fanout.modules)
+        ]
+        self.bulk_create(Module, modules)
+        lessons = [
+            Lesson(module=module, title=f'Lesson {index}', order=index)
+            for module in modules for index in range(self.fanout.lessons)
+        ]
+        return self.bulk_create(Lesson, lessons)
+
+    def create_contents(self, lessons: list) -> list:
+        """
+        Создает по элементу каждого типа на урок, ответы на вопросы и Content для всех элементов.
+
+        :return: Content заданий уроков.
+        """
+        texts = self.bulk_create(Text, [Text(title='Text', content='Lesson text') for _ in lessons])
+        files = self.bulk_create(File, [File(title='File', file='courses/perf/sheet.pdf') for _ in lessons])
+        images = self.bulk_create(Image, [Image(title='Image', file='courses/perf/image.png') for _ in lessons])
+        videos = self.bulk_create(Video, [Video(title='Video', url='https://example.com/video') for _ in lessons])
+        questions = self.bulk_create(Question, [Question(title='Question', text='Question text') for _ in lessons])
+        tasks = self.bulk_create(Task, [Task(title='Task', description='Task description') for _ in lessons])
+        answers = self.bulk_create(Answer, [
+            Answer(question=question, text=f'Answer {index}', is_true=index == 0)
+            for question in questions for index in range(self.fanout.answers)
+        ])
+
+        contents = []
+        for position, lesson in enumerate(lessons):
+            lesson_answers = answers[position * self.fanout.answers:(position + 1) * self.fanout.answers]
+            items = [texts[position], files[position], images[position], videos[position], questions[position],
+                     *lesson_answers, tasks[position]]
+            contents.extend(
+                Content(lesson=lesson, course_id=lesson.module.course_id, content_type_id=self.content_types[type(item)],
+                        object_id=item.pk, order=order)
+                for order, item in enumerate(items)
+            )
+        contents = self.bulk_create(Content, contents)
+        # Задание - последний элемент урока
+        per_lesson = len(contents) // len(lessons)
+        return contents[per_lesson - 1::per_lesson]
+
+    def create_submissions(self, task_contents: list) -> None:
+        fanout = self.fanout
+        submissions, comments = [], []
+        for content in task_contents:
+            enrolled = self.enrolled[content.course_id]
+            for index, student in enumerate(self.random.sample(enrolled, fanout.submissions)):
+                submissions.append(TaskSubmission(
+                    task_id=content.object_id, student=student,
+                    file=f'courses/perf/tasks/answer-{content.object_id}-{student.pk}.mp3',
+                    reviewed=index < fanout.reviews,
+                ))
+            comments.extend(
+                CommentContent(content=content, author=author, text='Comment')
+                for author in self.random.choices(enrolled, k=fanout.comments)
+            )
+        submissions = self.bulk_create(TaskSubmission, submissions)
+        self.bulk_create(TaskReview, [
+            TaskReview(task_submission=submission, is_correct=self.random.random() < 0.8, comment='Review')
+            for submission in submissions if submission.reviewed
+        ])
+        self.bulk_create(CommentContent, comments)
+
+    def generate(self) -> dict:
+        """
+        Создает данные.
+
+        :return: Число созданных строк по моделям.
+        """
+        started = time.monotonic()
+        creators, students = self.create_users()
+        self.log(f'{len(creators) + len(students) + 2} users')
+        courses = self.create_courses(creators, students)
+        self.log(f'{len(courses)} courses')
+
+        # Содержимое курсов вставляется частями примерно по CHUNK_ROWS строк, по транзакции на часть
+        fanout = self.fanout
+        rows_per_lesson = 14 + 2 * fanout.answers + fanout.submissions + fanout.reviews + fanout.comments
+        step = max(1, CHUNK_ROWS // (fanout.modules * max(fanout.lessons, 1) * rows_per_lesson or 1))
+        for start in range(0, len(courses), step):
+            with transaction.atomic():
+                lessons = self.create_lessons(courses[start:start + step])
+                if lessons:
+                    self.create_submissions(self.create_contents(lessons))
+            self.log(f'{min(start + step, len(courses))}/{len(courses)} courses filled, '
+                     f'{sum(self.counts.values())} rows, {time.monotonic() - started:.1f}s')
+        return self.counts
+
+
+def generate_perf_data(fanout: Fanout = Fanout(), **kwargs) -> dict:
+    """
+    Создает синтетические данные, параметры - как у PerfDataGenerator.
+
+    :return: Число созданных строк по моделям.
+    """
+    return PerfDataGenerator(fanout, **kwargs).generate()
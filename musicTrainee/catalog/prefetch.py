@@ -0,0 +1,73 @@
+"""
+Пакетная подгрузка контента уроков.
+
+``Content.item`` — это GenericForeignKey, и обращение к нему в цикле дает
+отдельный SELECT на каждый элемент. Здесь собраны prefetch-выражения, которые
+группируют строки Content по ``content_type_id`` и загружают элементы одним
+запросом ``IN`` на каждый тип, а ответы на вопросы — одним запросом на все вопросы.
+"""
+
+from django.contrib.contenttypes.prefetch import GenericPrefetch
+from django.db.models import Prefetch, prefetch_related_objects, aprefetch_related_objects
+
+from .models import Content, Text, File, Image, Video, Question, Answer, Task
+
+
+def content_item_prefetch(lookup: str = 'item') -> GenericPrefetch:
+    """
+    Prefetch элементов контента по всем типам.
+
+    :param lookup: Путь до GenericForeignKey.
+    :return: Выражение GenericPrefetch.
+    """
+    return GenericPrefetch(lookup, [
+        Text.objects.all(),
+        File.objects.all(),
+        Image.objects.all(),
+        Video.objects.all(),
+        Question.objects.prefetch_related('answer_set'),
+        Answer.objects.all(),
+        Task.objects.all(),
+    ])
+
+
+def content_queryset():
+    """
+    Queryset контента с типом и элементами, загруженными пакетно.
+    """
+    return Content.objects.select_related('content_type').prefetch_related(content_item_prefetch())
+
+
+def lesson_contents_prefetch(lookup: str = 'contents') -> Prefetch:
+    """
+    Prefetch контента уроков вместе с элементами.
+
+    :param lookup: Путь от модели до контента урока.
+    :return: Выражение Prefetch.
+    """
+    return Prefetch(lookup, queryset=content_queryset())
+
+
+def prefetch_lesson_contents(lessons) -> None:
+    """
+    Подгружает контент для уже загруженных уроков.
+
+    :param lessons: Список уроков.
+    """
+    prefetch_related_objects(list(lessons), lesson_contents_prefetch())
+
+
+async def aprefetch_lesson_contents(lessons) -> None:
+    """
+    Асинхронный вариант ``prefetch_lesson_contents``.
+    """
+    await aprefetch_related_objects(list(lessons), lesson_contents_prefetch())
+
+
+def prefetch_content_items(contents) -> None:
+    """
+    Подгружает элементы для уже загруженного контента.
+
+    :param contents: Список объектов Content.
+    """
+    prefetch_related_objects(list(contents), content_item_prefetch())
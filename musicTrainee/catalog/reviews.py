@@ -0,0 +1,150 @@
+"""
+Очередь проверки ответов на задания курсов преподавателя.
+
+Проверяющий арендует следующие N непроверенных ответов на ``REVIEW_LEASE_SECONDS``
+секунд. На PostgreSQL кандидаты выбираются ``SELECT ... FOR UPDATE SKIP LOCKED``,
+поэтому параллельные проверяющие не ждут друг друга и не получают одни и те же
+ответы. На SQLite, где блокировок строк нет, аренда ставится условным UPDATE,
+повторно проверяющим, что ответ свободен; проигравший параллельный запрос
+просто получает меньше ответов.
+
+Оценки можно сохранить пачкой через ``apply_reviews``.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Content, Task, TaskReview, TaskSubmission
+
+
+def get_lease_seconds() -> int:
+    return getattr(settings, 'REVIEW_LEASE_SECONDS', 900)
+
+
+def creator_submissions(user):
+    """
+    Ответы на задания курсов, созданных пользователем.
+    """
+    task_ids = Content.objects.filter(
+        course__creator=user,
+        content_type=ContentType.objects.get_for_model(Task),
+    ).values('object_id')
+    return TaskSubmission.objects.filter(task_id__in=task_ids)
+
+
+def _lease_free(now) -> Q:
+    return Q(lease_expires_at__isnull=True) | Q(lease_expires_at__lte=now)
+
+
+def pending_submissions(user):
+    """
+    Непроверенные и не арендованные ответы в порядке отправки (по частичному индексу).
+    """
+    now = timezone.now()
+    return creator_submissions(user).filter(_lease_free(now), reviewed=False).order_by('submitted_at', 'id')
+
+
+def leased_submissions(user):
+    """
+    Ответы, которые пользователь арендовал и еще не проверил.
+    """
+    return TaskSubmission.objects.filter(
+        lease_owner=user,
+        lease_expires_at__gt=timezone.now(),
+        reviewed=False,
+    ).order_by('submitted_at', 'id')
+
+
+def claim_submissions(user, count: int, lease_seconds=None) -> list:
+    """
+    Арендует для пользователя до ``count`` следующих непроверенных ответов.
+
+    :param user: Проверяющий (создатель курса).
+    :param count: Сколько ответов выдать.
+    :param lease_seconds: Длительность аренды.
+    :return: Арендованные ответы.
+    """
+    now = timezone.now()
+    expires_at = now + timedelta(seconds=lease_seconds or get_lease_seconds())
+
+    with transaction.atomic():
+        candidates = pending_submissions(user)
+        if connection.features.has_select_for_update_skip_locked:
+            candidates = candidates.select_for_update(skip_locked=True, of=('self',))
+        ids = list(candidates.values_list('id', flat=True)[:count])
+        # Условие свободной аренды проверяется повторно в самом UPDATE: без SKIP LOCKED
+        # ответ мог занять параллельный запрос между SELECT и UPDATE
+        TaskSubmission.objects.filter(_lease_free(now), id__in=ids, reviewed=False).update(
+            lease_owner=user,
+            lease_expires_at=expires_at,
+        )
+
+    return list(TaskSubmission.objects.filter(
+        id__in=ids,
+        lease_owner=user,
+        lease_expires_at=expires_at,
+    ).order_by('submitted_at', 'id'))
+
+
+def release_submissions(user, submission_ids) -> int:
+    """
+    Возвращает арендованные пользователем ответы в очередь.
+
+    :return: Число освобожденных ответов.
+    """
+    return TaskSubmission.objects.filter(id__in=submission_ids, lease_owner=user).update(
+        lease_owner=None,
+        lease_expires_at=None,
+    )
+
+
+def apply_reviews(user, reviews) -> list:
+    """
+    Сохраняет оценки пачкой в одной транзакции.
+
+    Принадлежность ответов курсам пользователя проверяется одним запросом,
+    существующие оценки обновляются ``bulk_update``, новые создаются ``bulk_create``.
+
+    :param user: Проверяющий (создатель курса).
+    :param reviews: Проверенные данные: словари с submission_id, is_correct и comment.
+    :return: Результат по каждой оценке в порядке запроса.
+    """
+    submission_ids = [review['submission_id'] for review in reviews]
+
+    with transaction.atomic():
+        owned = set(creator_submissions(user).filter(id__in=submission_ids).values_list('id', flat=True))
+        existing = {}
+        for review in TaskReview.objects.filter(task_submission_id__in=owned).order_by('id'):
+            existing.setdefault(review.task_submission_id, review)
+
+        results, to_create, to_update = [], [], []
+        for data in reviews:
+            submission_id = data['submission_id']
+            if submission_id not in owned:
+                results.append({'submission_id': submission_id, 'status': 'not_found'})
+                continue
+            review = existing.get(submission_id)
+            if review is None:
+                to_create.append(TaskReview(
+                    task_submission_id=submission_id,
+                    is_correct=data['is_correct'],
+                    comment=data.get('comment', ''),
+                ))
+                results.append({'submission_id': submission_id, 'status': 'created'})
+            else:
+                review.is_correct = data['is_correct']
+                review.comment = data.get('comment', review.comment)
+                to_update.append(review)
+                results.append({'submission_id': submission_id, 'status': 'updated'})
+
+        TaskReview.objects.bulk_create(to_create)
+        TaskReview.objects.bulk_update(to_update, ['is_correct', 'comment'])
+        # bulk-операции не вызывают TaskReview.save, поэтому состояние ответов обновляется явно
+        TaskSubmission.refresh_review_state(owned)
+
+    return results
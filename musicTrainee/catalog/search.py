@@ -0,0 +1,127 @@
+"""
+Полнотекстовый поиск курсов по названию, целевому описанию и описанию.
+
+* PostgreSQL: сгенерированная колонка ``catalog_course.search_vector`` (tsvector)
+  с GIN-индексом, ранжирование ``ts_rank``.
+* SQLite: виртуальная таблица FTS5 ``catalog_course_fts`` (модель CourseSearchIndex),
+  которая поддерживается сигналами ниже, ранжирование bm25.
+
+Обе структуры создаются миграцией 0018_course_search. На остальных СУБД
+используется медленный поиск через ``icontains``.
+"""
+
+import re
+
+from django.db import connection
+from django.db.models import Q, F, Value, FloatField, BooleanField
+from django.db.models.expressions import RawSQL
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Course
+
+SEARCH_CONFIG = 'russian'
+
+_TOKEN_RE = re.compile(r'\w+')
+
+
+def _fts5_query(query: str) -> str:
+    # Пользовательский ввод не передается в синтаксис FTS5 напрямую: каждое слово
+    # экранируется кавычками и ищется по префиксу, слова объединяются через AND
+    return ' '.join(f'"{token}"*' for token in _TOKEN_RE.findall(query))
+
+
+def _no_results(queryset):
+    # Пагинация поиска сортирует по search_rank, поэтому он нужен и у пустого результата
+    return queryset.annotate(search_rank=Value(0.0, output_field=FloatField())).none()
+
+
+def search_courses(queryset, query: str):
+    """
+    Фильтрует курсы по поисковому запросу и аннотирует их полем ``search_rank``
+    (чем больше, тем релевантнее).
+
+    :param queryset: QuerySet курсов.
+    :param query: Поисковый запрос.
+    :return: Отфильтрованный QuerySet.
+    """
+    if connection.vendor == 'postgresql':
+        tsquery = f"websearch_to_tsquery('{SEARCH_CONFIG}', %s)"
+        return queryset.annotate(
+            search_match=RawSQL(f'"catalog_course"."search_vector" @@ {tsquery}', (query,),
+                                output_field=BooleanField()),
+            # ts_rank возвращает real: без приведения позиция курсора (float8) не совпадает
+            # с рангом строки при сравнении, и страницы поиска теряют или повторяют курсы
+            search_rank=RawSQL(f'ts_rank("catalog_course"."search_vector", {tsquery})::double precision', (query,),
+                               output_field=FloatField()),
+        ).filter(search_match=True)
+
+    if connection.vendor == 'sqlite':
+        fts_query = _fts5_query(query)
+        if not fts_query:
+            return _no_results(queryset)
+        return queryset.filter(search_index__document__match=fts_query).annotate(
+            search_rank=-F('search_index__rank'),
+        )
+
+    tokens = _TOKEN_RE.findall(query)
+    if not tokens:
+        return _no_results(queryset)
+    condition = Q()
+    for token in tokens:
+        condition &= (
+            Q(title__icontains=token) | Q(target_description__icontains=token) | Q(description__icontains=token)
+        )
+    return queryset.filter(condition).annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+
+def update_course_search_index(course: Course) -> None:
+    """
+    Обновляет запись курса в индексе FTS5 (только SQLite).
+    """
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('DELETE FROM catalog_course_fts WHERE rowid = %s', [course.pk])
+        cursor.execute(
+            'INSERT INTO catalog_course_fts (rowid, title, target_description, description) '
+            'VALUES (%s, %s, %s, %s)',
+            [course.pk, course.title, course.target_description, course.description],
+        )
+
+
+def bulk_update_course_search_index(courses) -> None:
+    """
+    Добавляет курсы в индекс FTS5 одним executemany (только SQLite), например после
+    ``bulk_create``, который не отправляет сигналы post_save.
+
+    :param courses: Сохраненные курсы, которых еще нет в индексе.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            'INSERT INTO catalog_course_fts (rowid, title, target_description, description) '
+            'VALUES (%s, %s, %s, %s)',
+            [(course.pk, course.title, course.target_description, course.description) for course in courses],
+        )
+
+
+def delete_course_search_index(course_id) -> None:
+    """
+    Удаляет запись курса из индекса FTS5 (только SQLite).
+    """
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('DELETE FROM catalog_course_fts WHERE rowid = %s', [course_id])
+
+
+@receiver(post_save, sender=Course)
+def index_course(sender, instance, **kwargs):
+    update_course_search_index(instance)
+
+
+@receiver(post_delete, sender=Course)
+def unindex_course(sender, instance, **kwargs):
+    delete_course_search_index(instance.pk)
@@ -4,7 +4,7 @@ from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
 
 from catalog.models import Course, Module, Text, File, Image, Video, Question, Answer, Task, Content, TaskSubmission, \
-    Lesson, TaskReview, CommentContent, CourseRating
+    Lesson, TaskReview, CommentContent, CourseRating, UploadSession
 
 
 class CourseRatingSerializer(serializers.ModelSerializer):
@@ -91,6 +91,36 @@ class CourseDetailSerializer(serializers.ModelSerializer):
             return None
 
 
+class CourseCardSerializer(CourseDetailSerializer):
+    """
+    Компактное представление курса для списков, без вложенных отзывов
+    """
+    class Meta:
+        model = Course
+        fields = [
+            'id',
+            'title',
+            'target_description',
+            'logo',
+            'price',
+            'creator_username',
+            'created_at_formatted',
+            'approval',
+            'slug',
+            'average_rating',
+            'rating_count',
+            'enrollment_count',
+        ]
+
+
+class CourseRatingHistogramSerializer(serializers.Serializer):
+    """
+    Сериализатор распределения оценок курса
+    """
+    rating = serializers.IntegerField()
+    count = serializers.IntegerField()
+
+
 class PaidCourseCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Course
@@ -228,11 +258,13 @@ class TaskCourseSerializer(serializers.ModelSerializer):
         model = Task
         fields = ['id', 'title', 'description', 'course_title']
 
-    def get_course_title(self, obj):
-        # Получаем курс через Content
-        content = Content.objects.filter(object_id=obj.id, content_type__model='task').first()
+    def get_course_title(self, obj) -> str | None:
+        # Название курса аннотируется в queryset представления (TaskView), запрос - только без аннотации
+        if hasattr(obj, 'course_title'):
+            return obj.course_title
+        content = Content.objects.filter(object_id=obj.id, content_type__model='task').select_related('course').first()
         if content:
-            return content.lesson.module.course.title  # Доступ к курсу через урок и модуль
+            return content.course.title
         return None
 
 
@@ -247,6 +279,101 @@ class TaskSubmissionSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'task', 'student', 'submitted_at']
 
 
+class LeasedTaskSubmissionSerializer(TaskSubmissionSerializer):
+    """
+    Сериализатор ответа, выданного из очереди проверки
+    """
+
+    class Meta(TaskSubmissionSerializer.Meta):
+        fields = TaskSubmissionSerializer.Meta.fields + ['lease_expires_at']
+        read_only_fields = fields
+
+
+class ReviewQueueClaimSerializer(serializers.Serializer):
+    """
+    Сериализатор запроса ответов из очереди проверки
+    """
+    count = serializers.IntegerField(min_value=1, max_value=50, default=10)
+    lease_seconds = serializers.IntegerField(min_value=60, max_value=24 * 60 * 60, required=False)
+
+
+class ReviewQueueReleaseSerializer(serializers.Serializer):
+    """
+    Сериализатор возврата арендованных ответов в очередь проверки
+    """
+    ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=500)
+
+
+class BulkReviewItemSerializer(serializers.Serializer):
+    """
+    Сериализатор одной оценки в пачке
+    """
+    submission_id = serializers.IntegerField()
+    is_correct = serializers.BooleanField()
+    comment = serializers.CharField(required=False, allow_blank=True)
+
+
+class BulkReviewSerializer(serializers.Serializer):
+    """
+    Сериализатор пачки оценок ответов на задания
+    """
+    reviews = BulkReviewItemSerializer(many=True, allow_empty=False, max_length=500)
+
+    def validate_reviews(self, value):
+        submission_ids = [review['submission_id'] for review in value]
+        if len(submission_ids) != len(set(submission_ids)):
+            raise serializers.ValidationError('Each submission can be reviewed only once per request.')
+        return value
+
+
+class BulkReviewResultSerializer(serializers.Serializer):
+    """
+    Сериализатор результата сохранения оценки из пачки
+    """
+    submission_id = serializers.IntegerField()
+    status = serializers.ChoiceField(choices=['created', 'updated', 'not_found'])
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    """
+    Сериализатор состояния сессии загрузки файла частями
+    """
+
+    class Meta:
+        model = UploadSession
+        fields = ['id', 'target', 'content', 'lesson', 'title', 'filename', 'size', 'offset', 'sha256',
+                  'created_at', 'completed_at']
+        read_only_fields = fields
+
+
+class UploadSessionCreateSerializer(serializers.Serializer):
+    """
+    Сериализатор создания сессии загрузки файла частями
+    """
+    target = serializers.ChoiceField(choices=UploadSession.TARGET_CHOICES)
+    content_id = serializers.IntegerField(required=False)
+    lesson_id = serializers.IntegerField(required=False)
+    title = serializers.CharField(max_length=250, required=False, allow_blank=True, default='')
+    filename = serializers.CharField(max_length=255)
+    size = serializers.IntegerField(min_value=1)
+    sha256 = serializers.RegexField(r'^[0-9a-fA-F]{64}$', required=False, allow_blank=True, default='')
+
+    def validate_filename(self, value):
+        # В имени файла остается только последняя часть пути
+        value = value.replace('\\', '/').rsplit('/', 1)[-1]
+        if value in ('', '.', '..'):
+            raise serializers.ValidationError('Invalid file name.')
+        return value
+
+    def validate(self, attrs):
+        if attrs['target'] == UploadSession.TARGET_SUBMISSION:
+            if attrs.get('content_id') is None:
+                raise serializers.ValidationError({'content_id': 'This field is required for task submissions.'})
+        elif attrs.get('lesson_id') is None:
+            raise serializers.ValidationError({'lesson_id': 'This field is required for lesson files.'})
+        return attrs
+
+
 class TaskReviewSerializer(serializers.ModelSerializer):
     class Meta:
         model = TaskReview
@@ -359,27 +486,29 @@ class LessonSerializer(serializers.ModelSerializer):
         fields = ['id', 'title', 'contents']
         # fields = ['id', 'title']
 
+    # Ключ заголовка элемента в ответе по типу элемента
+    content_keys = {
+        Text: 'text_content',
+        File: 'file_content',
+        Image: 'image_content',
+        Video: 'video_content',
+        Question: 'question_content',
+        Task: 'task_content',
+    }
+
     def get_contents(self, obj) -> list:
+        # Контент и его элементы ожидаются подгруженными через catalog.prefetch
         contents_data = []
         for content in obj.contents.all():
+            item = content.item
+            if isinstance(item, Answer):
+                # Ответы на вопросы в списке контента не показываются
+                continue
             content_data = {'id': content.pk}
-            if isinstance(content.item, Text):
-                content_data['text_content'] = TextSerializer(content.item).data['title']
-            elif isinstance(content.item, File):
-                content_data['file_content'] = FileSerializer(content.item).data['title']
-            elif isinstance(content.item, Image):
-                content_data['image_content'] = ImageSerializer(content.item).data['title']
-            elif isinstance(content.item, Video):
-                content_data['video_content'] = VideoSerializer(content.item).data['title']
-            elif isinstance(content.item, Question):
-                content_data['question_content'] = QuestionSerializer(content.item).data['title']
-            elif isinstance(content.item, Answer):
-                content_data.clear()
-            #     content_data['answer_content'] = AnswerSerializer(content.item).data['text']
-            elif isinstance(content.item, Task):
-                content_data['task_content'] = TaskSerializer(content.item).data['title']
-            if content_data:
-                contents_data.append(content_data)
+            key = self.content_keys.get(type(item))
+            if key is not None:
+                content_data[key] = item.title
+            contents_data.append(content_data)
         return contents_data
 
 
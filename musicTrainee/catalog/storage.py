@@ -0,0 +1,78 @@
+"""
+Хранилище медиа с хешем содержимого в имени файла.
+
+Имя вида ``sheet.3f9a0c1d2e4b5a67.pdf`` никогда не указывает на другое содержимое,
+поэтому такие файлы отдаются с долгим ``Cache-Control: immutable``.
+"""
+
+import hashlib
+import os
+import re
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+from musicTrainee.timing import timed
+
+HASH_LENGTH = 16
+
+# Хеш перед расширением; суффикс ``_xxxxxxx`` добавляет get_available_name при совпадении имен
+_HASHED_NAME_RE = re.compile(r'\.[0-9a-f]{%d}(?:_[0-9A-Za-z]{7})?(?:\.[^./]*)?$' % HASH_LENGTH)
+
+
+def file_digest(content) -> str:
+    """
+    SHA-256 содержимого файла в hex.
+    """
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hashed_name(name: str, digest: str, max_length=None) -> str:
+    """
+    Добавляет к имени файла хеш содержимого перед расширением.
+
+    Если имя не помещается в ``max_length``, укорачивается основа имени, а не хеш.
+    """
+    dir_name, file_name = os.path.split(name)
+    file_root, file_ext = os.path.splitext(file_name)
+    suffix = f'.{digest[:HASH_LENGTH]}{file_ext}'
+    if max_length is not None:
+        # Запас под суффикс get_available_name
+        overflow = len(os.path.join(dir_name, file_root + suffix)) + 8 - max_length
+        if overflow > 0:
+            file_root = file_root[:-overflow] or 'file'
+    return os.path.join(dir_name, file_root + suffix)
+
+
+def is_hashed_name(name: str) -> bool:
+    return bool(_HASHED_NAME_RE.search(name))
+
+
+@deconstructible
+class HashedFileSystemStorage(FileSystemStorage):
+    """
+    Локальное хранилище, сохраняющее файлы под именами с хешем содержимого.
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        with timed('storage'):
+            return super().save(hashed_name(name, file_digest(content), max_length), content, max_length)
+
+    def _open(self, name, mode='rb'):
+        with timed('storage'):
+            return super()._open(name, mode)
+
+    def delete(self, name):
+        with timed('storage'):
+            super().delete(name)
+
+
+hashed_storage = HashedFileSystemStorage()
@@ -0,0 +1,48 @@
+"""
+Общие фабрики данных и клиенты API для тестов приложений.
+"""
+
+import io
+
+from PIL import Image as PILImage
+from rest_framework.test import APIClient
+
+from accounts.models import CustomAccount
+from accounts.serializers import AccountTokenObtainPairSerializer
+from .models import Course
+
+
+def create_user(username: str, **kwargs) -> CustomAccount:
+    # Пароль хешируется в CustomAccount.save
+    return CustomAccount.objects.create(**{
+        'username': username, 'email': f'{username}@example.com', 'password': 'password', 'is_activated': True,
+        **kwargs,
+    })
+
+
+def create_course(creator, slug: str, **kwargs) -> Course:
+    return Course.objects.create(**{
+        'creator': creator, 'title': slug, 'slug': slug, 'description': 'Description',
+        'target_description': 'Target', 'approval': True, **kwargs,
+    })
+
+
+def authenticate(client: APIClient, user=None) -> APIClient:
+    """
+    Передает в запросах клиента JWT пользователя; без пользователя запросы анонимные.
+    """
+    client.credentials()
+    if user is not None:
+        token = AccountTokenObtainPairSerializer.get_token(user).access_token
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+    return client
+
+
+def api_client(user=None) -> APIClient:
+    return authenticate(APIClient(), user)
+
+
+def png_bytes() -> bytes:
+    buffer = io.BytesIO()
+    PILImage.new('RGB', (1, 1)).save(buffer, format='PNG')
+    return buffer.getvalue()
@@ -1,3 +1,746 @@
-from django.test import TestCase
+import fcntl
+import hashlib
+import io
+import shutil
+import tempfile
+from datetime import timedelta
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from catalog.models import (Answer, Content, Course, CourseRating, Enrollment, File, Image, Lesson, Module, Question, Task,
+                            TaskSubmission, Text, UploadSession, Video)
+from catalog.models import CourseSearchIndex
+from catalog.reviews import claim_submissions, leased_submissions, pending_submissions, release_submissions
+from catalog.testing import api_client, create_course, create_user
+from musicTrainee.cache import clear_local_caches
+
+
+@override_settings(
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+    REQUEST_TIMING_SAMPLE_RATE=0,
+)
+class CatalogTestCase(TestCase):
+    """
+    Базовый класс тестов каталога: холодные кэши в каждом тесте.
+    """
+
+    def setUp(self):
+        clear_local_caches()
+        cache.clear()
+
+
+class RatingAggregateTests(CatalogTestCase):
+    """
+    Агрегаты оценок курса (Course.rating_count, Course.rating_sum).
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.course = create_course(create_user('creator'), 'course')
+        self.students = [create_user(f'student-{index}') for index in range(3)]
+
+    def assertAggregates(self, count: int, total: int):
+        course = Course.objects.get(pk=self.course.pk)
+        self.assertEqual((course.rating_count, course.rating_sum), (count, total))
+
+    def test_create_update_delete(self):
+        first = CourseRating.objects.create(course=self.course, user=self.students[0], rating=5)
+        CourseRating.objects.create(course=self.course, user=self.students[1], rating=3)
+        self.assertAggregates(2, 8)
+
+        rating = CourseRating.objects.get(pk=first.pk)
+        rating.rating = 1
+        rating.save()
+        self.assertAggregates(2, 4)
+
+        rating.delete()
+        self.assertAggregates(1, 3)
+
+        response = api_client(self.students[2]).get('/api/catalog/course/')
+        self.assertEqual(response.data['average_rating'], 3)
+
+    def test_move_between_courses(self):
+        other = create_course(self.course.creator, 'other')
+        rating = CourseRating.objects.create(course=self.course, user=self.students[0], rating=4)
+        rating = CourseRating.objects.get(pk=rating.pk)
+        rating.course = other
+        rating.save()
+        self.assertAggregates(0, 0)
+        other.refresh_from_db()
+        self.assertEqual((other.rating_count, other.rating_sum), (1, 4))
+
+    def test_rebuild_command(self):
+        for student, score in zip(self.students, (5, 4, 2)):
+            CourseRating.objects.create(course=self.course, user=student, rating=score)
+        empty = create_course(self.course.creator, 'empty')
+        Course.objects.update(rating_count=100, rating_sum=100)
+
+        call_command('rebuild_course_ratings', batch_size=1, stdout=io.StringIO())
+
+        self.assertAggregates(3, 11)
+        empty.refresh_from_db()
+        self.assertEqual((empty.rating_count, empty.rating_sum), (0, 0))
+
+
+class EnrollmentTests(CatalogTestCase):
+    """
+    Запись на курс и счетчик Course.enrollment_count.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.course = create_course(create_user('creator'), 'course')
+        self.student = create_user('student')
+
+    def assertEnrollmentCount(self, count: int):
+        self.assertEqual(Course.objects.get(pk=self.course.pk).enrollment_count, count)
+        self.assertEqual(Enrollment.objects.filter(course=self.course).count(), count)
+
+    def test_double_enroll_counted_once(self):
+        self.assertTrue(Enrollment.enroll(self.student, self.course))
+        self.assertFalse(Enrollment.enroll(self.student, self.course))
+        self.assertEnrollmentCount(1)
+        self.assertTrue(Enrollment.is_enrolled(self.student, self.course))
+
+    def test_double_purchase_counted_once(self):
+        client = api_client(self.student)
+        first = client.post('/api/catalog/course/')
+        second = client.post('/api/catalog/course/')
+        self.assertEqual((first.status_code, second.status_code), (200, 200))
+        self.assertNotEqual(first.data['detail'], second.data['detail'])
+        self.assertEnrollmentCount(1)
+        self.assertEqual(client.get('/api/mycourses/course/').status_code, 200)
+
+    def test_delete_decrements_count(self):
+        Enrollment.enroll(self.student, self.course)
+        Enrollment.enroll(create_user('other'), self.course)
+        self.assertEnrollmentCount(2)
+        Enrollment.objects.get(user=self.student).delete()
+        self.assertEnrollmentCount(1)
+
+
+class CourseRatingsEndpointTests(CatalogTestCase):
+    """
+    Отзывы курса (catalog/<slug>/ratings/) и карточки курсов без вложенных отзывов.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.course = create_course(create_user('creator'), 'course')
+        for index, score in enumerate((5, 5, 4, 1, 5)):
+            CourseRating.objects.create(course=self.course, user=create_user(f'student-{index}'), rating=score)
+        self.client = api_client(create_user('reader'))
+
+    def test_histogram_buckets(self):
+        response = self.client.get('/api/catalog/course/ratings/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(bucket['rating'], bucket['count']) for bucket in response.data['histogram']],
+            [(5, 3), (4, 1), (1, 1)],
+        )
+
+    def test_pages_cover_all_ratings(self):
+        response = self.client.get('/api/catalog/course/ratings/', {'page_size': 2})
+        ids = [rating['id'] for rating in response.data['results']]
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            # Распределение оценок есть только на первой странице
+            self.assertNotIn('histogram', response.data)
+            ids += [rating['id'] for rating in response.data['results']]
+        self.assertEqual(ids, list(CourseRating.objects.order_by('-id').values_list('id', flat=True)))
+
+    def test_catalog_cards_have_no_ratings(self):
+        card = self.client.get('/api/catalog/').data['results'][0]
+        self.assertEqual(card['slug'], 'course')
+        self.assertNotIn('ratings', card)
+        self.assertEqual(len(self.client.get('/api/catalog/course/').data['ratings']), 5)
+
+
+class CourseSearchTests(CatalogTestCase):
+    """
+    Полнотекстовый поиск в каталоге (catalog.search) и его индекс.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.creator = create_user('creator')
+        self.client = api_client(create_user('student'))
+
+    def search(self, query: str, **params) -> list:
+        response = self.client.get('/api/catalog/', {'q': query, **params})
+        self.assertEqual(response.status_code, 200)
+        slugs = [course['slug'] for course in response.data['results']]
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            slugs += [course['slug'] for course in response.data['results']]
+        return slugs
+
+    def test_results(self):
+        create_course(self.creator, 'guitar', title='Guitar basics')
+        create_course(self.creator, 'piano', title='Piano basics', description='Scales and chords')
+        create_course(self.creator, 'draft', title='Guitar draft', approval=False)
+        self.assertEqual(self.search('guitar'), ['guitar'])
+        self.assertEqual(self.search('chords'), ['piano'])
+        self.assertEqual(sorted(self.search('basics')), ['guitar', 'piano'])
+        # Слова объединяются через AND и ищутся по префиксу
+        self.assertEqual(self.search('pian bas'), ['piano'])
+        self.assertEqual(self.search('guitar scales'), [])
+        # Синтаксис FTS5 в запросе не интерпретируется
+        self.assertEqual(self.search('"guitar" OR piano*'), [])
+        self.assertEqual(self.search('***'), [])
+
+    def test_ranking_order_and_pages(self):
+        create_course(self.creator, 'mention', title='Music theory',
+                      description='Harmony, rhythm, notation, ear training and a little guitar')
+        create_course(self.creator, 'focused', title='Guitar', target_description='Guitar players',
+                      description='Guitar chords for guitar')
+        # Одинаковые курсы с равным рангом упорядочиваются по id и не теряются между страницами
+        for index in range(3):
+            create_course(self.creator, f'tie-{index}', title='Guitar songs', description='Songs')
+        results = self.search('guitar')
+        self.assertEqual(results[0], 'focused')
+        self.assertEqual(results[-1], 'mention')
+        self.assertEqual(results[1:4], ['tie-0', 'tie-1', 'tie-2'])
+        self.assertEqual(self.search('guitar', page_size=1), results)
+        self.assertEqual(self.search('guitar', page_size=2), results)
+
+    def test_index_follows_create_update_delete(self):
+        course = create_course(self.creator, 'course', title='Violin')
+        self.assertEqual(self.search('violin'), ['course'])
+
+        course = Course.objects.get(pk=course.pk)
+        course.title = 'Cello'
+        course.save()
+        self.assertEqual(self.search('violin'), [])
+        self.assertEqual(self.search('cello'), ['course'])
+        self.assertEqual(CourseSearchIndex.objects.get(pk=course.pk).title, 'Cello')
+
+        course.delete()
+        self.assertEqual(self.search('cello'), [])
+        self.assertFalse(CourseSearchIndex.objects.filter(pk=course.pk).exists())
+
+
+class CourseTreeTests(CatalogTestCase):
+    """
+    Хранимая структура курса (catalog.tree).
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.creator = create_user('creator')
+        self.student = create_user('student')
+        self.course = create_course(self.creator, 'old-slug')
+        module = Module.objects.create(course=self.course, title='Module')
+        Lesson.objects.create(module=module, title='Lesson')
+        Enrollment.enroll(self.student, self.course)
+
+    def test_course_save_rebuilds_tree(self):
+        client = api_client(self.student)
+        response = client.get('/api/mycourses/old-slug/tree/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['title'], 'old-slug')
+
+        self.course.title = 'New title'
+        self.course.slug = 'new-slug'
+        self.course.save()
+
+        response = client.get('/api/mycourses/new-slug/tree/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['title'], response.data['slug']), ('New title', 'new-slug'))
+
+
+class CascadeDeleteTests(CatalogTestCase):
+    """
+    Удаление курса и его частей: сигналы каскадно удаляемых строк не обновляют родителей.
+    """
+
+    def create_course(self, slug: str, fanout: int) -> Course:
+        course = create_course(create_user(f'{slug}-creator'), slug)
+        for _ in range(fanout):
+            module = Module.objects.create(course=course, title='Module')
+            for _ in range(fanout):
+                lesson = Lesson.objects.create(module=module, title='Lesson')
+                for _ in range(fanout):
+                    Content.objects.create(lesson=lesson, item=Text.objects.create(title='Text', content='Text'))
+        for index in range(fanout):
+            student = create_user(f'{slug}-student-{index}')
+            Enrollment.enroll(student, course)
+            CourseRating.objects.create(course=course, user=student, rating=5)
+        return course
+
+    def count_queries(self, delete) -> int:
+        with CaptureQueriesContext(connection) as context:
+            delete()
+        return len(context)
+
+    def test_course_delete_query_count(self):
+        small = self.create_course('small', fanout=1)
+        large = self.create_course('large', fanout=4)
+        small_queries = self.count_queries(Course.objects.get(pk=small.pk).delete)
+        large_queries = self.count_queries(Course.objects.get(pk=large.pk).delete)
+        self.assertEqual(large_queries, small_queries)
+        self.assertLessEqual(large_queries, 20)
+        self.assertFalse(Module.objects.exists() or Content.objects.exists() or Enrollment.objects.exists())
+
+    def test_queryset_delete_query_count(self):
+        small = self.create_course('small', fanout=1)
+        large = self.create_course('large', fanout=4)
+        small_queries = self.count_queries(Course.objects.filter(pk=small.pk).delete)
+        large_queries = self.count_queries(Course.objects.filter(pk=large.pk).delete)
+        self.assertEqual(large_queries, small_queries)
+        self.assertLessEqual(large_queries, 20)
+
+    def test_module_delete_updates_course(self):
+        course = self.create_course('course', fanout=2)
+        student = Enrollment.objects.filter(course=course).first().user
+        client = api_client(student)
+        self.assertEqual(len(client.get('/api/mycourses/course/tree/').data['modules']), 2)
+        updated_at = Course.objects.get(pk=course.pk).updated_at
+
+        Module.objects.filter(pk=course.modules.first().pk).delete()
+
+        course = Course.objects.get(pk=course.pk)
+        self.assertGreater(course.updated_at, updated_at)
+        # Агрегаты курса не меняются при удалении его части
+        self.assertEqual((course.enrollment_count, course.rating_count), (2, 2))
+        self.assertEqual(len(client.get('/api/mycourses/course/tree/').data['modules']), 1)
+
+
+class CourseAccessTests(CatalogTestCase):
+    """
+    Кэш прав доступа к курсам (catalog.access).
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.creator = create_user('creator')
+        self.student = create_user('student')
+        self.outsider = create_user('outsider')
+        self.course = create_course(self.creator, 'course')
+        Enrollment.enroll(self.student, self.course)
+
+    def test_non_member_forbidden(self):
+        self.assertEqual(api_client(self.student).get('/api/mycourses/course/').status_code, 200)
+        self.assertEqual(api_client(self.outsider).get('/api/mycourses/course/').status_code, 403)
+        self.assertEqual(api_client(self.outsider).get('/api/mycourses/course/tree/').status_code, 403)
+
+    def test_slug_change_keeps_access(self):
+        client = api_client(self.student)
+        self.assertEqual(client.get('/api/mycourses/course/').status_code, 200)
+        course = Course.objects.get(pk=self.course.pk)
+        course.slug = 'renamed'
+        course.save()
+        self.assertEqual(client.get('/api/mycourses/renamed/').status_code, 200)
+        self.assertEqual(client.get('/api/mycourses/course/').status_code, 403)
+
+    def test_creator_change_revokes_access(self):
+        client = api_client(self.creator)
+        self.assertEqual(client.get('/api/mycourses/course/').status_code, 200)
+        course = Course.objects.get(pk=self.course.pk)
+        course.creator = self.outsider
+        with CaptureQueriesContext(connection) as context:
+            course.save(update_fields=['creator'])
+        # Прежний создатель берется из Course.from_db, а не перечитывается из базы
+        self.assertFalse([query for query in context if query['sql'].startswith('SELECT')])
+        self.assertEqual(client.get('/api/mycourses/course/').status_code, 403)
+        self.assertEqual(api_client(self.outsider).get('/api/mycourses/course/').status_code, 200)
+
+
+class CoursePathTests(CatalogTestCase):
+    """
+    Ответы 404 и 403 для вложенных путей курса (musicApi.resolvers).
+    """
+
+    def setUp(self):
+        super().setUp()
+        creator = create_user('creator')
+        self.course = create_course(creator, 'course')
+        self.other = create_course(creator, 'other')
+        self.draft = create_course(creator, 'draft', approval=False)
+        self.student = create_user('student')
+        Enrollment.enroll(self.student, self.course)
+        self.paths = {course.slug: self.create_path(course) for course in (self.course, self.other)}
+        self.client = api_client(self.student)
+        self.creator_client = api_client(creator)
+
+    @staticmethod
+    def create_path(course):
+        module = Module.objects.create(course=course, title='Module')
+        lesson = Lesson.objects.create(module=module, title='Lesson')
+        content = Content.objects.create(lesson=lesson, item=Text.objects.create(title='Text', content='Text'))
+        return module.pk, lesson.pk, content.pk
+
+    def urls(self, prefix: str, slug: str, module_id: int, lesson_id: int, content_id: int) -> list:
+        return [
+            f'{prefix}/{slug}/modules/{module_id}/{lesson_id}/',
+            f'{prefix}/{slug}/modules/{module_id}/{lesson_id}/{content_id}/',
+        ]
+
+    def mismatched_urls(self, prefix: str) -> list:
+        # Каждый уровень пути по очереди берется из другого курса
+        module_id, lesson_id, content_id = self.paths['course']
+        other_module_id, other_lesson_id, other_content_id = self.paths['other']
+        return [
+            *self.urls(prefix, 'course', other_module_id, lesson_id, content_id),
+            *self.urls(prefix, 'course', module_id, other_lesson_id, content_id),
+            f'{prefix}/course/modules/{module_id}/{lesson_id}/{other_content_id}/',
+        ]
+
+    def assertStatus(self, client, url: str, status: int):
+        self.assertEqual(client.get(url).status_code, status, url)
+
+    def test_valid_path(self):
+        for url in self.urls('/api/mycourses', 'course', *self.paths['course']):
+            self.assertStatus(self.client, url, 200)
+        self.assertStatus(self.client, f'/api/mycourses/course/modules/{self.paths["course"][0]}/', 200)
+
+    def test_foreign_objects_in_path_not_found(self):
+        for url in self.mismatched_urls('/api/mycourses'):
+            self.assertStatus(self.client, url, 404)
+        self.assertStatus(self.client, f'/api/mycourses/course/modules/{self.paths["other"][0]}/', 404)
+
+    def test_mycreations_foreign_objects_in_path_not_found(self):
+        for url in self.mismatched_urls('/api/mycreations/create'):
+            self.assertStatus(self.creator_client, url, 404)
+
+    def test_non_member_forbidden(self):
+        # Проверка прав идет раньше поиска пути: чужой курс отличается от несуществующего только для модераторов
+        moderator_client = api_client(create_user('moderator', is_moderator=True))
+        for url in self.urls('/api/mycourses', 'other', *self.paths['other']):
+            self.assertStatus(self.client, url, 403)
+            self.assertStatus(moderator_client, url, 200)
+        for url in self.urls('/api/mycourses', 'missing', *self.paths['course']):
+            self.assertStatus(self.client, url, 403)
+            self.assertStatus(moderator_client, url, 404)
+
+    def test_unpublished_course_not_in_catalog(self):
+        slugs = [course['slug'] for course in self.client.get('/api/catalog/').data['results']]
+        self.assertEqual(sorted(slugs), ['course', 'other'])
+        self.assertStatus(self.client, '/api/catalog/missing/', 404)
+
+
+class CreatorNameTests(CatalogTestCase):
+    """
+    Имя создателя в кэшированных ответах курса.
+    """
+
+    def test_username_change_refreshes_course(self):
+        creator = create_user('creator')
+        create_course(creator, 'course')
+        client = api_client(create_user('student'))
+        response = client.get('/api/catalog/course/')
+        self.assertEqual(response.data['creator_username'], 'creator')
+
+        creator.username = 'renamed'
+        creator.save()
+
+        response = client.get('/api/catalog/course/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['creator_username'], 'renamed')
+        self.assertEqual(client.get('/api/catalog/').data['results'][0]['creator_username'], 'renamed')
+
+
+class ContentCourseTests(CatalogTestCase):
+    """
+    Денормализованный Content.course при переносе уроков и модулей.
+    """
+
+    def setUp(self):
+        super().setUp()
+        creator = create_user('creator')
+        self.source = create_course(creator, 'source')
+        self.target = create_course(creator, 'target')
+        self.module = Module.objects.create(course=self.source, title='Module')
+        self.lesson = Lesson.objects.create(module=self.module, title='Lesson')
+        self.content = Content.objects.create(lesson=self.lesson, item=Text.objects.create(title='Text', content='Text'))
+
+    def assertContentCourse(self, course):
+        self.assertEqual(Content.objects.get(pk=self.content.pk).course_id, course.pk)
+
+    def test_content_course_set_on_create(self):
+        self.assertContentCourse(self.source)
+
+    def test_lesson_move_rewrites_content_course(self):
+        target_module = Module.objects.create(course=self.target, title='Target module')
+        lesson = Lesson.objects.get(pk=self.lesson.pk)
+        lesson.module = target_module
+        lesson.save()
+        self.assertContentCourse(self.target)
+
+    def test_module_move_rewrites_content_course(self):
+        module = Module.objects.get(pk=self.module.pk)
+        module.course = self.target
+        module.save()
+        self.assertContentCourse(self.target)
+
+    def test_lesson_move_within_course_keeps_content_course(self):
+        other_module = Module.objects.create(course=self.source, title='Other module')
+        lesson = Lesson.objects.get(pk=self.lesson.pk)
+        lesson.module = other_module
+        lesson.save()
+        self.assertContentCourse(self.source)
+
+
+class LessonContentsTests(CatalogTestCase):
+    """
+    Элементы всех типов в ответах урока, модуля и контента.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.course = create_course(create_user('creator'), 'course')
+        self.module = Module.objects.create(course=self.course, title='Module')
+        self.student = create_user('student')
+        Enrollment.enroll(self.student, self.course)
+        self.client = api_client(self.student)
+
+    def create_lesson(self, copies: int = 1) -> Lesson:
+        lesson = Lesson.objects.create(module=self.module, title='Lesson')
+        for index in range(copies):
+            question = Question.objects.create(title=f'Question {index}', text='Question')
+            Answer.objects.create(question=question, text='Right', is_true=True)
+            Answer.objects.create(question=question, text='Wrong')
+            for item in (
+                Text.objects.create(title=f'Text {index}', content='Text'),
+                File.objects.create(title=f'File {index}', file='courses/file.pdf'),
+                Image.objects.create(title=f'Image {index}', file='courses/image.png'),
+                Video.objects.create(title=f'Video {index}', url='https://example.com/video'),
+                question,
+                Task.objects.create(title=f'Task {index}', description='Task'),
+            ):
+                Content.objects.create(lesson=lesson, item=item)
+        return lesson
+
+    def lesson_url(self, lesson: Lesson) -> str:
+        return f'/api/mycourses/course/modules/{self.module.id}/{lesson.id}/'
+
+    def count_queries(self, url: str) -> int:
+        clear_local_caches()
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        return len(context)
+
+    def test_lesson_lists_every_item_type(self):
+        lesson = self.create_lesson()
+        contents = self.client.get(self.lesson_url(lesson)).data['contents']
+        self.assertEqual(contents, [
+            {'id': content.pk, key: f'{title} 0'} for content, (key, title) in zip(lesson.contents.order_by('order'), (
+                ('text_content', 'Text'), ('file_content', 'File'), ('image_content', 'Image'),
+                ('video_content', 'Video'), ('question_content', 'Question'), ('task_content', 'Task'),
+            ))
+        ])
+
+        modules = self.client.get(f'/api/mycourses/course/modules/{self.module.id}/').data
+        self.assertEqual([module['contents'] for module in modules], [contents])
+
+    def test_content_items(self):
+        lesson = self.create_lesson()
+        items = [self.client.get(f'{self.lesson_url(lesson)}{content.pk}/').data['item']
+                 for content in lesson.contents.order_by('order')]
+        text, file, image, video, question, task = items
+        self.assertEqual(text, {'title': 'Text 0', 'content': 'Text'})
+        self.assertTrue(file['file'].endswith('courses/file.pdf'))
+        self.assertTrue(image['file'].endswith('courses/image.png'))
+        self.assertEqual(video['url'], 'https://example.com/video')
+        self.assertEqual([(answer['text'], answer['is_true']) for answer in question['answers']],
+                         [('Right', True), ('Wrong', False)])
+        self.assertEqual((task['title'], task['description']), ('Task 0', 'Task'))
+
+    def test_queries_do_not_grow_with_items(self):
+        single = self.create_lesson()
+        module_url = f'/api/mycourses/course/modules/{self.module.id}/'
+        lesson_queries = self.count_queries(self.lesson_url(single))
+        module_queries = self.count_queries(module_url)
+
+        many = self.create_lesson(copies=5)
+        self.assertEqual(self.count_queries(self.lesson_url(many)), lesson_queries)
+        self.assertEqual(self.count_queries(module_url), module_queries)
+
+
+class TaskSubmissionTestCase(CatalogTestCase):
+    """
+    Курс с заданием и ответами студентов на него.
+    """
+    submission_count = 3
+
+    def setUp(self):
+        super().setUp()
+        self.creator = create_user('creator')
+        self.course = create_course(self.creator, 'course')
+        module = Module.objects.create(course=self.course, title='Module')
+        lesson = Lesson.objects.create(module=module, title='Lesson')
+        self.task = Task.objects.create(title='Task', description='Task')
+        Content.objects.create(lesson=lesson, item=self.task)
+        self.students = [create_user(f'student-{index}') for index in range(self.submission_count)]
+        self.submissions = [
+            TaskSubmission.objects.create(
+                task=self.task, student=student, file=f'courses/course/tasks/{student.username}.mp3',
+            )
+            for student in self.students
+        ]
+
+
+class ReviewQueueTests(TaskSubmissionTestCase):
+    """
+    Аренда ответов в очереди проверки (catalog.reviews).
+    """
+
+    def test_claims_do_not_overlap(self):
+        first = claim_submissions(self.creator, 2)
+        second = claim_submissions(self.creator, 2)
+        self.assertEqual(len(first), 2)
+        self.assertEqual(len(second), 1)
+        self.assertFalse({submission.pk for submission in first} & {submission.pk for submission in second})
+        self.assertEqual(claim_submissions(self.creator, 2), [])
+        self.assertEqual(len(leased_submissions(self.creator)), 3)
+
+    def test_other_user_cannot_claim(self):
+        self.assertEqual(claim_submissions(self.students[0], 10), [])
+
+    def test_expired_lease_returns_to_queue(self):
+        claimed = claim_submissions(self.creator, 1)
+        self.assertNotIn(claimed[0], pending_submissions(self.creator))
+        TaskSubmission.objects.filter(pk=claimed[0].pk).update(lease_expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertIn(claimed[0], pending_submissions(self.creator))
+        self.assertNotIn(claimed[0], leased_submissions(self.creator))
+        self.assertEqual([submission.pk for submission in claim_submissions(self.creator, 3)][0], claimed[0].pk)
+
+    def test_release_returns_to_queue(self):
+        claimed = claim_submissions(self.creator, 3)
+        other = create_user('other')
+        self.assertEqual(release_submissions(other, [claimed[0].pk]), 0)
+        self.assertEqual(release_submissions(self.creator, [claimed[0].pk]), 1)
+        self.assertEqual(list(pending_submissions(self.creator)), [claimed[0]])
+
+
+class BulkReviewTests(TaskSubmissionTestCase):
+    """
+    Сохранение оценок пачкой (mycreations/reviews/bulk/).
+    """
+
+    def post_reviews(self, user, *reviews):
+        return api_client(user).post('/api/mycreations/reviews/bulk/', {'reviews': list(reviews)}, format='json')
+
+    def test_foreign_submissions_not_found(self):
+        other_creator = create_user('other-creator')
+        response = self.post_reviews(
+            other_creator, {'submission_id': self.submissions[0].pk, 'is_correct': True},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'], [{'submission_id': self.submissions[0].pk, 'status': 'not_found'}])
+        self.assertFalse(TaskSubmission.objects.get(pk=self.submissions[0].pk).reviewed)
+
+        response = self.post_reviews(self.students[0], {'submission_id': self.submissions[0].pk, 'is_correct': True})
+        self.assertEqual(response.data['results'][0]['status'], 'not_found')
+
+    def test_reviews_refresh_reviewed_flag(self):
+        first, second = self.submissions[0].pk, self.submissions[1].pk
+        response = self.post_reviews(
+            self.creator,
+            {'submission_id': first, 'is_correct': True},
+            {'submission_id': second, 'is_correct': False, 'comment': 'Again'},
+        )
+        self.assertEqual([result['status'] for result in response.data['results']], ['created', 'created'])
+        self.assertEqual(
+            set(TaskSubmission.objects.filter(reviewed=True).values_list('pk', flat=True)), {first, second},
+        )
+        self.assertEqual(list(pending_submissions(self.creator)), [self.submissions[2]])
+
+        response = self.post_reviews(self.creator, {'submission_id': first, 'is_correct': False})
+        self.assertEqual(response.data['results'][0]['status'], 'updated')
+        self.assertIs(TaskSubmission.objects.get(pk=first).review.get().is_correct, False)
+
+        TaskSubmission.objects.get(pk=second).review.get().delete()
+        self.assertFalse(TaskSubmission.objects.get(pk=second).reviewed)
+
+
+class UploadTests(CatalogTestCase):
+    """
+    Загрузка файлов частями (catalog.uploads).
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.media_root = tempfile.mkdtemp()
+        cls.media_override = override_settings(MEDIA_ROOT=cls.media_root)
+        cls.media_override.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.media_override.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+
+    def setUp(self):
+        super().setUp()
+        self.creator = create_user('creator')
+        module = Module.objects.create(course=create_course(self.creator, 'course'), title='Module')
+        lesson = Lesson.objects.create(module=module, title='Lesson')
+        self.client = api_client(self.creator)
+        response = self.client.post('/api/uploads/', {
+            'target': UploadSession.TARGET_FILE, 'lesson_id': lesson.id, 'filename': 'sheet.pdf', 'size': 8,
+        }, format='json')
+        self.session = UploadSession.objects.get(pk=response.data['id'])
+        self.url = f'/api/uploads/{self.session.pk}/'
+
+    def put(self, data: bytes, offset: int, **headers):
+        return self.client.put(self.url, data=data, content_type='application/octet-stream',
+                               HTTP_UPLOAD_OFFSET=str(offset), **headers)
+
+    def test_offset_mismatch_conflict(self):
+        self.assertEqual(self.put(b'abcd', 0).status_code, 200)
+        response = self.put(b'abcd', 0)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response['Upload-Offset'], '4')
+        self.assertEqual(self.put(b'efgh', 4).status_code, 200)
+        self.assertEqual(self.client.post(f'{self.url}complete/').status_code, 201)
+
+    def test_checksum_mismatch_conflict(self):
+        response = self.put(b'abcd', 0, HTTP_UPLOAD_CHUNK_SHA256=hashlib.sha256(b'other').hexdigest())
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response['Upload-Offset'], '0')
+        response = self.put(b'abcd', 0, HTTP_UPLOAD_CHUNK_SHA256=hashlib.sha256(b'abcd').hexdigest())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Upload-Offset'], '4')
+
+    def test_concurrent_chunk_conflict(self):
+        # Файл заблокирован параллельной записью той же части
+        with open(File._meta.get_field('file').storage.path(self.session.path), 'r+b') as file:
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+            response = self.put(b'abcd', 0)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(UploadSession.objects.get(pk=self.session.pk).offset, 0)
+
+
+@override_settings(MEDIA_ACCEL_REDIRECT_PREFIX='/protected-media/')
+class TaskMediaAccessTests(TaskSubmissionTestCase):
+    """
+    Права на файлы ответов на задания (catalog.media).
+    """
+
+    def get_file(self, user, submission=None):
+        submission = submission or self.submissions[0]
+        return api_client(user).get(f'/media/{submission.file.name}')
+
+    def test_author_creator_and_moderator_allowed(self):
+        for user in (self.students[0], self.creator, create_user('moderator', is_moderator=True)):
+            with self.subTest(user=user.username):
+                response = self.get_file(user)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.submissions[0].file.name}')
+
+    def test_non_owner_not_found(self):
+        # Другой студент курса, создатель другого курса и аноним не видят чужой ответ
+        Enrollment.enroll(self.students[1], self.course)
+        other_creator = create_user('other-creator')
+        create_course(other_creator, 'other')
+        for user in (self.students[1], other_creator, None):
+            with self.subTest(user=user and user.username):
+                self.assertEqual(self.get_file(user).status_code, 404)
@@ -0,0 +1,79 @@
+"""
+Построение структуры курса для одного запроса клиента.
+
+Структура (модули -> уроки -> заголовки контента) собирается ограниченным
+числом запросов и сохраняется в ``CourseTree``, так что повторное чтение — это
+один SELECT по первичному ключу.
+"""
+
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.contenttypes.prefetch import GenericPrefetch
+from django.db import IntegrityError, transaction
+from django.db.models import Prefetch
+
+from .models import Course, CourseTree, Module, Lesson, Content, Text, File, Image, Video, Question, Task
+
+# Типы элементов, которые показываются в структуре курса
+TREE_ITEM_MODELS = (Text, File, Image, Video, Question, Task)
+
+
+def build_course_tree(course: Course) -> dict:
+    """
+    Собирает структуру курса.
+
+    :param course: Курс.
+    :return: Структура курса в виде словаря.
+    """
+    content_types = ContentType.objects.get_for_models(*TREE_ITEM_MODELS).values()
+    contents = Content.objects.filter(content_type__in=content_types).select_related('content_type').prefetch_related(
+        GenericPrefetch('item', [model.objects.only('id', 'title') for model in TREE_ITEM_MODELS])
+    )
+    lessons = Lesson.objects.prefetch_related(Prefetch('contents', queryset=contents))
+    modules = Module.objects.filter(course=course).prefetch_related(Prefetch('lessons', queryset=lessons))
+
+    tree = []
+    for module in modules:
+        module_data = {'id': module.id, 'title': module.title, 'lessons': []}
+        for lesson in module.lessons.all():
+            lesson_data = {'id': lesson.id, 'title': lesson.title, 'contents': []}
+            for content in lesson.contents.all():
+                item = content.item
+                lesson_data['contents'].append({
+                    'id': content.id,
+                    'type': content.content_type.model,
+                    'title': item.title if item is not None else None,
+                })
+            module_data['lessons'].append(lesson_data)
+        tree.append(module_data)
+
+    return {'id': course.id, 'slug': course.slug, 'title': course.title, 'modules': tree}
+
+
+def get_course_tree(course: Course) -> dict:
+    """
+    Возвращает сохраненную структуру курса, при отсутствии строит и сохраняет ее.
+
+    :param course: Курс.
+    :return: Структура курса в виде словаря.
+    """
+    data = CourseTree.objects.filter(course=course).values_list('data', flat=True).first()
+    if data is None:
+        data = rebuild_course_tree(course)
+    return data
+
+
+def rebuild_course_tree(course: Course) -> dict:
+    """
+    Строит структуру курса и сохраняет ее в CourseTree.
+
+    :param course: Курс.
+    :return: Структура курса в виде словаря.
+    """
+    data = build_course_tree(course)
+    try:
+        with transaction.atomic():
+            CourseTree.objects.update_or_create(course=course, defaults={'data': data})
+    except IntegrityError:
+        # Структуру параллельно сохранил другой запрос
+        pass
+    return data
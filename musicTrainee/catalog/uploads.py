@@ -0,0 +1,290 @@
+"""
+Возобновляемая загрузка файлов частями для ответов на задания, файлов и изображений уроков.
+
+Клиент создает сессию (``start_upload``), затем отправляет части тела запроса PUT
+с заголовком ``Upload-Offset`` (``write_chunk``) и завершает загрузку (``complete_upload``).
+Части пишутся сразу в итоговый файл хранилища с ``fsync`` под блокировкой файла (``flock``),
+смещение сессии сдвигается условным UPDATE только после успешной записи, поэтому оборванную
+часть можно повторить с того же смещения. После завершения файл переименовывается в имя с хешем содержимого
+и прикрепляется к модели без повторного копирования.
+
+Размер одной части ограничен ``UPLOAD_CHUNK_MAX_SIZE``: запрос воркера занят не дольше
+записи одной части, а nginx буферизует ее тело до передачи в приложение.
+Поддерживается только локальное хранилище (FileSystemStorage), из которого nginx отдает медиа.
+"""
+
+import fcntl
+import hashlib
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import IntegrityError, transaction
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from musicTrainee.metrics import UPLOAD_BYTES
+from musicTrainee.timing import timed
+from .models import Content, File, Image, Task, TaskSubmission, UploadSession
+from .storage import hashed_name
+
+BLOCK_SIZE = 64 * 1024
+
+TARGET_MODELS = {
+    UploadSession.TARGET_SUBMISSION: TaskSubmission,
+    UploadSession.TARGET_FILE: File,
+    UploadSession.TARGET_IMAGE: Image,
+}
+
+
+class UploadError(Exception):
+    """
+    Ошибка загрузки, которую клиент может исправить запросом.
+    """
+
+
+class UploadConflict(UploadError):
+    """
+    Запрос не соответствует состоянию сессии: неверное смещение, параллельная запись части,
+    несовпадение контрольной суммы части, сессия уже завершена или ответ на задание уже отправлен.
+    Клиент продолжает загрузку со смещения сессии.
+    """
+
+
+def get_max_size() -> int:
+    return getattr(settings, 'UPLOAD_MAX_SIZE', 500 * 1024 * 1024)
+
+
+def get_chunk_max_size() -> int:
+    return getattr(settings, 'UPLOAD_CHUNK_MAX_SIZE', 8 * 1024 * 1024)
+
+
+def _file_field(target: str):
+    return TARGET_MODELS[target]._meta.get_field('file')
+
+
+def _storage_path(session: UploadSession) -> str:
+    return _file_field(session.target).storage.path(session.path)
+
+
+def _reserve_path(target: str, instance, filename: str) -> str:
+    """
+    Выбирает свободное имя файла по upload_to поля модели и создает пустой файл,
+    чтобы параллельная сессия не получила то же имя.
+    """
+    field = _file_field(target)
+    name = field.generate_filename(instance, filename)
+    for _ in range(10):
+        name = field.storage.get_available_name(name, max_length=field.max_length)
+        path = field.storage.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            with open(path, 'xb'):
+                pass
+        except FileExistsError:
+            continue
+        return name
+    raise UploadConflict('Could not reserve a file name, try again.')
+
+
+def start_upload(user, target: str, filename: str, size: int, sha256: str = '', content=None, lesson=None,
+                 title: str = '') -> UploadSession:
+    """
+    Создает сессию загрузки и пустой итоговый файл.
+
+    Права на курс проверяются вызывающим кодом.
+
+    :param user: Владелец сессии.
+    :param target: Куда прикрепить файл (UploadSession.TARGET_*).
+    :param filename: Исходное имя файла.
+    :param size: Размер файла в байтах.
+    :param sha256: Ожидаемая SHA-256 файла в hex (необязательно).
+    :param content: Контент с заданием (для ответа на задание).
+    :param lesson: Урок (для файла и изображения).
+    :param title: Название файла или изображения урока.
+    :return: Новая сессия.
+    """
+    if size > get_max_size():
+        raise UploadError(f'File is larger than {get_max_size()} bytes.')
+
+    if target == UploadSession.TARGET_SUBMISSION:
+        if TaskSubmission.objects.filter(task_id=content.object_id, student=user).exists():
+            raise UploadConflict('Task already exists by your user')
+        instance = TaskSubmission(task_id=content.object_id, student=user)
+    else:
+        instance = TARGET_MODELS[target](title=title)
+
+    return UploadSession.objects.create(
+        owner=user,
+        target=target,
+        content=content,
+        lesson=lesson,
+        title=title,
+        filename=filename,
+        size=size,
+        sha256=sha256.lower(),
+        path=_reserve_path(target, instance, filename),
+    )
+
+
+def write_chunk(session: UploadSession, offset: int, stream, length: int, checksum: str = '') -> UploadSession:
+    """
+    Записывает часть файла с указанного смещения.
+
+    :param session: Сессия загрузки.
+    :param offset: Смещение части, должно совпадать с ``session.offset`` (проверяется под блокировкой файла).
+    :param stream: Файлоподобный поток тела запроса.
+    :param length: Длина части (Content-Length).
+    :param checksum: Ожидаемая SHA-256 части в hex (необязательно).
+    :return: Сессия с новым смещением.
+    """
+    if session.completed_at is not None:
+        raise UploadConflict('Upload is already completed.')
+    if offset != session.offset:
+        raise UploadConflict(f'Upload offset is {session.offset}.')
+    if length > get_chunk_max_size():
+        raise UploadError(f'Chunk is larger than {get_chunk_max_size()} bytes.')
+    if offset + length > session.size:
+        raise UploadError('Chunk exceeds the declared file size.')
+
+    with open(_storage_path(session), 'r+b') as file:
+        # Блокировка файла не дает двум запросам с одним смещением писать одновременно:
+        # второй получает 409 и продолжает с нового смещения
+        try:
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise UploadConflict('Another chunk of this upload is being written.')
+        # Смещение перечитывается под блокировкой: параллельный запрос мог его сдвинуть
+        session.refresh_from_db(fields=['offset', 'completed_at'])
+        if session.completed_at is not None:
+            raise UploadConflict('Upload is already completed.')
+        if offset != session.offset:
+            raise UploadConflict(f'Upload offset is {session.offset}.')
+
+        digest = hashlib.sha256()
+        written = 0
+        with timed('storage'):
+            file.seek(offset)
+            while written < length:
+                block = stream.read(min(BLOCK_SIZE, length - written))
+                if not block:
+                    break
+                file.write(block)
+                digest.update(block)
+                written += len(block)
+            file.flush()
+            os.fsync(file.fileno())
+
+        # Смещение не сдвигается: байты после него перезапишет повторная отправка части
+        if written != length:
+            raise UploadError('Chunk body is shorter than Content-Length.')
+        if checksum and digest.hexdigest() != checksum.lower():
+            raise UploadConflict('Chunk checksum mismatch.')
+
+        now = timezone.now()
+        updated = UploadSession.objects.filter(pk=session.pk, offset=offset, completed_at__isnull=True).update(
+            offset=offset + written,
+            updated_at=now,
+        )
+    if not updated:
+        session.refresh_from_db()
+        raise UploadConflict(f'Upload offset is {session.offset}.')
+    session.offset, session.updated_at = offset + written, now
+    UPLOAD_BYTES.labels(session.target).inc(written)
+    return session
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _attach(session: UploadSession, name: str):
+    if session.target == UploadSession.TARGET_SUBMISSION:
+        try:
+            with transaction.atomic():
+                return TaskSubmission.objects.create(
+                    task_id=session.content.object_id,
+                    student=session.owner,
+                    file=name,
+                )
+        except IntegrityError:
+            raise UploadConflict('Task already exists by your user')
+
+    model = TARGET_MODELS[session.target]
+    item = model.objects.create(title=session.title or session.filename, file=name)
+    Content.objects.create(
+        lesson=session.lesson,
+        content_type=ContentType.objects.get_for_model(model),
+        object_id=item.id,
+    )
+    return item
+
+
+def complete_upload(session: UploadSession):
+    """
+    Проверяет размер и контрольную сумму файла, переименовывает его в имя с хешем
+    содержимого (catalog.storage) и прикрепляет к целевой модели.
+
+    :param session: Сессия загрузки.
+    :return: Созданный TaskSubmission, File или Image.
+    """
+    with transaction.atomic():
+        session = UploadSession.objects.select_for_update().get(pk=session.pk)
+        if session.completed_at is not None:
+            raise UploadConflict('Upload is already completed.')
+        if session.offset != session.size:
+            raise UploadError(f'Upload is incomplete: {session.offset} of {session.size} bytes received.')
+
+        path = _storage_path(session)
+        with timed('storage'):
+            # Отрезаем хвост, оставшийся от прерванной записи части
+            os.truncate(path, session.size)
+            digest = _file_sha256(path)
+        if session.sha256 and digest != session.sha256:
+            raise UploadError('File checksum mismatch.')
+
+        field = _file_field(session.target)
+        name = field.storage.get_available_name(
+            hashed_name(session.path, digest, field.max_length),
+            max_length=field.max_length,
+        )
+        with timed('storage'):
+            os.rename(path, field.storage.path(name))
+        try:
+            item = _attach(session, name)
+            session.path = name
+            session.completed_at = timezone.now()
+            session.save(update_fields=['path', 'completed_at', 'updated_at'])
+        except BaseException:
+            # Сессия остается незавершенной и должна указывать на свой файл
+            os.rename(field.storage.path(name), path)
+            raise
+    return item
+
+
+def is_task_content(content: Content) -> bool:
+    return content.content_type_id == ContentType.objects.get_for_model(Task).id
+
+
+def stale_sessions():
+    """
+    Незавершенные сессии, которые не обновлялись дольше ``UPLOAD_SESSION_TTL``.
+    """
+    ttl = getattr(settings, 'UPLOAD_SESSION_TTL', 24 * 60 * 60)
+    return UploadSession.objects.filter(
+        completed_at__isnull=True,
+        updated_at__lt=timezone.now() - timedelta(seconds=ttl),
+    )
+
+
+@receiver(post_delete, sender=UploadSession)
+def delete_incomplete_upload(sender, instance, **kwargs):
+    # Файл завершенной загрузки принадлежит целевой модели
+    if instance.completed_at is None:
+        transaction.on_commit(lambda: _file_field(instance.target).storage.delete(instance.path))
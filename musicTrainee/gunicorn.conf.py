@@ -0,0 +1,25 @@
+"""
+Настройки gunicorn, файл подхватывается из рабочего каталога автоматически.
+
+Метрики Prometheus (musicTrainee.metrics) воркеры пишут в общий каталог
+``PROMETHEUS_MULTIPROC_DIR``, поэтому ``/metrics`` любого воркера отдает сумму по всем.
+Переменная задается здесь, до запуска воркеров; каталог очищается при старте сервера,
+а значения gauge завершившихся воркеров перестают учитываться.
+"""
+
+import os
+import shutil
+
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/prometheus-multiproc')
+
+
+def on_starting(server):
+    path = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
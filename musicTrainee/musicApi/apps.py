@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class MusicapiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'musicApi'
+
+    def ready(self):
+        # Время сериализации и отрисовки ответов DRF в Server-Timing (musicTrainee.timing)
+        from musicTrainee.timing import instrument_drf
+        instrument_drf()
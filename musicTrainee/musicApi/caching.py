@@ -0,0 +1,86 @@
+"""
+Кэширование ответов GET-представлений в двухуровневом кэше musicTrainee.cache.
+"""
+
+import functools
+import hashlib
+import inspect
+
+from rest_framework import status
+from rest_framework.response import Response
+
+from musicTrainee.cache import TwoTierCache
+
+response_cache = TwoTierCache('response')
+
+
+class _UncachedResponse(Exception):
+    def __init__(self, response):
+        self.response = response
+
+
+def cache_response(scopes=None, timeout=None, per_user=False):
+    """
+    Декоратор метода ``get``/``list``/``retrieve`` представления DRF.
+
+    Кэшируются только данные ответов 200. Ключ строится из класса представления,
+    полного URL запроса и, при ``per_user``, идентификатора пользователя, поэтому
+    проверки прав в ``initial()`` выполняются до обращения к кэшу.
+
+    Асинхронные методы (``alist``/``aretrieve`` представлений adrf) кэшируются через
+    ``TwoTierCache.aget_or_set``.
+
+    :param scopes: Области поколений или функция ``(view, request, **kwargs) -> список областей``.
+    :param timeout: Время жизни записи в общем кэше.
+    :param per_user: Кэшировать ответ отдельно для каждого пользователя.
+    """
+    def make_key(view, request, kwargs):
+        parts = [type(view).__module__, type(view).__qualname__, request.build_absolute_uri()]
+        if per_user:
+            parts.append(str(request.user.pk))
+        key = hashlib.md5('|'.join(parts).encode('utf-8')).hexdigest()
+        view_scopes = scopes(view, request, **kwargs) if callable(scopes) else (scopes or ())
+        return key, tuple(view_scopes)
+
+    def decorator(method):
+        if inspect.iscoroutinefunction(method):
+            @functools.wraps(method)
+            async def async_wrapper(view, request, *args, **kwargs):
+                if request.method not in ('GET', 'HEAD'):
+                    return await method(view, request, *args, **kwargs)
+
+                key, view_scopes = make_key(view, request, kwargs)
+
+                async def compute():
+                    response = await method(view, request, *args, **kwargs)
+                    if response.status_code != status.HTTP_200_OK:
+                        raise _UncachedResponse(response)
+                    return response.data
+
+                try:
+                    data = await response_cache.aget_or_set(key, compute, timeout=timeout, scopes=view_scopes)
+                except _UncachedResponse as exc:
+                    return exc.response
+                return Response(data)
+            return async_wrapper
+
+        @functools.wraps(method)
+        def wrapper(view, request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return method(view, request, *args, **kwargs)
+
+            key, view_scopes = make_key(view, request, kwargs)
+
+            def compute():
+                response = method(view, request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    raise _UncachedResponse(response)
+                return response.data
+
+            try:
+                data = response_cache.get_or_set(key, compute, timeout=timeout, scopes=view_scopes)
+            except _UncachedResponse as exc:
+                return exc.response
+            return Response(data)
+        return wrapper
+    return decorator
@@ -0,0 +1,49 @@
+"""
+Условный GET (ETag / Last-Modified) по полю ``updated_at``.
+
+Версия ресурса читается одним запросом по индексу до загрузки объекта и
+сериализации, поэтому ответ ``304 Not Modified`` не выполняет работу представления.
+"""
+
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date
+
+
+def _validators(view, request, last_modified):
+    # Слабый ETag: одно состояние ресурса может отдаваться разными рендерерами
+    renderer = getattr(request, 'accepted_renderer', None)
+    version = f'{type(view).__name__}-{getattr(renderer, "format", "")}-{last_modified.timestamp():.6f}'
+    return 'W/' + quote_etag(version), int(last_modified.timestamp())
+
+
+def _set_validators(response, etag, timestamp):
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(timestamp)
+    return response
+
+
+class AsyncConditionalGetMixin:
+    """
+    Миксин асинхронных представлений adrf с условным GET.
+
+    Наследник переопределяет корутину ``aget_last_modified()``, возвращающую ``updated_at``
+    ресурса или None, если ресурс не найден (тогда запрос обрабатывается как обычно).
+    Проверки прав выполняются раньше, в ``initial()``.
+    """
+
+    async def aget_last_modified(self):
+        # Без версии ресурса ответ отдается без ETag и Last-Modified
+        return None
+
+    async def get(self, request, *args, **kwargs):
+        last_modified = await self.aget_last_modified()
+        if last_modified is None:
+            return await super().get(request, *args, **kwargs)
+
+        etag, timestamp = _validators(self, request, last_modified)
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = await super().get(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+        return _set_validators(response, etag, timestamp)
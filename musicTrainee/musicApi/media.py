@@ -0,0 +1,48 @@
+"""
+Ответы на скачивание медиа-файлов.
+
+Права проверяются в catalog.media, а сами байты отдает nginx: ответ содержит только
+заголовок ``X-Accel-Redirect`` на внутреннюю локацию ``MEDIA_ACCEL_REDIRECT_PREFIX``.
+Файлы с хешем содержимого в имени (catalog.storage) кэшируются браузером надолго,
+остальные перепроверяются по ETag/Last-Modified, которые выставляет nginx.
+"""
+
+import mimetypes
+import os
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, HttpResponse
+
+from catalog.storage import is_hashed_name
+
+
+def media_cache_control(name: str, access: str) -> str:
+    """
+    Значение Cache-Control для файла: ``access`` - public или private.
+    """
+    if is_hashed_name(name):
+        max_age = getattr(settings, 'MEDIA_IMMUTABLE_MAX_AGE', 365 * 24 * 60 * 60)
+        return f'{access}, max-age={max_age}, immutable'
+    return f'{access}, no-cache'
+
+
+def media_response(name: str, access: str):
+    """
+    Ответ, передающий отдачу файла nginx, или сам файл, если префикс не настроен.
+
+    :param name: Имя файла в хранилище относительно MEDIA_ROOT.
+    :param access: public или private.
+    """
+    prefix = getattr(settings, 'MEDIA_ACCEL_REDIRECT_PREFIX', '')
+    if prefix:
+        response = HttpResponse(content_type=mimetypes.guess_type(name)[0] or 'application/octet-stream')
+        response['X-Accel-Redirect'] = prefix + quote(name)
+    else:
+        path = default_storage.path(name)
+        if not os.path.isfile(path):
+            raise Http404
+        response = FileResponse(open(path, 'rb'))
+    response['Cache-Control'] = media_cache_control(name, access)
+    return response
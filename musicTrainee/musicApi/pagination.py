@@ -0,0 +1,221 @@
+"""
+Постраничная выдача списков API по ключу (keyset / cursor pagination).
+
+Страница выбирается условием "строго после позиции" по полям сортировки
+(``created > :created OR (created = :created AND id > :id)``, см.
+``build_position_filter``), которое обслуживается составным индексом, поэтому
+стоимость запроса не зависит от глубины прокрутки, а ``COUNT(*)`` не выполняется вовсе.
+Асинхронные представления вызывают ``apaginate_queryset``.
+"""
+
+import base64
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Пагинация по набору полей сортировки.
+
+    Курсор хранит значения полей ``ordering`` первой/последней записи страницы
+    и направление обхода. Последнее поле сортировки должно быть уникальным
+    (как правило, ``id``), чтобы порядок был строгим.
+    """
+    ordering = ('created', 'id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.prepare_page_queryset(queryset, request)
+        return self.set_page(list(queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        queryset = self.prepare_page_queryset(queryset, request)
+        return self.set_page([item async for item in queryset])
+
+    def prepare_page_queryset(self, queryset, request):
+        """
+        Сортирует и фильтрует queryset по курсору, возвращает срез страницы.
+        """
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+
+        self.cursor = self.decode_cursor(request)
+        self.reverse = bool(self.cursor and self.cursor['reverse'])
+        ordering = self.get_ordering(self.reverse)
+
+        queryset = queryset.order_by(*ordering)
+        if self.cursor is not None:
+            queryset = queryset.filter(self.build_position_filter(queryset.model, ordering, self.cursor['position']))
+
+        # Берем на одну запись больше, чтобы узнать о наличии следующей страницы без COUNT(*)
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, results):
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if self.reverse:
+            results.reverse()
+
+        if self.reverse:
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.cursor is not None
+
+        self.page = results
+        return results
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'The pagination cursor value.',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Number of results to return per page.',
+                'schema': {'type': 'integer'},
+            },
+        ]
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_ordering(self, reverse=False):
+        if not reverse:
+            return tuple(self.ordering)
+        return tuple(field[1:] if field.startswith('-') else f'-{field}' for field in self.ordering)
+
+    def get_position(self, instance):
+        return [getattr(instance, field.lstrip('-')) for field in self.ordering]
+
+    def build_position_filter(self, model, ordering, position):
+        """
+        Строит условие "строго после позиции" для лексикографической сортировки:
+        ``a > x OR (a = x AND b > y) OR ...``.
+        """
+        if len(position) != len(ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        values = [self.to_python(model, field.lstrip('-'), value) for field, value in zip(ordering, position)]
+        condition = Q()
+        for index, field in enumerate(ordering):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            step = Q(**{f'{name}__{lookup}': values[index]})
+            for prev_field, prev_value in zip(ordering[:index], values[:index]):
+                step &= Q(**{prev_field.lstrip('-'): prev_value})
+            condition |= step
+        return condition
+
+    def to_python(self, model, name, value):
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return value
+        try:
+            return field.to_python(value)
+        except ValidationError:
+            raise NotFound(self.invalid_cursor_message)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            data = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            return {'reverse': bool(data['r']), 'position': list(data['p'])}
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, position, reverse):
+        payload = json.dumps({'r': int(reverse), 'p': position}, default=str, separators=(',', ':'))
+        encoded = base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.get_position(self.page[-1]), reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.get_position(self.page[0]), reverse=True)
+
+
+class CourseKeysetPagination(KeysetPagination):
+    """
+    Пагинация курсов по (created, id).
+    """
+    ordering = ('created', 'id')
+
+
+class CourseSearchKeysetPagination(KeysetPagination):
+    """
+    Пагинация результатов поиска курсов по релевантности (search_rank, id).
+    """
+    ordering = ('-search_rank', 'id')
+
+
+class TaskKeysetPagination(KeysetPagination):
+    """
+    Пагинация заданий по первичному ключу.
+    """
+    ordering = ('id',)
+
+
+class SubmissionKeysetPagination(KeysetPagination):
+    """
+    Пагинация ответов на задания по (submitted_at, id), новые сверху.
+    """
+    ordering = ('-submitted_at', '-id')
+
+
+class RatingKeysetPagination(KeysetPagination):
+    """
+    Пагинация отзывов курса, новые сверху.
+    """
+    ordering = ('-id',)
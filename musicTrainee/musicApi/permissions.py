@@ -0,0 +1,24 @@
+from rest_framework.permissions import BasePermission
+
+from catalog.access import has_course_access
+
+
+class IsCourseMember(BasePermission):
+    """
+    Доступ к курсу из URL (``slug``) для записанных на него студентов, его создателя и модераторов.
+
+    Права берутся из кэша catalog.access и не требуют запроса к базе.
+    """
+    message = 'You do not have access to this course.'
+
+    def has_permission(self, request, view):
+        slug = view.kwargs.get('slug')
+        if slug is None:
+            return True
+
+        user = request.user
+        if not user or not user.is_authenticated:
+            return False
+        if getattr(user, 'is_moderator', False):
+            return True
+        return has_course_access(user.pk, slug)
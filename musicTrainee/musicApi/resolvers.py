@@ -0,0 +1,121 @@
+"""
+Разрешение вложенных путей курса ``slug/module_id/lesson_id/content_id``.
+
+Вся цепочка проверяется одним запросом с JOIN вместо последовательных
+``get_object_or_404`` по каждому уровню. Если объект не найден, уровни
+проверяются по очереди, чтобы ответ 404 совпадал с прежним.
+Асинхронные представления используют ``aresolve_course_path`` с теми же запросами.
+"""
+
+from typing import NamedTuple, Optional
+
+from adrf.generics import aget_object_or_404
+from rest_framework.generics import get_object_or_404
+
+from catalog.models import Course, Module, Lesson, Content
+
+
+class CoursePath(NamedTuple):
+    course: Course
+    module: Module
+    lesson: Optional[Lesson] = None
+    content: Optional[Content] = None
+
+
+def _path_queryset(slug, module_id, lesson_id, content_id, content_queryset):
+    # Queryset самого глубокого уровня пути с JOIN до курса
+    if content_id is not None:
+        queryset = content_queryset if content_queryset is not None else Content.objects.all()
+        return queryset.select_related('lesson__module__course').filter(
+            id=content_id,
+            lesson_id=lesson_id,
+            lesson__module_id=module_id,
+            lesson__module__course__slug=slug,
+        )
+    if lesson_id is not None:
+        return Lesson.objects.select_related('module__course').filter(
+            id=lesson_id,
+            module_id=module_id,
+            module__course__slug=slug,
+        )
+    return Module.objects.select_related('course').filter(id=module_id, course__slug=slug)
+
+
+def _path_from(found, lesson_id, content_id) -> CoursePath:
+    if content_id is not None:
+        lesson = found.lesson
+        return CoursePath(lesson.module.course, lesson.module, lesson, found)
+    if lesson_id is not None:
+        return CoursePath(found.module.course, found.module, found)
+    return CoursePath(found.course, found)
+
+
+def resolve_course_path(slug, module_id, lesson_id=None, content_id=None, content_queryset=None) -> CoursePath:
+    """
+    Загружает курс, модуль, урок и контент по параметрам URL одним запросом.
+
+    :param slug: Slug курса.
+    :param module_id: Идентификатор модуля.
+    :param lesson_id: Идентификатор урока (необязательно).
+    :param content_id: Идентификатор контента (необязательно, требует lesson_id).
+    :param content_queryset: Базовый queryset контента, например с prefetch элементов.
+    :return: Загруженные объекты пути.
+    """
+    path_queryset = _path_queryset(slug, module_id, lesson_id, content_id, content_queryset)
+    found = path_queryset.first()
+    if found is not None:
+        return _path_from(found, lesson_id, content_id)
+
+    # Медленный путь только для ошибок: находим уровень, на котором цепочка обрывается
+    course = get_object_or_404(Course, slug=slug)
+    module = get_object_or_404(Module, id=module_id, course=course)
+    lesson = get_object_or_404(Lesson, id=lesson_id, module=module)
+    content = get_object_or_404(Content, id=content_id, lesson=lesson)
+    return CoursePath(course, module, lesson, content)
+
+
+async def aresolve_course_path(slug, module_id, lesson_id=None, content_id=None, content_queryset=None) -> CoursePath:
+    """
+    Асинхронный вариант ``resolve_course_path``.
+    """
+    path_queryset = _path_queryset(slug, module_id, lesson_id, content_id, content_queryset)
+    found = await path_queryset.afirst()
+    if found is not None:
+        return _path_from(found, lesson_id, content_id)
+
+    course = await aget_object_or_404(Course, slug=slug)
+    module = await aget_object_or_404(Module, id=module_id, course=course)
+    lesson = await aget_object_or_404(Lesson, id=lesson_id, module=module)
+    content = await aget_object_or_404(Content, id=content_id, lesson=lesson)
+    return CoursePath(course, module, lesson, content)
+
+
+class CoursePathMixin:
+    """
+    Миксин представлений с URL вида ``<slug>/modules/<module_id>/<lesson_id>/<content_id>``.
+    """
+
+    def get_path_content_queryset(self):
+        return None
+
+    def get_course_path(self) -> CoursePath:
+        if not hasattr(self, '_course_path'):
+            self._course_path = resolve_course_path(
+                slug=self.kwargs.get('slug'),
+                module_id=self.kwargs.get('module_id'),
+                lesson_id=self.kwargs.get('lesson_id'),
+                content_id=self.kwargs.get('content_id'),
+                content_queryset=self.get_path_content_queryset(),
+            )
+        return self._course_path
+
+    async def aget_course_path(self) -> CoursePath:
+        if not hasattr(self, '_course_path'):
+            self._course_path = await aresolve_course_path(
+                slug=self.kwargs.get('slug'),
+                module_id=self.kwargs.get('module_id'),
+                lesson_id=self.kwargs.get('lesson_id'),
+                content_id=self.kwargs.get('content_id'),
+                content_queryset=self.get_path_content_queryset(),
+            )
+        return self._course_path
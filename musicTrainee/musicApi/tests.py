@@ -1,3 +1,474 @@
-from django.test import TestCase
+"""
+Регрессионные тесты числа SQL-запросов для всех маршрутов musicApi.
 
-# Create your tests here.
+Данные создаются генератором catalog.perfdata с разветвлением ``FANOUT``: курсов в списках,
+модулей курса, уроков модуля, ответов на вопрос, отзывов, ответов на задание и комментариев. Запрос на каждую строку
+увеличивает число запросов маршрута хотя бы на ``FANOUT`` и выходит за его границу
+из ``QUERY_LIMITS``. Границы равны текущему числу запросов: после оптимизации маршрута
+границу нужно уменьшить, новый маршрут без границы не проходит ``test_every_route_has_limit``.
+"""
+
+import shutil
+import tempfile
+from urllib.parse import urlsplit
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, resolve
+from rest_framework.test import APIClient
+
+from accounts.models import CustomAccount, PasswordResetRequest
+from catalog.models import Answer, Course, Question, Task, TaskSubmission, UploadSession
+from catalog.perfdata import Fanout, generate_perf_data
+from catalog.testing import authenticate, create_user, png_bytes
+from musicApi import urls as api_urls
+from musicApi.pagination import TaskKeysetPagination
+from musicTrainee.cache import clear_local_caches
+
+FANOUT = 3
+
+# Граница числа запросов по методу и маршруту (URL-шаблону)
+QUERY_LIMITS = {
+    ('GET', 'api/user/<int:user_id>/'): 2,
+    ('GET', 'api/auth/aboutme/'): 2,
+    ('POST', 'api/auth/signup/'): 12,
+    ('POST', 'api/auth/signup/confirm'): 14,
+    ('GET', 'api/auth/logout/'): 2,
+    ('POST', 'api/auth/login/'): 10,
+    ('POST', 'api/auth/reset-request/'): 9,
+    ('POST', 'api/auth/reset-confirm/'): 8,
+    ('PATCH', 'api/auth/update/'): 5,
+    ('GET', 'api/mycourses/'): 2,
+    ('GET', 'api/mycourses/<str:slug>/'): 5,
+    ('POST', 'api/mycourses/<str:slug>/review-post/'): 9,
+    ('GET', 'api/mycourses/<str:slug>/tree/'): 21,
+    ('GET', 'api/mycourses/<str:slug>/modules/'): 4,
+    ('GET', 'api/mycourses/<str:slug>/modules/<int:module_id>/'): 13,
+    ('GET', 'api/mycourses/<str:slug>/modules/<int:module_id>/<int:lesson_id>/'): 13,
+    ('GET', 'api/mycourses/<str:slug>/modules/<int:module_id>/<int:lesson_id>/<int:content_id>/'): 6,
+    ('POST', 'api/mycourses/<str:slug>/modules/<int:module_id>/<int:lesson_id>/<int:content_id>/'): 6,
+    ('GET', 'api/mycourses/<str:slug>/modules/<int:module_id>/<int:lesson_id>/<int:content_id>/submission'): 5,
+    ('GET', 'api/mycourses/<str:slug>/modules/<int:module_id>/<int:lesson_id>/<int:content_id>/submission/review'): 6,
+    ('POST', 'api/mycourses/<str:slug>/modules/<int:module_id>/<int:lesson_id>/<int:content_id>/comments/'): 8,
+    ('GET', 'api/catalog/'): 2,
+    ('GET', 'api/catalog/<str:slug>/'): 4,
+    ('POST', 'api/catalog/<str:slug>/'): 9,
+    ('GET', 'api/catalog/<str:slug>/ratings/'): 4,
+    ('GET', 'api/mycreations/'): 2,
+    ('POST', 'api/mycreations/create/paid/'): 13,
+    ('POST', 'api/mycreations/create/free/'): 13,
+    ('GET', 'api/mycreations/create/<str:slug>/'): 4,
+    ('GET', 'api/mycreations/create/<str:slug>/modules/'): 3,
+    ('POST', 'api/mycreations/create/<str:slug>/modules/'): 10,
+    ('GET', 'api/mycreations/create/<str:slug>/modules/<int:module_id>'): 12,
+    ('PATCH', 'api/mycreations/create/<str:slug>/modules/<int:module_id>'): 9,
+    ('POST', 'api/mycreations/create/<str:slug>/modules/<int:module_id>'): 11,
+    ('DELETE', 'api/mycreations/create/<str:slug>/modules/<int:module_id>'): 13,
+    ('GET', 'api/mycreations/create/<str:slug>/modules/<int:module_id>/<int:lesson_id>/'): 11,
+    ('PATCH', 'api/mycreations/create/<str:slug>/modules/<int:module_id>/<int:lesson_id>/'): 19,
+    ('DELETE', 'api/mycreations/create/<str:slug>/modules/<int:module_id>/<int:lesson_id>/'): 12,
+    ('GET', 'api/mycreations/create/<str:slug>/modules/<int:module_id>/<int:lesson_id>/<int:content_id>/'): 3,
+    ('DELETE', 'api/mycreations/create/<str:slug>/modules/<int:module_id>/<int:lesson_id>/<int:content_id>/'): 11,
+    ('POST', 'api/mycreations/create/<str:slug>/modules/<int:module_id>/<int:lesson_id>/text/'): 14,
+    ('PATCH', 'api/mycreations/create/<str:slug>/modules/<int:module_id>/<int:lesson_id>/text/'): 13,
+    ('POST', 'api/mycreations/create/<str:slug>/modules/<int:module_id>/<int:lesson_id>/file/'): 14,
+    ('PATCH', 'api/mycreations/create/<str:slug>/modules/<int:module_id>/<int:lesson_id>/file/'): 13,
+    ('POST', 'api/mycreations/create/<str:slug>/modules/<int:module_id>/<int:lesson_id>/image/'): 15,
+    ('POST', 'api/mycreations/create/<str:slug>/modules/<int:module_id>/<int:lesson_id>/question/'): 15,
+    ('PATCH', 'api/mycreations/create/<str:slug>/modules/<int:module_id>/<int:lesson_id>/question/'): 14,
+    ('POST', 'api/mycreations/create/<str:slug>/modules/<int:module_id>/<int:lesson_id>/answer/'): 21,
+    ('PATCH', 'api/mycreations/create/<str:slug>/modules/<int:module_id>/<int:lesson_id>/answer/<int:answer_id>'): 10,
+    ('DELETE', 'api/mycreations/create/<str:slug>/modules/<int:module_id>/<int:lesson_id>/answer/<int:answer_id>'): 16,
+    ('POST', 'api/mycreations/create/<str:slug>/modules/<int:module_id>/<int:lesson_id>/task/'): 14,
+    ('PATCH', 'api/mycreations/create/<str:slug>/modules/<int:module_id>/<int:lesson_id>/task/'): 13,
+    ('GET', 'api/mycreations/tasks/'): 2,
+    ('GET', 'api/mycreations/tasks/<int:task_id>/'): 2,
+    ('GET', 'api/mycreations/tasks/<int:task_id>/<int:sub_id>/'): 2,
+    ('POST', 'api/mycreations/tasks/<int:task_id>/<int:sub_id>/'): 6,
+    ('GET', 'api/mycreations/review-queue/'): 1,
+    ('POST', 'api/mycreations/review-queue/'): 7,
+    ('POST', 'api/mycreations/review-queue/release/'): 1,
+    ('POST', 'api/mycreations/reviews/bulk/'): 8,
+    ('PATCH', 'api/mycreations/<str:slug>/approve/'): 6,
+    ('GET', 'api/moderation/'): 3,
+    ('GET', 'api/moderation/<str:slug>/'): 3,
+    ('PATCH', 'api/moderation/<str:slug>/'): 5,
+    ('GET', 'api/moderation/<str:slug>/modules/<int:module_id>/<int:lesson_id>/<int:content_id>/'): 5,
+    ('POST', 'api/uploads/'): 4,
+    ('GET', 'api/uploads/<uuid:session_id>/'): 1,
+    ('PUT', 'api/uploads/<uuid:session_id>/'): 3,
+    ('DELETE', 'api/uploads/<uuid:session_id>/'): 2,
+    ('POST', 'api/uploads/<uuid:session_id>/complete/'): 19,
+    ('GET', 'api/cache/stats/'): 1,
+    ('GET', 'api/timing/slow/'): 1,
+    ('DELETE', 'api/timing/slow/'): 0,
+}
+
+
+@override_settings(
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+    REQUEST_TIMING_SAMPLE_RATE=0,
+)
+class QueryCountTests(TestCase):
+    """
+    Число SQL-запросов каждого маршрута musicApi на данных с разветвлением FANOUT.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.media_root = tempfile.mkdtemp()
+        cls.media_override = override_settings(MEDIA_ROOT=cls.media_root)
+        cls.media_override.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.media_override.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        # Один автор; студенты записаны на все курсы, у каждого курса один студент без оценки
+        generate_perf_data(Fanout(
+            users=FANOUT + 1, creators=1, courses=2 * FANOUT, drafts=FANOUT, modules=FANOUT, lessons=FANOUT,
+            answers=FANOUT, enrollments=FANOUT + 1, ratings=FANOUT, submissions=FANOUT, reviews=1, comments=FANOUT,
+        ), prefix='test')
+        cls.creator = CustomAccount.objects.get(username='test-creator-0')
+        cls.moderator = CustomAccount.objects.get(username='test-moderator')
+        cls.admin = CustomAccount.objects.get(username='test-admin')
+        cls.outsider = create_user('outsider')
+
+        cls.course = Course.objects.filter(approval=True).order_by('pk').first()
+        cls.draft = Course.objects.filter(approval=False).order_by('pk').first()
+        cls.student = CustomAccount.objects.filter(enrollments__course=cls.course).exclude(
+            ratings__course=cls.course,
+        ).get()
+
+        cls.module = cls.course.modules.first()
+        cls.lesson = cls.module.lessons.first()
+        contents = {type(content.item): content for content in cls.lesson.contents.all()}
+        cls.question_content = contents[Question]
+        cls.task_content = contents[Task]
+        cls.task = cls.task_content.item
+        cls.answer = Answer.objects.filter(question=cls.question_content.item).order_by('pk').first()
+        # Первый ответ на задание проверен
+        cls.submissions = list(TaskSubmission.objects.filter(task=cls.task).order_by('pk'))
+
+    def setUp(self):
+        # Кэши ответов и прав общие для тестов: каждый маршрут проверяется с холодным кэшем
+        clear_local_caches()
+        cache.clear()
+        self.client = APIClient()
+
+    def lesson_url(self, prefix: str = 'api/mycourses', course=None, module=None, lesson=None) -> str:
+        course = course or self.course
+        module = module or course.modules.first()
+        lesson = lesson or module.lessons.first()
+        return f'/{prefix}/{course.slug}/modules/{module.id}/{lesson.id}/'
+
+    def creation_url(self, suffix: str = '') -> str:
+        return self.lesson_url('api/mycreations/create') + suffix
+
+    def assertQueries(self, method: str, url: str, user=None, status: int = 200, **kwargs):
+        """
+        Выполняет запрос от имени пользователя (JWT) и проверяет код ответа и число SQL-запросов.
+        """
+        route = resolve(urlsplit(url).path).route
+        limit = QUERY_LIMITS[(method, route)]
+        authenticate(self.client, user)
+
+        with CaptureQueriesContext(connection) as context:
+            response = getattr(self.client, method.lower())(url, **kwargs)
+
+        self.assertEqual(response.status_code, status, f'{method} {url}: {response.content[:500]!r}')
+        if len(context) > limit:
+            queries = '\n'.join(f'  {query["sql"]}' for query in context.captured_queries)
+            self.fail(f'{method} {route}: {len(context)} queries, limit {limit}\n{queries}')
+        return response
+
+    def test_every_route_has_limit(self):
+        routes = {f'api/{pattern.pattern}' for pattern in api_urls.urlpatterns if isinstance(pattern, URLPattern)}
+        self.assertEqual(routes, {route for _, route in QUERY_LIMITS})
+
+    # Пользователи и аутентификация
+
+    def test_user_info(self):
+        self.assertQueries('GET', f'/api/user/{self.creator.id}/', self.student)
+
+    def test_about_me(self):
+        self.assertQueries('GET', '/api/auth/aboutme/', self.student)
+
+    def test_sign_up(self):
+        self.assertQueries('POST', '/api/auth/signup/', status=201, format='json',
+                           data={'username': 'newcomer', 'email': 'newcomer@example.com', 'password': 'password'})
+
+    def test_sign_up_confirm(self):
+        user = CustomAccount.objects.create(username='pending', email='pending@example.com', password='password')
+        PasswordResetRequest.issue(user.email, PasswordResetRequest.KIND_CONFIRM, '123456')
+        self.assertQueries('POST', '/api/auth/signup/confirm', format='json',
+                           data={'confirm_code': '123456', 'email': user.email})
+
+    def test_login(self):
+        self.assertQueries('POST', '/api/auth/login/', format='json',
+                           data={'username': self.student.username, 'password': 'password'})
+
+    def test_logout(self):
+        self.assertQueries('GET', '/api/auth/logout/', self.student)
+
+    def test_reset_request(self):
+        self.assertQueries('POST', '/api/auth/reset-request/', status=201, format='json',
+                           data={'email': self.student.email})
+
+    def test_reset_confirm(self):
+        PasswordResetRequest.issue(self.student.email, PasswordResetRequest.KIND_RESET, '654321')
+        self.assertQueries('POST', '/api/auth/reset-confirm/', status=201, format='json',
+                           data={'reset_code': '654321', 'email': self.student.email, 'new_password': 'changed'})
+
+    def test_update_user(self):
+        self.assertQueries('PATCH', '/api/auth/update/', self.student, status=201, format='json',
+                           data={'first_name': 'Name'})
+
+    # Курсы студента
+
+    def test_my_courses(self):
+        response = self.assertQueries('GET', '/api/mycourses/', self.student)
+        self.assertEqual(len(response.data['results']), FANOUT * 2)
+
+    def test_my_course_details(self):
+        response = self.assertQueries('GET', f'/api/mycourses/{self.course.slug}/', self.student)
+        self.assertEqual(len(response.data['ratings']), FANOUT)
+
+    def test_my_course_review(self):
+        self.assertQueries('POST', f'/api/mycourses/{self.course.slug}/review-post/', self.student, status=201,
+                           format='json', data={'rating': 5, 'review': 'Review'})
+
+    def test_my_course_tree(self):
+        response = self.assertQueries('GET', f'/api/mycourses/{self.course.slug}/tree/', self.student)
+        self.assertEqual(len(response.data['modules']), FANOUT)
+
+    def test_my_course_modules(self):
+        response = self.assertQueries('GET', f'/api/mycourses/{self.course.slug}/modules/', self.student)
+        self.assertEqual(len(response.data), FANOUT)
+
+    def test_my_course_module_lessons(self):
+        url = f'/api/mycourses/{self.course.slug}/modules/{self.module.id}/'
+        response = self.assertQueries('GET', url, self.student)
+        self.assertEqual(len(response.data), FANOUT)
+
+    def test_my_course_lesson(self):
+        response = self.assertQueries('GET', self.lesson_url(), self.student)
+        self.assertEqual(len(response.data['contents']), 6)
+
+    def test_my_course_content(self):
+        for content in self.lesson.contents.all():
+            with self.subTest(type=content.content_type.model):
+                self.assertQueries('GET', f'{self.lesson_url()}{content.id}/', self.student)
+
+    def test_my_course_content_answer(self):
+        url = f'{self.lesson_url()}{self.question_content.id}/'
+        response = self.assertQueries('POST', url, self.student, format='json', data={'answer': self.answer.text})
+        self.assertEqual(response.data['message'], 'Correct answer')
+
+    def test_my_course_content_submission(self):
+        url = f'{self.lesson_url()}{self.task_content.id}/submission'
+        self.assertQueries('GET', url, self.submissions[0].student)
+
+    def test_my_course_content_submission_review(self):
+        url = f'{self.lesson_url()}{self.task_content.id}/submission/review'
+        self.assertQueries('GET', url, self.submissions[0].student)
+
+    def test_comment_create(self):
+        url = f'{self.lesson_url()}{self.task_content.id}/comments/'
+        self.assertQueries('POST', url, self.student, status=201, format='json', data={'text': 'Comment'})
+
+    # Каталог
+
+    def test_catalog(self):
+        response = self.assertQueries('GET', '/api/catalog/', self.student)
+        self.assertEqual(len(response.data['results']), FANOUT)
+
+    def test_catalog_search(self):
+        response = self.assertQueries('GET', '/api/catalog/?q=course', self.student)
+        self.assertTrue(response.data['results'])
+
+    def test_catalog_detail(self):
+        response = self.assertQueries('GET', f'/api/catalog/{self.course.slug}/', self.student)
+        self.assertEqual(len(response.data['ratings']), FANOUT)
+
+    def test_catalog_enroll(self):
+        self.assertQueries('POST', f'/api/catalog/{self.course.slug}/', self.outsider)
+
+    def test_catalog_ratings(self):
+        response = self.assertQueries('GET', f'/api/catalog/{self.course.slug}/ratings/', self.student)
+        self.assertEqual(len(response.data['results']), FANOUT)
+
+    # Создание курсов
+
+    def test_my_creations(self):
+        response = self.assertQueries('GET', '/api/mycreations/', self.creator)
+        self.assertEqual(len(response.data['results']), FANOUT * 2)
+
+    def test_course_create_paid(self):
+        self.assertQueries('POST', '/api/mycreations/create/paid/', self.creator, status=201, format='json', data={
+            'title': 'Paid course', 'target_description': 'Target', 'description': 'Description', 'price': '10.00',
+        })
+
+    def test_course_create_free(self):
+        self.assertQueries('POST', '/api/mycreations/create/free/', self.creator, status=201, format='json', data={
+            'title': 'Free course', 'target_description': 'Target', 'description': 'Description',
+        })
+
+    def test_course_create_detail(self):
+        self.assertQueries('GET', f'/api/mycreations/create/{self.course.slug}/', self.creator)
+
+    def test_course_create_modules(self):
+        url = f'/api/mycreations/create/{self.course.slug}/modules/'
+        response = self.assertQueries('GET', url, self.creator)
+        self.assertEqual(len(response.data), FANOUT)
+        self.assertQueries('POST', url, self.creator, status=201, format='json', data={'title': 'Module'})
+
+    def test_course_create_lessons(self):
+        url = f'/api/mycreations/create/{self.course.slug}/modules/{self.module.id}'
+        response = self.assertQueries('GET', url, self.creator)
+        self.assertEqual(len(response.data[1]), FANOUT)
+        self.assertQueries('PATCH', url, self.creator, format='json', data={'title': 'Module'})
+        self.assertQueries('POST', url, self.creator, status=201, format='json', data={'title': 'Lesson'})
+        self.assertQueries('DELETE', url, self.creator, status=204)
+
+    def test_course_create_content(self):
+        url = self.creation_url()
+        response = self.assertQueries('GET', url, self.creator)
+        self.assertEqual(len(response.data['contents']), 6)
+        self.assertQueries('PATCH', url, self.creator, format='json', data={'title': 'Lesson'})
+        self.assertQueries('DELETE', url, self.creator, status=204)
+
+    def test_course_create_content_item(self):
+        for content in self.lesson.contents.all():
+            with self.subTest(type=content.content_type.model):
+                self.assertQueries('GET', self.creation_url(f'{content.id}/'), self.creator)
+        self.assertQueries('DELETE', self.creation_url(f'{self.task_content.id}/'), self.creator, status=204)
+
+    def test_course_create_text(self):
+        self.assertQueries('PATCH', self.creation_url('text/'), self.creator, format='json', data={'title': 'Text'})
+        self.assertQueries('POST', self.creation_url('text/'), self.creator, status=201, format='json',
+                           data={'title': 'Text', 'content': 'Text'})
+
+    def test_course_create_file(self):
+        self.assertQueries('PATCH', self.creation_url('file/'), self.creator, format='multipart',
+                           data={'title': 'File'})
+        self.assertQueries('POST', self.creation_url('file/'), self.creator, status=201, format='multipart',
+                           data={'title': 'File', 'file': SimpleUploadedFile('sheet.pdf', b'%PDF-1.4')})
+
+    def test_course_create_image(self):
+        self.assertQueries('POST', self.creation_url('image/'), self.creator, status=201, format='multipart',
+                           data={'title': 'Image', 'file': SimpleUploadedFile('image.png', png_bytes())})
+
+    def test_course_create_question(self):
+        self.assertQueries('PATCH', self.creation_url('question/'), self.creator, format='json',
+                           data={'title': 'Question'})
+        self.assertQueries('POST', self.creation_url('question/'), self.creator, status=201, format='json',
+                           data={'title': 'Question', 'text': 'Question'})
+
+    def test_course_create_answer(self):
+        self.assertQueries('POST', self.creation_url('answer/'), self.creator, status=201, format='json',
+                           data={'question': self.question_content.object_id, 'text': 'Answer', 'is_true': False})
+
+    def test_course_edit_answer(self):
+        url = self.creation_url(f'answer/{self.answer.id}')
+        self.assertQueries('PATCH', url, self.creator, format='json', data={'text': 'Answer'})
+        self.assertQueries('DELETE', url, self.creator, status=204)
+
+    def test_course_create_task(self):
+        self.assertQueries('PATCH', self.creation_url('task/'), self.creator, format='json', data={'title': 'Task'})
+        self.assertQueries('POST', self.creation_url('task/'), self.creator, status=201, format='json',
+                           data={'title': 'Task', 'description': 'Task'})
+
+    # Проверка заданий
+
+    def test_my_creations_tasks(self):
+        response = self.assertQueries('GET', '/api/mycreations/tasks/', self.creator)
+        # Задания всех уроков автора не помещаются на одну страницу
+        self.assertEqual(len(response.data['results']), TaskKeysetPagination.page_size)
+
+    def test_my_creations_task_submissions(self):
+        response = self.assertQueries('GET', f'/api/mycreations/tasks/{self.task.id}/', self.creator)
+        # Проверенный ответ в список не попадает
+        self.assertEqual(len(response.data['results']), FANOUT - 1)
+
+    def test_my_creations_task_submission(self):
+        url = f'/api/mycreations/tasks/{self.task.id}/{self.submissions[1].id}/'
+        self.assertQueries('GET', url, self.creator)
+        self.assertQueries('POST', url, self.creator, status=201, format='json',
+                           data={'is_correct': True, 'comment': 'Good'})
+
+    def test_review_queue(self):
+        response = self.assertQueries('POST', '/api/mycreations/review-queue/', self.creator, format='json',
+                                      data={'count': FANOUT})
+        self.assertEqual(len(response.data), FANOUT)
+        claimed = [submission['id'] for submission in response.data]
+        response = self.assertQueries('GET', '/api/mycreations/review-queue/', self.creator)
+        self.assertEqual(len(response.data), FANOUT)
+        response = self.assertQueries('POST', '/api/mycreations/review-queue/release/', self.creator, format='json',
+                                      data={'ids': claimed})
+        self.assertEqual(response.data['released'], FANOUT)
+
+    def test_reviews_bulk(self):
+        reviews = [{'submission_id': submission.id, 'is_correct': True} for submission in self.submissions]
+        response = self.assertQueries('POST', '/api/mycreations/reviews/bulk/', self.creator, format='json',
+                                      data={'reviews': reviews})
+        self.assertEqual(len(response.data['results']), FANOUT)
+
+    # Модерация
+
+    def test_approve_change(self):
+        self.assertQueries('PATCH', f'/api/mycreations/{self.draft.slug}/approve/', self.moderator, format='json',
+                           data={'action': 'approve'})
+
+    def test_moderation_courses(self):
+        response = self.assertQueries('GET', '/api/moderation/', self.moderator)
+        self.assertEqual(len(response.data['results']), FANOUT)
+
+    def test_moderation_modules(self):
+        url = f'/api/moderation/{self.draft.slug}/'
+        response = self.assertQueries('GET', url, self.moderator)
+        self.assertEqual(len(response.data), FANOUT)
+        self.assertQueries('PATCH', url, self.moderator, format='json', data={'action': 'approve'})
+
+    def test_moderation_content(self):
+        lesson_url = self.lesson_url('api/moderation', course=self.draft)
+        for content in self.draft.modules.first().lessons.first().contents.all():
+            with self.subTest(type=content.content_type.model):
+                self.assertQueries('GET', f'{lesson_url}{content.id}/', self.moderator)
+
+    # Загрузка файлов частями
+
+    def test_uploads(self):
+        data = b'x' * 1024
+        response = self.assertQueries('POST', '/api/uploads/', self.creator, status=201, format='json', data={
+            'target': UploadSession.TARGET_FILE, 'lesson_id': self.lesson.id, 'filename': 'sheet.pdf',
+            'size': len(data),
+        })
+        url = f'/api/uploads/{response.data["id"]}/'
+        self.assertQueries('GET', url, self.creator)
+        self.assertQueries('PUT', url, self.creator, data=data, content_type='application/octet-stream',
+                           HTTP_UPLOAD_OFFSET='0')
+        self.assertQueries('POST', f'{url}complete/', self.creator, status=201)
+
+    def test_upload_abort(self):
+        response = self.assertQueries('POST', '/api/uploads/', self.creator, status=201, format='json', data={
+            'target': UploadSession.TARGET_FILE, 'lesson_id': self.lesson.id, 'filename': 'sheet.pdf', 'size': 10,
+        })
+        self.assertQueries('DELETE', f'/api/uploads/{response.data["id"]}/', self.creator, status=204)
+
+    # Служебные
+
+    def test_cache_stats(self):
+        self.assertQueries('GET', '/api/cache/stats/', self.admin)
+
+    def test_slow_requests(self):
+        self.assertQueries('GET', '/api/timing/slow/', self.admin)
+        self.assertQueries('DELETE', '/api/timing/slow/', self.admin, status=204)
@@ -20,7 +20,9 @@ from .views import (
     LessonContentTextCreateView, LessonContentImageCreateView, LessonContentQuestionCreateView,
     LessonContentAnswerCreateView, LessonContentTaskCreateView, MyLessonView, MyCreateContentView,
     LessonContentAnswerEditView, UserInfoView, ModerationApproveChange, TaskView, TaskSubmissionsView,
-    TaskSubmissionView, MyCourseContentSubmissionView, MyCourseContentSubmissionReviewView, CourseCreateView
+    TaskSubmissionView, MyCourseContentSubmissionView, MyCourseContentSubmissionReviewView, CourseCreateView,
+    CatalogCourseRatingsView, MyCourseTreeView, CacheStatsView, SlowRequestsView, ReviewQueueView, ReviewQueueReleaseView,
+    BulkReviewView, UploadSessionCreateView, UploadSessionView, UploadSessionCompleteView
 )
 
 app_name = 'musicApi'
@@ -42,6 +44,7 @@ urlpatterns = [
     path('mycourses/', MyCoursesView.as_view(), name='my-courses'),
     path('mycourses/<str:slug>/', MyCourseDetailView.as_view(), name='my-course-details'),
     path('mycourses/<str:slug>/review-post/', MyCourseReView.as_view(), name='my-course-review'),
+    path('mycourses/<str:slug>/tree/', MyCourseTreeView.as_view(), name='my-course-tree'),
     path('mycourses/<str:slug>/modules/', MyCourseModulesView.as_view(), name='my-course-modules'),
     path('mycourses/<str:slug>/modules/<int:module_id>/', MyLessonsView.as_view(), name='my-course-module'),
     path('mycourses/<str:slug>/modules/<int:module_id>/<int:lesson_id>/', MyLessonView.as_view(), name='my-course-lesson'),
@@ -52,6 +55,7 @@ urlpatterns = [
 
     path('catalog/', CatalogCoursesView.as_view(), name='catalog'),
     path('catalog/<str:slug>/', CatalogCourseDetailView.as_view(), name='catalog-detail'),
+    path('catalog/<str:slug>/ratings/', CatalogCourseRatingsView.as_view(), name='catalog-ratings'),
 
     path('mycreations/', MyCreationCoursesView.as_view(), name='my-creations'),
     path('mycreations/create/paid/', PaidCourseCreateView.as_view(), name='course-create-paid'),
@@ -71,6 +75,9 @@ urlpatterns = [
     path('mycreations/tasks/', TaskView.as_view(), name='my-creations-tasks'),
     path('mycreations/tasks/<int:task_id>/', TaskSubmissionsView.as_view(), name='my-creations-submissions-tasks'),
     path('mycreations/tasks/<int:task_id>/<int:sub_id>/', TaskSubmissionView.as_view(), name='my-creations-submission-tasks'),
+    path('mycreations/review-queue/', ReviewQueueView.as_view(), name='review-queue'),
+    path('mycreations/review-queue/release/', ReviewQueueReleaseView.as_view(), name='review-queue-release'),
+    path('mycreations/reviews/bulk/', BulkReviewView.as_view(), name='reviews-bulk'),
     # path('mycreations/submissions/', TaskSubmissionsForReviewView.as_view(), name='my-creations-submissions'),
     # path('mycreations/submissions/<int:task_id>', TaskSubmissionReviewView.as_view(), name='my-creations-submissions-review'),
     path('mycreations/<str:slug>/approve/', ModerationApproveChange.as_view(), name='moderation-modules'),
@@ -78,4 +85,11 @@ urlpatterns = [
     path('moderation/', ModerationCoursesView.as_view(), name='moderation-courses'),
     path('moderation/<str:slug>/', ModerationModulesView.as_view(), name='moderation-modules'),
     path('moderation/<str:slug>/modules/<int:module_id>/<int:lesson_id>/<int:content_id>/', MyCourseContentView.as_view(), name='moderation-content'),
+
+    path('uploads/', UploadSessionCreateView.as_view(), name='upload-create'),
+    path('uploads/<uuid:session_id>/', UploadSessionView.as_view(), name='upload-session'),
+    path('uploads/<uuid:session_id>/complete/', UploadSessionCompleteView.as_view(), name='upload-complete'),
+
+    path('cache/stats/', CacheStatsView.as_view(), name='cache-stats'),
+    path('timing/slow/', SlowRequestsView.as_view(), name='slow-requests'),
 ]
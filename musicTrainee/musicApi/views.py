@@ -1,49 +1,79 @@
 import json
 
+from adrf.generics import ListAPIView as AsyncListAPIView, RetrieveAPIView as AsyncRetrieveAPIView, \
+    aget_object_or_404
+from asgiref.sync import sync_to_async
 from django.contrib.auth import logout, authenticate, login
 from django.contrib.contenttypes.models import ContentType
 from django.core.exceptions import ObjectDoesNotExist, ValidationError
-from django.db import IntegrityError
-from django.db.models import Exists, OuterRef, Q
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, OuterRef, Q, Count, Subquery, aprefetch_related_objects
 from django.shortcuts import render
+from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import extend_schema, extend_schema_view, OpenApiParameter, OpenApiExample, \
     inline_serializer, OpenApiResponse
 from rest_framework import generics, status, serializers
 
 from rest_framework.authentication import BasicAuthentication, SessionAuthentication
 from rest_framework.decorators import api_view
-from rest_framework.exceptions import NotFound
+from rest_framework.exceptions import NotFound, PermissionDenied
 from rest_framework.generics import RetrieveAPIView, CreateAPIView, RetrieveUpdateAPIView, UpdateAPIView, \
     get_object_or_404, ListAPIView, GenericAPIView, ListCreateAPIView, RetrieveUpdateDestroyAPIView
 from rest_framework.parsers import MultiPartParser, FormParser
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
 from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from accounts.common import generate_reset_code, send_reset_code_email, send_confirm_code_email
-from accounts.models import PasswordResetRequest, CustomAccount
+from accounts.models import PasswordResetRequest, CustomAccount, OutboundEmail
+from accounts.outbox import recently_queued
+from accounts.authentication import revoke_user_tokens
 from accounts.serializers import ProfileInfoSerializer, ProfileLoginSerializer, ProfileCreateSerializer, \
     PasswordResetRequestSerializer, PasswordResetConfirmSerializer, UserPatchUpdateSerializer, ProfileConfirmSerializer
 from catalog.models import Course, Module, Content, Task, TaskSubmission, Lesson, TaskReview, Text, File, Image, \
-    Question, Answer
+    Question, Answer, CourseRating
 from catalog.serializers import CourseDetailSerializer, ModuleSerializer, ContentSerializer, TextSerializer, \
     FileSerializer, ImageSerializer, VideoSerializer, QuestionSerializer, AnswerSerializer, TaskSerializer, \
     TaskSubmissionSerializer, PaidCourseCreateSerializer, FreeCourseCreateSerializer, ModuleCreateSerializer, \
     LessonSerializer, LessonCreateSerializer, ContentCreateSerializer, TaskReviewSerializer, CommentContentSerializer, \
     CourseRatingSerializer, PostLessonCreateSerializer, QuestionDisplaySerializer, TaskCourseSerializer, \
-    TaskSubReviewSerializer
+    TaskSubReviewSerializer, CourseCardSerializer, CourseRatingHistogramSerializer, LeasedTaskSubmissionSerializer, \
+    ReviewQueueClaimSerializer, ReviewQueueReleaseSerializer, BulkReviewSerializer, BulkReviewResultSerializer, \
+    UploadSessionSerializer, UploadSessionCreateSerializer
+from catalog.models import CourseTree, Enrollment, UploadSession
+from catalog.access import has_course_access
+from catalog.tree import rebuild_course_tree
+from catalog.reviews import claim_submissions, leased_submissions, release_submissions, apply_reviews
+from catalog.search import search_courses
+from catalog.media import get_media_access
+from catalog.uploads import start_upload, write_chunk, complete_upload, is_task_content, UploadError, UploadConflict
+from catalog.prefetch import lesson_contents_prefetch, prefetch_lesson_contents, aprefetch_lesson_contents, \
+    content_queryset
+from musicApi.caching import cache_response
+from musicApi.conditional import AsyncConditionalGetMixin
+from musicApi.media import media_response
+from musicApi.permissions import IsCourseMember
+from musicTrainee.cache import CATALOG_SCOPE, course_scope, user_scope, get_cache_stats
+from musicTrainee.timing import slow_requests
+from musicApi.resolvers import CoursePathMixin
+from musicApi.pagination import CourseKeysetPagination, TaskKeysetPagination, SubmissionKeysetPagination, \
+    RatingKeysetPagination, CourseSearchKeysetPagination
 
 from slugify import slugify
 
 
 # Представление для получения ин-фы пользователя
-class UserInfoView(RetrieveAPIView):
+class UserInfoView(AsyncRetrieveAPIView):
+    """
+    Информация о пользователе по идентификатору.
+    """
     serializer_class = ProfileInfoSerializer
 
-    def retrieve(self, request, *args, **kwargs):
+    @cache_response(scopes=lambda view, request, user_id: [user_scope(user_id)])
+    async def aretrieve(self, request, *args, **kwargs):
         user_id = kwargs.get('user_id')
-        user = get_object_or_404(CustomAccount, id=user_id)
+        user = await aget_object_or_404(CustomAccount, id=user_id)
         serializer = self.get_serializer(user)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
@@ -69,15 +99,15 @@ class CreateUserView(CreateAPIView):
     def post(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         if serializer.is_valid():
-            self.create(request, *args, **kwargs)
-
-            confirm_request = PasswordResetRequest.objects.create(
-                email=serializer.validated_data['email'],
-                reset_code=generate_reset_code()
-            )
-            email = confirm_request.email
-            # Отправить письмо с инструкцией по сбросу пароля
-            send_confirm_code_email(email, confirm_request.reset_code)
+            # Пользователь, код и письмо в очереди сохраняются вместе
+            with transaction.atomic():
+                self.create(request, *args, **kwargs)
+
+                email = serializer.validated_data['email']
+                confirm_code = generate_reset_code()
+                PasswordResetRequest.issue(email, PasswordResetRequest.KIND_CONFIRM, confirm_code)
+                # Поставить в очередь письмо с кодом подтверждения
+                send_confirm_code_email(email, confirm_code)
             return Response({'detail': 'Confirm code sent to email', 'email': email},
                             status=status.HTTP_201_CREATED)
 
@@ -93,7 +123,8 @@ class CreateUserView(CreateAPIView):
         OpenApiExample(
             name='Account confirmation',
             value={
-                'confirm_code': 'code'
+                'confirm_code': 'code',
+                'email': 'user_email'
             }
         )
     ]
@@ -107,7 +138,9 @@ class ConfirmUserView(GenericAPIView):
             confirm_code = serializer.validated_data['confirm_code']
 
             try:
-                reset_request: PasswordResetRequest = PasswordResetRequest.objects.get(reset_code=confirm_code)
+                reset_request: PasswordResetRequest = PasswordResetRequest.lookup(
+                    confirm_code, PasswordResetRequest.KIND_CONFIRM, serializer.validated_data['email'],
+                )
             except ObjectDoesNotExist:
                 return Response({'message': 'Invalid reset code'}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -154,19 +187,15 @@ class LoginView(GenericAPIView):
             if user.is_activated:
                 login(request=request, user=user)
                 return Response({'success': 'Login in successfully'}, status=status.HTTP_200_OK)
-            print(f"Email confirm: {user.email}")
-            old_confirm_request = PasswordResetRequest.objects.filter(email=user.email).last()
-            print(old_confirm_request)
-            if old_confirm_request is not None:
-                send_confirm_code_email(old_confirm_request.email, old_confirm_request.reset_code)
-                return Response({'detail': 'Confirm code sent to email', 'email': old_confirm_request.email}, status=status.HTTP_201_CREATED)
-            else:
-                confirm_request = PasswordResetRequest.objects.create(
-                    email=user.email,
-                    reset_code=generate_reset_code()
-                )
-                send_confirm_code_email(confirm_request.email, confirm_request.reset_code)
-                return Response({'detail': 'Confirm code sent to email', 'email': confirm_request.email}, status=status.HTTP_201_CREATED)
+            # Повторные попытки входа не отправляют код чаще, чем раз в EMAIL_RESEND_COOLDOWN
+            if recently_queued(user.email, OutboundEmail.KIND_CONFIRM):
+                return Response({'detail': 'Confirm code sent to email', 'email': user.email}, status=status.HTTP_201_CREATED)
+            # Коды хранятся только в виде хеша, поэтому вместо старого кода выдается новый
+            with transaction.atomic():
+                confirm_code = generate_reset_code()
+                PasswordResetRequest.issue(user.email, PasswordResetRequest.KIND_CONFIRM, confirm_code)
+                send_confirm_code_email(user.email, confirm_code)
+            return Response({'detail': 'Confirm code sent to email', 'email': user.email}, status=status.HTTP_201_CREATED)
         else:
             return Response({'error': 'Invalid username or password'}, status=status.HTTP_401_UNAUTHORIZED)
 
@@ -195,6 +224,7 @@ class AboutMeView(RetrieveAPIView):
     permission_classes = [IsAuthenticated]
     serializer_class = ProfileInfoSerializer
 
+    @cache_response(scopes=lambda view, request: [user_scope(request.user.pk)], per_user=True)
     def retrieve(self, request, *args, **kwargs):
         instance = self.request.user
         serializer = self.get_serializer(instance)
@@ -253,6 +283,8 @@ class LogoutView(RetrieveAPIView):
     serializer_class = ProfileInfoSerializer
 
     def retrieve(self, request, *args, **kwargs) -> Response:
+        # Выданные до выхода JWT больше не принимаются
+        revoke_user_tokens(request.user.pk)
         logout(request)
         return Response(
             {
@@ -280,12 +312,15 @@ class PasswordResetRequestView(CreateAPIView):
     def post(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         if serializer.is_valid():
-            reset_request = PasswordResetRequest.objects.create(
-                email=serializer.validated_data['email'],
-                reset_code=generate_reset_code()
-            )
-            # Отправить письмо с инструкцией по сбросу пароля
-            send_reset_code_email(reset_request.email, reset_request.reset_code)
+            email = serializer.validated_data['email']
+            # Новый код не создается, пока не прошла пауза после предыдущего письма
+            if recently_queued(email, OutboundEmail.KIND_RESET):
+                return Response({'message': 'Password reset request sent.'}, status=status.HTTP_201_CREATED)
+            with transaction.atomic():
+                reset_code = generate_reset_code()
+                PasswordResetRequest.issue(email, PasswordResetRequest.KIND_RESET, reset_code)
+                # Поставить в очередь письмо с инструкцией по сбросу пароля
+                send_reset_code_email(email, reset_code)
             return Response({'message': 'Password reset request sent.'}, status=status.HTTP_201_CREATED)
         else:
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -300,6 +335,7 @@ class PasswordResetRequestView(CreateAPIView):
             name='Example for Password Reset Confirm',
             value={
                 'reset_code': 'your_reset_code',
+                'email': 'your_email@example.com',
                 'new_password': 'your_new_password',
             }
         )
@@ -315,13 +351,20 @@ class PasswordResetConfirmView(APIView):
             new_password = serializer.validated_data['new_password']
 
             try:
-                reset_request: PasswordResetRequest = PasswordResetRequest.objects.get(reset_code=reset_code)
+                reset_request: PasswordResetRequest = PasswordResetRequest.lookup(
+                    reset_code, PasswordResetRequest.KIND_RESET, serializer.validated_data['email'],
+                )
             except ObjectDoesNotExist:
                 return Response({'message': 'Invalid reset code'}, status=status.HTTP_400_BAD_REQUEST)
 
             user = CustomAccount.objects.get(email=reset_request.email)
             user.password = new_password
-            user.save()
+            with transaction.atomic():
+                user.save()
+                # Код одноразовый
+                reset_request.delete()
+            # Токены, выданные до сброса пароля, больше не принимаются
+            revoke_user_tokens(user.pk)
             if 'sessionid' in request.COOKIES:
                 logout(request)
 
@@ -353,11 +396,12 @@ class PasswordResetConfirmView(APIView):
 )
 class MyCoursesView(ListAPIView):
     permission_classes = [IsAuthenticated]
-    serializer_class = CourseDetailSerializer
+    serializer_class = CourseCardSerializer
+    pagination_class = CourseKeysetPagination
 
     def get_queryset(self):
         user = self.request.user
-        return Course.objects.filter(owner=user).order_by('id')
+        return Course.objects.filter(enrollments__user=user).select_related('creator')
 
 
 # Представление для просмотра информиации о курсе
@@ -382,7 +426,7 @@ class MyCoursesView(ListAPIView):
     ]
 )
 class MyCourseDetailView(RetrieveAPIView):
-    permission_classes = [IsAuthenticated]
+    permission_classes = [IsAuthenticated, IsCourseMember]
     serializer_class = CourseDetailSerializer
 
     def retrieve(self, request, *args, **kwargs):
@@ -410,7 +454,7 @@ class MyCourseDetailView(RetrieveAPIView):
     ]
 )
 class MyCourseReView(CreateAPIView):
-    permission_classes = [IsAuthenticated]
+    permission_classes = [IsAuthenticated, IsCourseMember]
     serializer_class = CourseRatingSerializer
 
     def perform_create(self, serializer):
@@ -434,7 +478,7 @@ class MyCourseReView(CreateAPIView):
     ]
 )
 class MyCourseModulesView(ListAPIView):
-    permission_classes = [IsAuthenticated]
+    permission_classes = [IsAuthenticated, IsCourseMember]
     serializer_class = ModuleSerializer
 
     def get_queryset(self):
@@ -443,6 +487,53 @@ class MyCourseModulesView(ListAPIView):
         return Module.objects.filter(course=course)
 
 
+# Представление для получения всей структуры курса одним запросом
+@extend_schema(
+    summary='Get course tree',
+    responses=OpenApiTypes.OBJECT,
+    examples=[
+        OpenApiExample(
+            name='Course tree',
+            value={
+                "id": "course_id",
+                "slug": "course_slug",
+                "title": "course_title",
+                "modules": [
+                    {
+                        "id": "module_id",
+                        "title": "module_title",
+                        "lessons": [
+                            {
+                                "id": "lesson_id",
+                                "title": "lesson_title",
+                                "contents": [
+                                    {
+                                        "id": "content_id",
+                                        "type": "text",
+                                        "title": "content_title"
+                                    }
+                                ]
+                            }
+                        ]
+                    }
+                ]
+            }
+        )
+    ]
+)
+class MyCourseTreeView(APIView):
+    permission_classes = [IsAuthenticated, IsCourseMember]
+
+    @cache_response(scopes=lambda view, request, slug: [course_scope(slug)])
+    def get(self, request, *args, **kwargs):
+        slug = self.kwargs.get('slug')
+        data = CourseTree.objects.filter(course__slug=slug).values_list('data', flat=True).first()
+        if data is None:
+            course = get_object_or_404(Course, slug=slug)
+            data = rebuild_course_tree(course)
+        return Response(data)
+
+
 # Представление для просмотра уроков модуля
 @extend_schema(
     summary='Get lessons from modules list',
@@ -462,17 +553,13 @@ class MyCourseModulesView(ListAPIView):
         )
     ]
 )
-class MyLessonsView(ListAPIView):
-    permission_classes = [IsAuthenticated]
+class MyLessonsView(CoursePathMixin, ListAPIView):
+    permission_classes = [IsAuthenticated, IsCourseMember]
     serializer_class = LessonSerializer
 
     def get_queryset(self):
-        slug = self.kwargs.get('slug')
-        module_id = self.kwargs.get('module_id')
-
-        course = get_object_or_404(Course, slug=slug)
-        module = get_object_or_404(Module, id=module_id, course=course)
-        return Lesson.objects.filter(module=module)
+        module = self.get_course_path().module
+        return Lesson.objects.filter(module=module).prefetch_related(lesson_contents_prefetch())
 
 
 # Представление для просмотра урока модуля
@@ -484,32 +571,25 @@ class MyLessonsView(ListAPIView):
         )
     ]
 )
-class MyLessonView(RetrieveAPIView):
-    permission_classes = [IsAuthenticated]
+class MyLessonView(AsyncConditionalGetMixin, CoursePathMixin, AsyncRetrieveAPIView):
+    permission_classes = [IsAuthenticated, IsCourseMember]
     serializer_class = LessonSerializer
 
-    def get_queryset(self):
-        slug = self.kwargs.get('slug')
-        module_id = self.kwargs.get('module_id')
-        lesson_id = self.kwargs.get('lesson_id')
+    async def aget_last_modified(self):
+        return await Lesson.objects.filter(
+            id=self.kwargs.get('lesson_id'),
+            module_id=self.kwargs.get('module_id'),
+            module__course__slug=self.kwargs.get('slug'),
+        ).values_list('updated_at', flat=True).afirst()
 
-        course = get_object_or_404(Course, slug=slug)
-        module = get_object_or_404(Module, id=module_id, course=course)
-        lesson = get_object_or_404(Lesson, id=lesson_id, module=module)
-        return lesson
+    async def aget_object(self):
+        return (await self.aget_course_path()).lesson
 
-    def retrieve(self, request, *args, **kwargs):
-        lesson = self.get_queryset()
-        content = Content.objects.filter(lesson=lesson)
+    async def aretrieve(self, request, *args, **kwargs):
+        lesson = await self.aget_object()
+        await aprefetch_lesson_contents([lesson])
         lesson_serializer = self.get_serializer(lesson)
-        data = lesson_serializer.data
-
-        # if content.exists():
-        #     data['content'] = ContentSerializer(content, many=True).data
-        # else:
-        #     data['content'] = []
-
-        return Response(data)
+        return Response(lesson_serializer.data)
 
 # Представление для просмотра контента урока
 @extend_schema(
@@ -525,70 +605,27 @@ class MyLessonView(RetrieveAPIView):
         )
     ]
 )
-class MyCourseContentView(RetrieveAPIView):
-    permission_classes = [IsAuthenticated]
+class MyCourseContentView(AsyncConditionalGetMixin, CoursePathMixin, AsyncRetrieveAPIView):
+    permission_classes = [IsAuthenticated, IsCourseMember]
     serializer_class = ContentSerializer
 
-    def get_queryset(self):
-        slug = self.kwargs.get('slug')
-        module_id = self.kwargs.get('module_id')
-        lesson_id = self.kwargs.get('lesson_id')
+    async def aget_last_modified(self):
+        return await Content.objects.filter(
+            id=self.kwargs.get('content_id'),
+            lesson_id=self.kwargs.get('lesson_id'),
+            lesson__module_id=self.kwargs.get('module_id'),
+            lesson__module__course__slug=self.kwargs.get('slug'),
+        ).values_list('updated_at', flat=True).afirst()
 
-        course = get_object_or_404(Course, slug=slug)
-        module = get_object_or_404(Module, id=module_id, course=course)
-        lesson = get_object_or_404(Lesson, id=lesson_id, module=module)
+    def get_path_content_queryset(self):
+        return content_queryset().prefetch_related('comments')
 
-        return Content.objects.filter(lesson=lesson)
+    async def aget_object(self):
+        return (await self.aget_course_path()).content
 
-    def get_object(self):
-        queryset = self.get_queryset()
-        content_id = self.kwargs.get('content_id')
-        return get_object_or_404(queryset, id=content_id)
-
-    def retrieve(self, request, *args, **kwargs):
-        instance = self.get_object()
+    async def aretrieve(self, request, *args, **kwargs):
+        instance = await self.aget_object()
         serializer = self.get_serializer(instance)
-        content_type = instance.item.__class__.__name__
-
-        if content_type == 'Text':
-            text_serializer = TextSerializer(instance.item)
-            response_data = text_serializer.data
-            # return Response(text_serializer.data)
-        elif content_type == 'File':
-            file_serializer = FileSerializer(instance.item)
-            response_data = file_serializer.data
-            # return Response(file_serializer.data)
-        elif content_type == 'Image':
-            image_serializer = ImageSerializer(instance.item)
-            response_data = image_serializer.data
-            # return Response(image_serializer.data)
-        elif content_type == 'Video':
-            video_serializer = VideoSerializer(instance.item)
-            response_data = video_serializer.data
-            # return Response(video_serializer.data)
-        elif content_type == 'Question':
-            question_serializer = QuestionSerializer(instance.item)
-            response_data = question_serializer.data
-            # return Response(question_serializer.data)
-        elif content_type == 'Task':
-            task_serializer = TaskSerializer(instance.item)
-            response_data = task_serializer.data
-            submissions = TaskSubmission.objects.filter(task=instance.item, student=request.user)
-            if submissions.exists():
-                submission = submissions.first()
-                submission_serializer = TaskSubmissionSerializer(submission)
-                response_data['submission'] = submission_serializer.data
-                reviews = TaskReview.objects.filter(task_submission=submission.id)
-
-                if reviews.exists():
-                    review = reviews.first()
-                    review_serializer = TaskReviewSerializer(review)
-                    response_data['review'] = review_serializer.data
-            # return Response(response_data)
-        else:
-            response_data = serializer.data
-
-        response_data["comments"] = CommentContentSerializer(instance.comments.all(), many=True).data
         return Response(serializer.data)
 
     @extend_schema(
@@ -614,12 +651,12 @@ class MyCourseContentView(RetrieveAPIView):
             ),
         ]
     )
-    def post(self, request: Request, *args, **kwargs):
-        instance = self.get_object()
+    async def post(self, request: Request, *args, **kwargs):
+        instance = await self.aget_object()
 
         if instance.item.__class__.__name__ == 'Question':
             user_answer = request.data.get('answer')
-            correct_answer = instance.item.answer_set.filter(is_true=True).values_list('text', flat=True)
+            correct_answer = [answer.text for answer in instance.item.answer_set.all() if answer.is_true]
             if user_answer in correct_answer:
                 return Response({'message': 'Correct answer'})
             else:
@@ -630,7 +667,10 @@ class MyCourseContentView(RetrieveAPIView):
                 return Response({'message': 'Please upload a file'})
 
             try:
-                submission = TaskSubmission.objects.create(task=instance.item, student=request.user, file=file)
+                # Файл сохраняется в хранилище внутри create: синхронная запись выполняется вне цикла событий
+                submission = await sync_to_async(TaskSubmission.objects.create)(
+                    task=instance.item, student=request.user, file=file,
+                )
                 submission_serializer = TaskSubmissionSerializer(submission)
                 return Response(submission_serializer.data)
             except IntegrityError:
@@ -640,7 +680,7 @@ class MyCourseContentView(RetrieveAPIView):
 
 
 class MyCourseContentSubmissionReviewView(generics.RetrieveAPIView):
-    permission_classes = [IsAuthenticated]
+    permission_classes = [IsAuthenticated, IsCourseMember]
     serializer_class = TaskSubReviewSerializer
 
     def get_queryset(self):
@@ -667,7 +707,7 @@ class MyCourseContentSubmissionReviewView(generics.RetrieveAPIView):
 
 
 class MyCourseContentSubmissionView(RetrieveAPIView):
-    permission_classes = [IsAuthenticated]
+    permission_classes = [IsAuthenticated, IsCourseMember]
     serializer_class = TaskSubmissionSerializer
 
     def get_object(self):
@@ -690,7 +730,7 @@ class MyCourseContentSubmissionView(RetrieveAPIView):
 
 
 class CommentCreateView(CreateAPIView):
-    permission_classes = [IsAuthenticated]
+    permission_classes = [IsAuthenticated, IsCourseMember]
     serializer_class = CommentContentSerializer
 
     def perform_create(self, serializer):
@@ -703,6 +743,9 @@ class CommentCreateView(CreateAPIView):
 @extend_schema(
     summary='Catalog courses list',
     request=CourseDetailSerializer,
+    parameters=[
+        OpenApiParameter(name='q', description='Full-text search by title and descriptions', required=False, type=str),
+    ],
     examples=[
         OpenApiExample(
             name='My Course Detail',
@@ -720,14 +763,40 @@ class CommentCreateView(CreateAPIView):
         )
     ]
 )
-class CatalogCoursesView(ListAPIView):
+class CatalogCoursesView(AsyncListAPIView):
+    """
+    Одобренные курсы каталога, поиск по параметру ``q``.
+    """
     permission_classes = [IsAuthenticated]
-    serializer_class = CourseDetailSerializer
+    serializer_class = CourseCardSerializer
+
+    @property
+    def pagination_class(self):
+        # Результаты поиска упорядочены по релевантности, а не по дате создания
+        if self.get_search_query():
+            return CourseSearchKeysetPagination
+        return CourseKeysetPagination
+
+    def get_search_query(self):
+        request = getattr(self, 'request', None)
+        if request is None:
+            return ''
+        return request.query_params.get('q', '').strip()
 
     def get_queryset(self):
-        return Course.objects.filter(approval=True)
+        queryset = Course.objects.filter(approval=True).select_related('creator')
+        query = self.get_search_query()
+        if query:
+            queryset = search_courses(queryset, query)
+        return queryset
     #     return Course.objects.all()
 
+    @cache_response(scopes=[CATALOG_SCOPE], timeout=60)
+    async def alist(self, request, *args, **kwargs):
+        page = await self.paginator.apaginate_queryset(self.get_queryset(), request, view=self)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
 
 # Представление для просмотра курса с каталога
 @extend_schema(
@@ -750,16 +819,23 @@ class CatalogCoursesView(ListAPIView):
         )
     ]
 )
-class CatalogCourseDetailView(RetrieveAPIView):
+class CatalogCourseDetailView(AsyncConditionalGetMixin, AsyncRetrieveAPIView):
     permission_classes = [IsAuthenticated]
     serializer_class = CourseDetailSerializer
+    lookup_field = 'slug'
+
+    async def aget_last_modified(self):
+        return await Course.objects.filter(
+            slug=self.kwargs.get('slug'),
+        ).values_list('updated_at', flat=True).afirst()
 
     def get_queryset(self):
-        slug = self.kwargs.get('slug')
-        return get_object_or_404(Course, slug=slug)
+        return Course.objects.select_related('creator')
 
-    def retrieve(self, request, *args, **kwargs):
-        instance = self.get_queryset()
+    @cache_response(scopes=lambda view, request, slug: [course_scope(slug)])
+    async def aretrieve(self, request, *args, **kwargs):
+        instance = await self.aget_object()
+        await aprefetch_related_objects([instance], 'ratings')
         serializer = self.get_serializer(instance)
         return Response(serializer.data)
 
@@ -773,19 +849,70 @@ class CatalogCourseDetailView(RetrieveAPIView):
             )
         ]
     )
-    def post(self, request, *args, **kwargs):
-        course = self.get_queryset()
+    async def post(self, request, *args, **kwargs):
+        course = await self.aget_object()
         user = request.user
 
-        if user in course.owner.all():
+        if not await sync_to_async(Enrollment.enroll)(user, course):
             return Response({'detail': 'Вы уже владеете этим курсом'})
 
-        course.owner.add(user)
-        course.save()
-
         return Response({'detail': 'Курс успешно приобретен'}, status=status.HTTP_200_OK)
 
 
+# Представление для просмотра отзывов курса
+@extend_schema(
+    summary='Catalog course ratings',
+    responses=CourseRatingSerializer(many=True),
+    examples=[
+        OpenApiExample(
+            name='Course ratings',
+            value={
+                "next": "next_page_url",
+                "previous": None,
+                "histogram": [
+                    {"rating": 5, "count": 10},
+                ],
+                "results": [
+                    {
+                        "id": "rating_id",
+                        "course": "course_id",
+                        "user": "user_id",
+                        "rating": "int_rate",
+                        "review": "Message review"
+                    }
+                ]
+            }
+        )
+    ]
+)
+class CatalogCourseRatingsView(ListAPIView):
+    permission_classes = [IsAuthenticated]
+    serializer_class = CourseRatingSerializer
+    pagination_class = RatingKeysetPagination
+
+    def get_course(self):
+        slug = self.kwargs.get('slug')
+        return get_object_or_404(Course.objects.only('id'), slug=slug)
+
+    def get_queryset(self):
+        return CourseRating.objects.filter(course=self.course)
+
+    def list(self, request, *args, **kwargs):
+        self.course = self.get_course()
+        response = super().list(request, *args, **kwargs)
+        # Распределение оценок отдается только с первой страницей, одним сгруппированным запросом
+        if self.paginator.cursor_query_param not in request.query_params:
+            histogram = (
+                CourseRating.objects.filter(course=self.course)
+                .order_by()
+                .values('rating')
+                .annotate(count=Count('id'))
+                .order_by('-rating')
+            )
+            response.data['histogram'] = CourseRatingHistogramSerializer(histogram, many=True).data
+        return response
+
+
 # Представление для просмотра курсов, созданных пользователем
 @extend_schema(
     summary='Get user created courses',
@@ -809,11 +936,12 @@ class CatalogCourseDetailView(RetrieveAPIView):
 )
 class MyCreationCoursesView(ListAPIView):
     permission_classes = [IsAuthenticated]
-    serializer_class = CourseDetailSerializer
+    serializer_class = CourseCardSerializer
+    pagination_class = CourseKeysetPagination
 
     def get_queryset(self):
         user = self.request.user
-        return Course.objects.filter(creator=user).order_by('id')
+        return Course.objects.filter(creator=user).select_related('creator')
 
 
 # Представление для создания платного курса
@@ -844,7 +972,7 @@ class PaidCourseCreateView(CreateAPIView):
         slug = slugify(title)
         user = self.request.user
         course = serializer.save(creator=user, slug=slug)
-        course.owner.set([user])
+        Enrollment.enroll(user, course)
         course_detail_serializer = CourseDetailSerializer(course)
         headers = self.get_success_headers(serializer.data)
         return Response(course_detail_serializer.data, status=status.HTTP_201_CREATED, headers=headers)
@@ -878,7 +1006,7 @@ class FreeCourseCreateView(CreateAPIView):
         user = self.request.user
         course = serializer.save(creator=user, slug=slug)
         # course.owner.set([user])
-        course.owner.add(user)
+        Enrollment.enroll(user, course)
         course_detail_serializer = CourseDetailSerializer(course)
         headers = self.get_success_headers(serializer.data)
         return Response(course_detail_serializer.data, status=status.HTTP_201_CREATED, headers=headers)
@@ -978,20 +1106,16 @@ class ModuleCreateView(ListAPIView):
         )
     ]
 )
-class LessonCreatedView(RetrieveAPIView):
+class LessonCreatedView(CoursePathMixin, RetrieveAPIView):
     permission_classes = [IsAuthenticated]
     serializer_class = LessonSerializer
 
     def get_module(self):
-        slug = self.kwargs.get('slug')
-        module_id = self.kwargs.get('module_id')
-        course = get_object_or_404(Course, slug=slug)
-        module = get_object_or_404(Module, id=module_id, course=course)
-        return module
+        return self.get_course_path().module
 
     def get_queryset(self):
         module = self.get_module()
-        return Lesson.objects.filter(module=module)
+        return Lesson.objects.filter(module=module).prefetch_related(lesson_contents_prefetch())
 
     def get_object(self):
         queryset = self.get_queryset()
@@ -1110,27 +1234,21 @@ class ContentLessonCreatedView(RetrieveAPIView):
         ),
     },
 )
-class LessonContentCreatedView(RetrieveAPIView):
+class LessonContentCreatedView(CoursePathMixin, RetrieveAPIView):
     permission_classes = [IsAuthenticated]
 
     def get_module(self):
-        slug = self.kwargs.get('slug')
-        module_id = self.kwargs.get('module_id')
-        course = get_object_or_404(Course, slug=slug)
-        module = get_object_or_404(Module, id=module_id, course=course)
-        return module
+        return self.get_course_path().module
 
     @extend_schema(
         summary='Get lesson content',
     )
     def get_lesson(self):
-        module = self.get_module()
-        lesson_id = self.kwargs.get('lesson_id')
-        lesson = get_object_or_404(Lesson, id=lesson_id, module=module)
-        return lesson
+        return self.get_course_path().lesson
 
     def retrieve(self, request, *args, **kwargs):
         lesson = self.get_lesson()
+        prefetch_lesson_contents([lesson])
         lesson_serializer = LessonSerializer(lesson)
         return Response(lesson_serializer.data)
 
@@ -1151,6 +1269,7 @@ class LessonContentCreatedView(RetrieveAPIView):
         serializer = LessonSerializer(lesson, data=request.data, partial=True)
         if serializer.is_valid():
             serializer.save()
+            prefetch_lesson_contents([lesson])
             return Response(serializer.data, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -1161,25 +1280,15 @@ class LessonContentCreatedView(RetrieveAPIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class MyCreateContentView(RetrieveAPIView):
+class MyCreateContentView(CoursePathMixin, RetrieveAPIView):
     permission_classes = [IsAuthenticated]
     serializer_class = ContentSerializer
 
-    def get_queryset(self):
-        slug = self.kwargs.get('slug')
-        module_id = self.kwargs.get('module_id')
-        lesson_id = self.kwargs.get('lesson_id')
-
-        course = get_object_or_404(Course, slug=slug)
-        module = get_object_or_404(Module, id=module_id, course=course)
-        lesson = get_object_or_404(Lesson, id=lesson_id, module=module)
-
-        return Content.objects.filter(lesson=lesson)
+    def get_path_content_queryset(self):
+        return content_queryset()
 
     def get_object(self):
-        queryset = self.get_queryset()
-        content_id = self.kwargs.get('content_id')
-        return get_object_or_404(queryset, id=content_id)
+        return self.get_course_path().content
 
     def retrieve(self, request, *args, **kwargs):
         instance = self.get_object()
@@ -1408,26 +1517,30 @@ class LessonContentTaskCreateView(CreateAPIView):
 class TaskView(ListAPIView):
     permission_classes = [IsAuthenticated]
     serializer_class = TaskCourseSerializer
+    pagination_class = TaskKeysetPagination
 
     def get_queryset(self):
         user = self.request.user
+        task_type = ContentType.objects.get_for_model(Task)
         # Получаем все Content, которые принадлежат курсам, созданным авторизованным пользователем
-        content_queryset = Content.objects.filter(
-            lesson__module__course__creator=user,
-            content_type__model='task'
-        )
+        task_contents = Content.objects.filter(course__creator=user, content_type=task_type)
+        # Название курса задания подставляется подзапросом, без запросов на каждое задание
+        course_title = Content.objects.filter(content_type=task_type, object_id=OuterRef('pk')).values('course__title')
         # Получаем уникальные задания из Content
-        return Task.objects.filter(id__in=content_queryset.values_list('object_id', flat=True))
+        return Task.objects.filter(id__in=task_contents.values_list('object_id', flat=True)).annotate(
+            course_title=Subquery(course_title[:1]),
+        )
 
 
 class TaskSubmissionsView(ListAPIView):
     permission_classes = [IsAuthenticated]
     serializer_class = TaskSubmissionSerializer
+    pagination_class = SubmissionKeysetPagination
 
     def get_queryset(self):
         task_id = self.kwargs['task_id']  # Получаем task_id из URL
         # return TaskSubmission.objects.filter(task=task_id)
-        return TaskSubmission.objects.filter(task=task_id, review__is_correct__isnull=True)
+        return TaskSubmission.objects.filter(task=task_id, reviewed=False)
 
 
 class TaskSubmissionView(RetrieveUpdateDestroyAPIView):
@@ -1461,6 +1574,258 @@ class TaskSubmissionView(RetrieveUpdateDestroyAPIView):
         return Response(serializer.errors, status=400)
 
 
+# Представление очереди проверки: арендованные ответы и аренда следующих
+@extend_schema(
+    summary='Review queue: my leased submissions',
+    responses=LeasedTaskSubmissionSerializer(many=True),
+)
+class ReviewQueueView(GenericAPIView):
+    permission_classes = [IsAuthenticated]
+    serializer_class = LeasedTaskSubmissionSerializer
+
+    def get(self, request, *args, **kwargs):
+        serializer = self.get_serializer(leased_submissions(request.user), many=True)
+        return Response(serializer.data)
+
+    @extend_schema(
+        summary='Review queue: lease next unreviewed submissions',
+        request=ReviewQueueClaimSerializer,
+        responses=LeasedTaskSubmissionSerializer(many=True),
+        examples=[
+            OpenApiExample(
+                name='Claim submissions',
+                value={
+                    "count": 10,
+                    "lease_seconds": 900
+                }
+            )
+        ]
+    )
+    def post(self, request, *args, **kwargs):
+        claim_serializer = ReviewQueueClaimSerializer(data=request.data)
+        claim_serializer.is_valid(raise_exception=True)
+        submissions = claim_submissions(request.user, **claim_serializer.validated_data)
+        serializer = self.get_serializer(submissions, many=True)
+        return Response(serializer.data)
+
+
+# Представление для возврата арендованных ответов в очередь проверки
+@extend_schema(
+    summary='Review queue: release leased submissions',
+    request=ReviewQueueReleaseSerializer,
+    responses=inline_serializer('ReviewQueueReleaseResponse', fields={'released': serializers.IntegerField()}),
+    examples=[
+        OpenApiExample(
+            name='Release submissions',
+            value={
+                "ids": ["submission_id"]
+            }
+        )
+    ]
+)
+class ReviewQueueReleaseView(GenericAPIView):
+    permission_classes = [IsAuthenticated]
+    serializer_class = ReviewQueueReleaseSerializer
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        released = release_submissions(request.user, serializer.validated_data['ids'])
+        return Response({'released': released})
+
+
+# Представление для сохранения оценок пачкой
+@extend_schema(
+    summary='Review many submissions at once',
+    request=BulkReviewSerializer,
+    responses=inline_serializer('BulkReviewResponse', fields={'results': BulkReviewResultSerializer(many=True)}),
+    examples=[
+        OpenApiExample(
+            name='Bulk review',
+            value={
+                "reviews": [
+                    {
+                        "submission_id": "submission_id",
+                        "is_correct": "true/false",
+                        "comment": "optional"
+                    }
+                ]
+            }
+        )
+    ]
+)
+class BulkReviewView(GenericAPIView):
+    permission_classes = [IsAuthenticated]
+    serializer_class = BulkReviewSerializer
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = apply_reviews(request.user, serializer.validated_data['reviews'])
+        return Response({'results': BulkReviewResultSerializer(results, many=True).data})
+
+
+def _upload_error_response(error, session=None):
+    if isinstance(error, UploadConflict):
+        response = Response({'error': str(error)}, status=status.HTTP_409_CONFLICT)
+    else:
+        response = Response({'error': str(error)}, status=status.HTTP_400_BAD_REQUEST)
+    if session is not None:
+        response.data['offset'] = session.offset
+        response['Upload-Offset'] = session.offset
+    return response
+
+
+# Представление для создания сессии загрузки файла частями
+@extend_schema(
+    summary='Start a resumable upload',
+    request=UploadSessionCreateSerializer,
+    responses={201: UploadSessionSerializer},
+    examples=[
+        OpenApiExample(
+            name='Task submission upload',
+            value={
+                "target": "submission",
+                "content_id": "content_id",
+                "filename": "homework.mp3",
+                "size": 104857600,
+                "sha256": "optional sha256 of the whole file"
+            }
+        ),
+        OpenApiExample(
+            name='Lesson file upload',
+            value={
+                "target": "file",
+                "lesson_id": "lesson_id",
+                "title": "Sheet music",
+                "filename": "sheet.pdf",
+                "size": 10485760
+            }
+        )
+    ]
+)
+class UploadSessionCreateView(GenericAPIView):
+    permission_classes = [IsAuthenticated]
+    serializer_class = UploadSessionCreateSerializer
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        user = request.user
+
+        content = lesson = None
+        if data['target'] == UploadSession.TARGET_SUBMISSION:
+            content = get_object_or_404(Content.objects.select_related('course'), id=data['content_id'])
+            if not is_task_content(content):
+                return Response({'error': 'This content type dont support answering task'},
+                                status=status.HTTP_400_BAD_REQUEST)
+            if not (getattr(user, 'is_moderator', False) or has_course_access(user.pk, content.course.slug)):
+                raise PermissionDenied('You do not have access to this course.')
+        else:
+            lesson = get_object_or_404(Lesson, id=data['lesson_id'], module__course__creator=user)
+
+        try:
+            session = start_upload(
+                user,
+                data['target'],
+                data['filename'],
+                data['size'],
+                sha256=data['sha256'],
+                content=content,
+                lesson=lesson,
+                title=data['title'],
+            )
+        except UploadError as error:
+            return _upload_error_response(error)
+        return Response(UploadSessionSerializer(session).data, status=status.HTTP_201_CREATED)
+
+
+# Представление сессии загрузки: состояние, отправка части и отмена
+@extend_schema(
+    summary='Get resumable upload state',
+    responses=UploadSessionSerializer,
+)
+class UploadSessionView(GenericAPIView):
+    permission_classes = [IsAuthenticated]
+    serializer_class = UploadSessionSerializer
+
+    def get_object(self):
+        return get_object_or_404(UploadSession, id=self.kwargs['session_id'], owner=self.request.user)
+
+    def get(self, request, *args, **kwargs):
+        session = self.get_object()
+        response = Response(self.get_serializer(session).data)
+        response['Upload-Offset'] = session.offset
+        return response
+
+    @extend_schema(
+        summary='Upload a chunk',
+        description='Raw chunk bytes in the body. `Upload-Offset` must equal the current session offset; '
+                    'optional `Upload-Chunk-SHA256` is verified before the offset moves. '
+                    'On 409 (offset mismatch, concurrent chunk or chunk checksum mismatch) '
+                    'resume from the returned offset.',
+        request={'application/octet-stream': OpenApiTypes.BINARY},
+        parameters=[
+            OpenApiParameter('Upload-Offset', int, OpenApiParameter.HEADER, required=True),
+            OpenApiParameter('Upload-Chunk-SHA256', str, OpenApiParameter.HEADER),
+        ],
+        responses=UploadSessionSerializer,
+    )
+    def put(self, request, *args, **kwargs):
+        session = self.get_object()
+        try:
+            offset = int(request.headers['Upload-Offset'])
+        except (KeyError, ValueError):
+            return Response({'error': 'Upload-Offset header is required.'}, status=status.HTTP_400_BAD_REQUEST)
+        length = int(request.META.get('CONTENT_LENGTH') or 0)
+        if not length:
+            return Response({'error': 'Content-Length is required.'}, status=status.HTTP_411_LENGTH_REQUIRED)
+
+        # Тело читается потоком, без разбора парсерами DRF и без загрузки в память
+        try:
+            session = write_chunk(session, offset, request.stream, length,
+                                  checksum=request.headers.get('Upload-Chunk-SHA256', ''))
+        except UploadError as error:
+            return _upload_error_response(error, session)
+        response = Response(self.get_serializer(session).data)
+        response['Upload-Offset'] = session.offset
+        return response
+
+    @extend_schema(summary='Abort a resumable upload', responses={204: None})
+    def delete(self, request, *args, **kwargs):
+        session = self.get_object()
+        if session.completed_at is not None:
+            return _upload_error_response(UploadConflict('Upload is already completed.'))
+        session.delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+# Представление для завершения загрузки и прикрепления файла
+@extend_schema(
+    summary='Complete a resumable upload',
+    request=None,
+    responses={201: OpenApiTypes.OBJECT},
+)
+class UploadSessionCompleteView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        session = get_object_or_404(UploadSession, id=kwargs['session_id'], owner=request.user)
+        try:
+            item = complete_upload(session)
+        except UploadError as error:
+            return _upload_error_response(error)
+
+        if isinstance(item, TaskSubmission):
+            data = TaskSubmissionSerializer(item).data
+        elif isinstance(item, File):
+            data = FileSerializer(item).data
+        else:
+            data = ImageSerializer(item).data
+        return Response(data, status=status.HTTP_201_CREATED)
+
+
 # Представление для получения списка домашнего задания на проверку
 @extend_schema(
     summary='Get unchecked tasks',
@@ -1570,13 +1935,14 @@ class TaskSubmissionReviewView(RetrieveAPIView):
 class ModerationCoursesView(ListAPIView):
     permission_classes = [IsAuthenticated]
     serializer_class = CourseDetailSerializer
+    pagination_class = CourseKeysetPagination
 
     def get_queryset(self):
         user = self.request.user
         if user.is_moderator is True:
-            return Course.objects.filter(approval=False).order_by('id')
+            return Course.objects.filter(approval=False).select_related('creator').prefetch_related('ratings')
         else:
-            return []
+            return Course.objects.none()
 
 
 # Представление для просмотра модулей курса и принятия решения
@@ -1692,3 +2058,82 @@ class ModerationApproveChange(UpdateAPIView):
             course.approval = False
         course.save()
         return Response({'detail': 'Moderate course successfully'}, status=status.HTTP_200_OK)
+
+
+# Представление для просмотра счетчиков кэша текущего процесса
+@extend_schema(
+    summary='Cache hit/miss counters',
+    responses=OpenApiTypes.OBJECT,
+    examples=[
+        OpenApiExample(
+            name='Cache stats',
+            value={
+                "response": {"local_hits": 10, "shared_hits": 2, "misses": 1, "coalesced": 0, "waits": 0},
+                "course-access": {"local_hits": 25, "misses": 1}
+            }
+        )
+    ]
+)
+class CacheStatsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        return Response(get_cache_stats())
+
+
+# Представление для просмотра и очистки самых медленных запросов текущего процесса
+@extend_schema_view(
+    get=extend_schema(
+        summary='Slowest sampled requests with SQL fingerprints',
+        responses=OpenApiTypes.OBJECT,
+        examples=[
+            OpenApiExample(
+                name='Slow requests',
+                value={
+                    "slow_requests": [
+                        {
+                            "url_name": "catalog-course-detail",
+                            "method": "GET",
+                            "path": "/api/catalog/guitar/",
+                            "status": 200,
+                            "total_ms": 412.5,
+                            "db_queries": 14,
+                            "stages_ms": {"db": 301.2, "serialize": 40.1, "render": 3.2, "storage": 0.0, "smtp": 0.0},
+                            "queries": [
+                                {
+                                    "fingerprint": "SELECT ... FROM \"catalog_module\" WHERE \"catalog_module\".\"course_id\" IN (...)",
+                                    "count": 1,
+                                    "total_ms": 210.4
+                                }
+                            ],
+                            "at": "2024-05-01T12:00:00+00:00"
+                        }
+                    ]
+                }
+            )
+        ]
+    ),
+    delete=extend_schema(summary='Clear slow requests buffer', responses={204: None}),
+)
+class SlowRequestsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        return Response({'slow_requests': slow_requests.items()})
+
+    def delete(self, request, *args, **kwargs):
+        slow_requests.clear()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+# Представление для скачивания медиа-файлов: проверка прав и передача отдачи файла nginx
+@extend_schema(exclude=True)
+class MediaDownloadView(APIView):
+    # Права зависят от файла и проверяются в catalog.media
+    permission_classes = [AllowAny]
+
+    def get(self, request, name, *args, **kwargs):
+        access = get_media_access(request.user, name)
+        if access is None:
+            raise NotFound()
+        return media_response(name, access)
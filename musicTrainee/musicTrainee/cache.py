@@ -0,0 +1,363 @@
+"""
+Двухуровневый кэш: ограниченный LRU в памяти процесса перед общим кэшем Django.
+
+* Локальный уровень отвечает без сетевого обращения, но живет не дольше
+  ``CACHE_LOCAL_TIMEOUT`` секунд и хранит не больше ``CACHE_LOCAL_MAX_ENTRIES`` записей.
+* Общий уровень (``CACHES['default']``) разделяется всеми воркерами.
+* Поколения (generation) позволяют сбросить все ключи области, например курса,
+  одним инкрементом счетчика: номер поколения входит в ключ, старые записи
+  просто перестают читаться и вытесняются по TTL.
+* При промахе значение вычисляет только один запрос (single-flight): потоки
+  процесса ждут на блокировке, другие воркеры - на ключе-блокировке в общем кэше.
+* Асинхронные представления используют ``aget_or_set``: корутины, в том числе
+  одного процесса, ждут на ключе-блокировке в общем кэше, не занимая поток.
+
+Значения из кэша отдаются по ссылке и не должны изменяться вызывающим кодом.
+"""
+
+import asyncio
+import threading
+import time
+import zlib
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+from musicTrainee.metrics import CACHE_EVENTS
+
+_MISSING = object()
+_LOCK_STRIPES = 64
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+class LocalLRUCache:
+    """
+    Потокобезопасный LRU-кэш процесса с ограничением по числу записей и TTL.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return _MISSING
+            expires, value = entry
+            if expires <= time.monotonic():
+                del self._data[key]
+                return _MISSING
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout: float) -> None:
+        if timeout <= 0 or self.max_entries <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + timeout, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+class TwoTierCache:
+    """
+    Именованный двухуровневый кэш.
+
+    :param name: Имя кэша, используется как префикс ключей и в статистике.
+    :param timeout: Время жизни записи в общем кэше, в секундах.
+    :param local_timeout: Время жизни записи в памяти процесса, в секундах.
+    :param alias: Алиас общего кэша из ``CACHES``.
+    """
+    lock_timeout = 10
+    wait_interval = 0.05
+
+    def __init__(self, name: str, timeout=None, local_timeout=None, alias='default'):
+        self.name = name
+        self.alias = alias
+        self.timeout = timeout if timeout is not None else getattr(settings, 'CACHE_DEFAULT_TIMEOUT', 300)
+        self.local_timeout = (
+            local_timeout if local_timeout is not None else getattr(settings, 'CACHE_LOCAL_TIMEOUT', 30)
+        )
+        self.local = LocalLRUCache(getattr(settings, 'CACHE_LOCAL_MAX_ENTRIES', 1024))
+        self.stats = Counter()
+        self._stats_lock = threading.Lock()
+        self._locks = [threading.Lock() for _ in range(_LOCK_STRIPES)]
+        with _registry_lock:
+            _registry[name] = self
+
+    @property
+    def shared(self):
+        return caches[self.alias]
+
+    def make_key(self, key, scopes=()) -> str:
+        """
+        Строит ключ общего кэша с учетом текущих поколений областей.
+        """
+        key = f'{self.name}:{key}'
+        if scopes:
+            generations = get_generations(scopes, alias=self.alias)
+            key = f'{key}@' + '.'.join(str(generations[scope]) for scope in scopes)
+        return key
+
+    def get(self, key, default=None, scopes=()):
+        value = self._get(self.make_key(key, scopes))
+        return default if value is _MISSING else value
+
+    def set(self, key, value, timeout=None, scopes=()) -> None:
+        self._set(self.make_key(key, scopes), value, timeout)
+
+    def delete(self, key) -> None:
+        self.delete_many([key])
+
+    def delete_many(self, keys) -> None:
+        """
+        Удаляет ключи без поколений. В других процессах локальные копии
+        доживают до истечения ``local_timeout``.
+        """
+        full_keys = [f'{self.name}:{key}' for key in keys]
+        if not full_keys:
+            return
+        self.shared.delete_many(full_keys)
+        for full_key in full_keys:
+            self.local.delete(full_key)
+
+    def get_or_set(self, key, default, timeout=None, scopes=()):
+        """
+        Возвращает значение из кэша, при промахе вычисляет его один раз на ключ.
+
+        :param key: Ключ внутри кэша.
+        :param default: Функция без аргументов, вычисляющая значение.
+        :param timeout: Время жизни записи в общем кэше.
+        :param scopes: Области поколений, при сбросе которых значение устаревает.
+        :return: Значение.
+        """
+        full_key = self.make_key(key, scopes)
+        value = self._get(full_key)
+        if value is not _MISSING:
+            return value
+
+        lock = self._locks[zlib.crc32(full_key.encode()) % _LOCK_STRIPES]
+        with lock:
+            # Пока ждали блокировку, значение мог вычислить другой поток процесса
+            value = self.local.get(full_key)
+            if value is not _MISSING:
+                self._count('coalesced')
+                return value
+            return self._fill(full_key, default, timeout)
+
+    async def amake_key(self, key, scopes=()) -> str:
+        key = f'{self.name}:{key}'
+        if scopes:
+            generations = await aget_generations(scopes, alias=self.alias)
+            key = f'{key}@' + '.'.join(str(generations[scope]) for scope in scopes)
+        return key
+
+    async def aget_or_set(self, key, default, timeout=None, scopes=()):
+        """
+        Асинхронный вариант ``get_or_set``.
+
+        :param key: Ключ внутри кэша.
+        :param default: Асинхронная функция без аргументов, вычисляющая значение.
+        :param timeout: Время жизни записи в общем кэше.
+        :param scopes: Области поколений, при сбросе которых значение устаревает.
+        :return: Значение.
+        """
+        full_key = await self.amake_key(key, scopes)
+        value = self.local.get(full_key)
+        if value is not _MISSING:
+            self._count('local_hits')
+            return value
+        value = await self.shared.aget(full_key, _MISSING)
+        if value is not _MISSING:
+            self._count('shared_hits')
+            self.local.set(full_key, value, self._local_ttl(None))
+            return value
+        self._count('misses')
+        return await self._afill(full_key, default, timeout)
+
+    def _get(self, full_key):
+        value = self.local.get(full_key)
+        if value is not _MISSING:
+            self._count('local_hits')
+            return value
+        value = self.shared.get(full_key, _MISSING)
+        if value is not _MISSING:
+            self._count('shared_hits')
+            self.local.set(full_key, value, self._local_ttl(None))
+            return value
+        self._count('misses')
+        return _MISSING
+
+    def _set(self, full_key, value, timeout) -> None:
+        self.shared.set(full_key, value, timeout if timeout is not None else self.timeout)
+        self.local.set(full_key, value, self._local_ttl(timeout))
+
+    def _fill(self, full_key, default, timeout):
+        lock_key = f'{full_key}:lock'
+        acquired = self.shared.add(lock_key, 1, self.lock_timeout)
+        if not acquired:
+            # Значение уже вычисляет другой воркер - ждем его результат
+            self._count('waits')
+            deadline = time.monotonic() + self.lock_timeout
+            while time.monotonic() < deadline:
+                time.sleep(self.wait_interval)
+                value = self.shared.get(full_key, _MISSING)
+                if value is not _MISSING:
+                    self._count('coalesced')
+                    self.local.set(full_key, value, self._local_ttl(timeout))
+                    return value
+                if self.shared.get(lock_key) is None:
+                    break
+
+        try:
+            value = default()
+            self._set(full_key, value, timeout)
+            return value
+        finally:
+            if acquired:
+                self.shared.delete(lock_key)
+
+    async def _afill(self, full_key, default, timeout):
+        lock_key = f'{full_key}:lock'
+        acquired = await self.shared.aadd(lock_key, 1, self.lock_timeout)
+        if not acquired:
+            self._count('waits')
+            deadline = time.monotonic() + self.lock_timeout
+            while time.monotonic() < deadline:
+                await asyncio.sleep(self.wait_interval)
+                value = self.local.get(full_key)
+                if value is _MISSING:
+                    value = await self.shared.aget(full_key, _MISSING)
+                if value is not _MISSING:
+                    self._count('coalesced')
+                    self.local.set(full_key, value, self._local_ttl(timeout))
+                    return value
+                if await self.shared.aget(lock_key) is None:
+                    break
+
+        try:
+            value = await default()
+            await self.shared.aset(full_key, value, timeout if timeout is not None else self.timeout)
+            self.local.set(full_key, value, self._local_ttl(timeout))
+            return value
+        finally:
+            if acquired:
+                await self.shared.adelete(lock_key)
+
+    def _local_ttl(self, timeout) -> float:
+        timeout = timeout if timeout is not None else self.timeout
+        if timeout is None:
+            return self.local_timeout
+        return min(self.local_timeout, timeout)
+
+    def _count(self, name: str) -> None:
+        with self._stats_lock:
+            self.stats[name] += 1
+        CACHE_EVENTS.labels(self.name, name).inc()
+
+
+def _generation_key(scope: str) -> str:
+    return f'generation:{scope}'
+
+
+def _initial_generation() -> int:
+    # Начальное значение от времени, чтобы после вытеснения счетчика не вернуться к старым ключам
+    return int(time.time() * 1000)
+
+
+def get_generations(scopes, alias='default') -> dict:
+    """
+    Возвращает текущие поколения областей одним обращением к общему кэшу.
+
+    :param scopes: Области, например ``course:<slug>``.
+    :param alias: Алиас общего кэша.
+    :return: Словарь область -> поколение.
+    """
+    shared = caches[alias]
+    keys = {scope: _generation_key(scope) for scope in scopes}
+    stored = shared.get_many(keys.values())
+    generations = {}
+    for scope, key in keys.items():
+        generation = stored.get(key)
+        if generation is None:
+            shared.add(key, _initial_generation(), None)
+            generation = shared.get(key, 0)
+        generations[scope] = generation
+    return generations
+
+
+async def aget_generations(scopes, alias='default') -> dict:
+    """
+    Асинхронный вариант ``get_generations``.
+    """
+    shared = caches[alias]
+    keys = {scope: _generation_key(scope) for scope in scopes}
+    stored = await shared.aget_many(keys.values())
+    generations = {}
+    for scope, key in keys.items():
+        generation = stored.get(key)
+        if generation is None:
+            await shared.aadd(key, _initial_generation(), None)
+            generation = await shared.aget(key, 0)
+        generations[scope] = generation
+    return generations
+
+
+def bump_generation(*scopes, alias='default') -> None:
+    """
+    Сбрасывает все ключи, построенные с указанными областями.
+
+    :param scopes: Области, например ``course:<slug>``.
+    :param alias: Алиас общего кэша.
+    """
+    shared = caches[alias]
+    for scope in scopes:
+        key = _generation_key(scope)
+        try:
+            shared.incr(key)
+        except ValueError:
+            shared.set(key, _initial_generation(), None)
+
+
+def course_scope(slug: str) -> str:
+    return f'course:{slug}'
+
+
+def user_scope(user_id) -> str:
+    return f'user:{user_id}'
+
+
+CATALOG_SCOPE = 'catalog'
+
+
+def get_cache_stats() -> dict:
+    """
+    Счетчики попаданий и промахов всех кэшей текущего процесса.
+    """
+    with _registry_lock:
+        named = list(_registry.items())
+    return {name: dict(cache.stats) for name, cache in named}
+
+
+def clear_local_caches() -> None:
+    """
+    Очищает локальные уровни всех кэшей процесса (для тестов).
+    """
+    with _registry_lock:
+        named = list(_registry.values())
+    for cache in named:
+        cache.local.clear()
@@ -0,0 +1,165 @@
+"""
+Метрики Prometheus, отдаются на ``/metrics``.
+
+* Время запросов по имени URL, методу и статусу, число и время SQL-запросов
+  (из musicTrainee.timing).
+* Попадания и промахи кэшей TwoTierCache (``cache_events_total``).
+* Принятые байты загрузок частями (catalog.uploads).
+* Глубина очереди писем (accounts.outbox) - считается запросом к базе при сборе.
+* Загрузка воркеров: запросы в обработке, число воркеров и воркеров с запросами.
+  Отношение ``workers_busy / workers`` - доля занятых воркеров gunicorn.
+
+Под gunicorn воркеры пишут значения в общий каталог ``PROMETHEUS_MULTIPROC_DIR``
+(gunicorn.conf.py), и любой воркер отдает сумму по всем процессам. Без этой переменной,
+например под runserver, метрики хранятся в памяти процесса.
+
+Если задан ``METRICS_TOKEN``, эндпоинт требует заголовок ``Authorization: Bearer <токен>``.
+"""
+
+import hmac
+import os
+import threading
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils import timezone
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess,
+)
+from prometheus_client.core import GaugeMetricFamily
+
+PREFIX = 'musictrainee'
+
+REQUEST_DURATION = Histogram(
+    f'{PREFIX}_http_request_duration_seconds',
+    'Request processing time.',
+    ['url_name', 'method', 'status'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+REQUEST_DB_QUERIES = Histogram(
+    f'{PREFIX}_http_request_db_queries',
+    'SQL queries per request.',
+    ['url_name'],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100),
+)
+REQUEST_DB_DURATION = Histogram(
+    f'{PREFIX}_http_request_db_duration_seconds',
+    'SQL time per request.',
+    ['url_name'],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    f'{PREFIX}_http_requests_in_progress',
+    'Requests being processed.',
+    multiprocess_mode='livesum',
+)
+WORKERS = Gauge(
+    f'{PREFIX}_workers',
+    'Worker processes serving requests.',
+    multiprocess_mode='livesum',
+)
+WORKERS_BUSY = Gauge(
+    f'{PREFIX}_workers_busy',
+    'Worker processes with at least one request in progress.',
+    multiprocess_mode='livesum',
+)
+CACHE_EVENTS = Counter(
+    f'{PREFIX}_cache_events_total',
+    'TwoTierCache lookups by result: local_hits, shared_hits, misses, waits, coalesced.',
+    ['cache', 'event'],
+)
+UPLOAD_BYTES = Counter(
+    f'{PREFIX}_upload_bytes_total',
+    'Bytes received by chunked uploads.',
+    ['target'],
+)
+
+WORKERS.set(1)
+
+_in_progress = 0
+_in_progress_lock = threading.Lock()
+
+
+def request_started() -> None:
+    global _in_progress
+    with _in_progress_lock:
+        _in_progress += 1
+        if _in_progress == 1:
+            WORKERS_BUSY.set(1)
+    REQUESTS_IN_PROGRESS.inc()
+
+
+def request_finished() -> None:
+    global _in_progress
+    with _in_progress_lock:
+        _in_progress -= 1
+        if _in_progress == 0:
+            WORKERS_BUSY.set(0)
+    REQUESTS_IN_PROGRESS.dec()
+
+
+def observe_request(url_name: str, method: str, status: int, duration: float, db_queries: int,
+                    db_duration: float) -> None:
+    """
+    Записывает метрики завершенного запроса.
+
+    :param url_name: Имя URL.
+    :param method: HTTP-метод.
+    :param status: Код ответа.
+    :param duration: Время обработки в секундах.
+    :param db_queries: Число SQL-запросов.
+    :param db_duration: Время SQL-запросов в секундах.
+    """
+    REQUEST_DURATION.labels(url_name, method, str(status)).observe(duration)
+    REQUEST_DB_QUERIES.labels(url_name).observe(db_queries)
+    REQUEST_DB_DURATION.labels(url_name).observe(db_duration)
+
+
+class OutboxCollector:
+    """
+    Глубина очереди писем на момент сбора метрик.
+    """
+
+    def collect(self):
+        from accounts.outbox import queue_stats
+
+        emails = GaugeMetricFamily(f'{PREFIX}_outbox_emails', 'Queued emails by status.', labels=['status'])
+        oldest = GaugeMetricFamily(
+            f'{PREFIX}_outbox_oldest_pending_age_seconds', 'Age of the oldest pending email.',
+        )
+        stats = queue_stats()
+        for status, count in stats['counts'].items():
+            emails.add_metric([status], count)
+        created_at = stats['oldest_pending_created_at']
+        oldest.add_metric([], (timezone.now() - created_at).total_seconds() if created_at else 0)
+        yield emails
+        yield oldest
+
+
+_scrape_registry = CollectorRegistry(auto_describe=False)
+_scrape_registry.register(OutboxCollector())
+
+
+def _authorized(request) -> bool:
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if not token:
+        # Без токена метрики доступны только при разработке
+        return settings.DEBUG
+    return hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+
+
+def metrics_view(request):
+    """
+    Метрики в текстовом формате Prometheus.
+    """
+    if not _authorized(request):
+        return HttpResponseForbidden()
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return HttpResponse(
+        generate_latest(registry) + generate_latest(_scrape_registry),
+        content_type=CONTENT_TYPE_LATEST,
+    )
@@ -0,0 +1,127 @@
+"""
+Политика выборки Sentry.
+
+Трассировки отбираются ``traces_sampler`` в начале запроса по имени URL
+(``SENTRY_TRACES_SAMPLE_RATES``, по умолчанию ``SENTRY_TRACES_SAMPLE_RATE``).
+Статика, медиа и проверки здоровья (``SENTRY_TRACES_IGNORED_PATHS``) не трассируются.
+Для остальных путей решение вышестоящего сервиса (заголовок ``sentry-trace``) сохраняется.
+
+Ошибки отправляются событиями всегда, независимо от трассировки. Выборка трассировок
+делается до выполнения запроса, поэтому медленные запросы, не попавшие в выборку,
+отправляет ``slow_request_middleware`` отдельным событием с длительностью и именем URL.
+"""
+
+import functools
+import time
+
+import sentry_sdk
+from asgiref.sync import iscoroutinefunction
+from sentry_sdk.integrations.django import DjangoIntegration
+from django.conf import settings
+from django.urls import Resolver404, resolve
+from django.utils.decorators import sync_and_async_middleware
+
+
+def django_integration() -> DjangoIntegration:
+    """
+    Интеграция Django без спанов на каждое middleware и сигнал: они заметно дороже
+    остальной трассировки (benchmarks/sentry_overhead.py), а разбивку времени запроса
+    дают SQL-спаны и сами представления.
+    """
+    return DjangoIntegration(middleware_spans=False, signals_spans=False)
+
+
+@functools.lru_cache(maxsize=2048)
+def _url_name(path: str):
+    try:
+        return resolve(path).url_name
+    except Resolver404:
+        return None
+
+
+def _request_path(sampling_context: dict):
+    environ = sampling_context.get('wsgi_environ')
+    if environ is not None:
+        return environ.get('PATH_INFO', '')
+    scope = sampling_context.get('asgi_scope')
+    if scope is not None:
+        path, root_path = scope.get('path', ''), scope.get('root_path', '')
+        return path[len(root_path):] if root_path and path.startswith(root_path) else path
+    return None
+
+
+def get_traces_sample_rate(path: str) -> float:
+    """
+    Доля трассируемых запросов для пути.
+
+    :param path: Путь запроса без SCRIPT_NAME.
+    :return: Доля от 0 до 1.
+    """
+    if path.startswith(tuple(settings.SENTRY_TRACES_IGNORED_PATHS)):
+        return 0.0
+    return settings.SENTRY_TRACES_SAMPLE_RATES.get(_url_name(path), settings.SENTRY_TRACES_SAMPLE_RATE)
+
+
+def traces_sampler(sampling_context: dict) -> float:
+    """
+    ``traces_sampler`` для ``sentry_sdk.init``.
+    """
+    path = _request_path(sampling_context)
+    if path is None:
+        # Транзакции вне HTTP-запросов, например команды управления
+        return settings.SENTRY_TRACES_SAMPLE_RATE
+    rate = get_traces_sample_rate(path)
+    parent_sampled = sampling_context.get('parent_sampled')
+    if rate and parent_sampled is not None:
+        return float(parent_sampled)
+    return rate
+
+
+def report_slow_request(request, response, duration: float) -> None:
+    """
+    Отправляет событие о запросе дольше ``SENTRY_SLOW_REQUEST_MS``.
+
+    :param request: Запрос.
+    :param response: Ответ.
+    :param duration: Длительность обработки в секундах.
+    """
+    threshold = settings.SENTRY_SLOW_REQUEST_MS
+    duration_ms = duration * 1000
+    if not threshold or duration_ms < threshold:
+        return
+
+    match = getattr(request, 'resolver_match', None)
+    url_name = match.url_name if match is not None else None
+    with sentry_sdk.new_scope() as scope:
+        scope.set_tag('url_name', url_name or '')
+        scope.set_tag('slow_request', True)
+        scope.set_context('timing', {
+            'duration_ms': round(duration_ms),
+            'threshold_ms': threshold,
+            'method': request.method,
+            'status': response.status_code,
+        })
+        # Одна группа событий на эндпоинт, а не на каждый путь с идентификаторами
+        scope.fingerprint = ['slow-request', url_name or request.path]
+        sentry_sdk.capture_message(f'Slow request: {request.method} {url_name or request.path}', level='warning')
+
+
+@sync_and_async_middleware
+def slow_request_middleware(get_response):
+    """
+    Middleware, измеряющее длительность запроса для ``report_slow_request``.
+    Ставится первым в MIDDLEWARE, чтобы учитывать время всех остальных слоев.
+    """
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            started = time.perf_counter()
+            response = await get_response(request)
+            report_slow_request(request, response, time.perf_counter() - started)
+            return response
+    else:
+        def middleware(request):
+            started = time.perf_counter()
+            response = get_response(request)
+            report_slow_request(request, response, time.perf_counter() - started)
+            return response
+    return middleware
@@ -9,6 +9,7 @@ https://docs.djangoproject.com/en/5.0/topics/settings/
 For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
+import json
 import logging.config
 import os
 import sys
@@ -16,21 +17,11 @@ import sentry_sdk
 from os import getenv
 from pathlib import Path
 
+from corsheaders.defaults import default_headers
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 
 
-sentry_sdk.init(
-    dsn="https://d250dbafc32afa0769139c6d081e4e63@o4505427216564224.ingest.us.sentry.io/4507769266700288",
-    # Set traces_sample_rate to 1.0 to capture 100%
-    # of transactions for performance monitoring.
-    traces_sample_rate=1.0,
-    # Set profiles_sample_rate to 1.0 to profile 100%
-    # of sampled transactions.
-    # We recommend adjusting this value in production.
-    profiles_sample_rate=1.0,
-)
-
-
 current_path = os.path.join('/'.join(os.path.abspath(__file__).split('/')[:-3]), '.env')
 load_dotenv(current_path)
 
@@ -82,6 +73,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Первыми, чтобы измерять полное время запроса (musicTrainee.timing, musicTrainee.sentry)
+    'musicTrainee.timing.request_timing_middleware',
+    'musicTrainee.sentry.slow_request_middleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -93,6 +87,9 @@ MIDDLEWARE = [
 ]
 
 CORS_ALLOW_ALL_ORIGINS = True
+# Заголовки загрузки файлов частями (catalog.uploads)
+CORS_ALLOW_HEADERS = (*default_headers, 'upload-offset', 'upload-chunk-sha256')
+CORS_EXPOSE_HEADERS = ['Upload-Offset', 'Server-Timing']
 
 ROOT_URLCONF = 'musicTrainee.urls'
 
@@ -177,19 +174,31 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'web/media/'
+# Медиа отдаются через musicApi.media: Django проверяет права, а файл отдает nginx из внутренней
+# локации по X-Accel-Redirect. С пустым префиксом файл отдает сам Django (разработка без nginx)
+MEDIA_ACCEL_REDIRECT_PREFIX = getenv('MEDIA_ACCEL_REDIRECT_PREFIX', '' if DEBUG else '/protected-media/')
+# Время кэширования в браузере файлов с хешем содержимого в имени, в секундах
+MEDIA_IMMUTABLE_MAX_AGE = int(getenv('MEDIA_IMMUTABLE_MAX_AGE', 365 * 24 * 60 * 60))
 
 # Добавление настроек для DRF.
 REST_FRAMEWORK = {
     # 'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
-    # 'PAGE_SIZE': 10,
+    # Списки курсов и заданий используют курсорную пагинацию из musicApi.pagination.
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # JWT без запроса пользователя к базе на каждый запрос (accounts.authentication)
+        'accounts.authentication.StatelessJWTAuthentication',
         'rest_framework.authentication.BasicAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
 }
 
+SIMPLE_JWT = {
+    # Роли пользователя в claims и проверка отзыва токенов при обновлении
+    'TOKEN_OBTAIN_SERIALIZER': 'accounts.serializers.AccountTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'accounts.serializers.AccountTokenRefreshSerializer',
+}
+
 # Добавление настроек для документации.
 SPECTACULAR_SETTINGS = {
     # название проекта
@@ -207,8 +216,47 @@ SPECTACULAR_SETTINGS = {
 
 AUTH_USER_MODEL = 'accounts.CustomAccount'
 
-# Настройка отправки почты
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+# Общий кэш воркеров. В production задается redis или memcached через CACHE_BACKEND и CACHE_LOCATION,
+# например django.core.cache.backends.redis.RedisCache и redis://redis:6379/1.
+# Файловый кэш по умолчанию только при DJANGO_DEBUG: он общий лишь для воркеров одного хоста,
+# а при переполнении удаляет часть записей, поэтому его размер (CACHE_MAX_ENTRIES) задается явно.
+# Перед общим кэшем в каждом процессе стоит ограниченный LRU из musicTrainee.cache.
+FILE_CACHE_BACKEND = 'django.core.cache.backends.filebased.FileBasedCache'
+CACHE_BACKEND = getenv('CACHE_BACKEND', FILE_CACHE_BACKEND if DEBUG else '')
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': getenv('CACHE_LOCATION', str(DATABASE_DIR / 'cache')),
+    }
+}
+if CACHE_BACKEND == FILE_CACHE_BACKEND:
+    CACHES['default']['OPTIONS'] = {'MAX_ENTRIES': int(getenv('CACHE_MAX_ENTRIES', 10000))}
+if 'test' in sys.argv:
+    CACHES['default'] = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+elif not CACHE_BACKEND:
+    raise ImproperlyConfigured('CACHE_BACKEND and CACHE_LOCATION must be set when DJANGO_DEBUG is off')
+
+CACHE_DEFAULT_TIMEOUT = int(getenv('CACHE_DEFAULT_TIMEOUT', 300))
+CACHE_LOCAL_TIMEOUT = int(getenv('CACHE_LOCAL_TIMEOUT', 30))
+CACHE_LOCAL_MAX_ENTRIES = int(getenv('CACHE_LOCAL_MAX_ENTRIES', 1024))
+
+# Время жизни кэша прав доступа к курсам (catalog.access), в секундах:
+# локальная копия в процессе и общая запись в кэше Django
+COURSE_ACCESS_LOCAL_TIMEOUT = int(getenv('COURSE_ACCESS_LOCAL_TIMEOUT', 30))
+COURSE_ACCESS_CACHE_TIMEOUT = int(getenv('COURSE_ACCESS_CACHE_TIMEOUT', 300))
+
+# Длительность аренды ответа из очереди проверки (catalog.reviews), в секундах
+REVIEW_LEASE_SECONDS = int(getenv('REVIEW_LEASE_SECONDS', 900))
+
+# Загрузка файлов частями (catalog.uploads): предельный размер файла и одной части в байтах,
+# время жизни незавершенной сессии в секундах
+UPLOAD_MAX_SIZE = int(getenv('UPLOAD_MAX_SIZE', 500 * 1024 * 1024))
+UPLOAD_CHUNK_MAX_SIZE = int(getenv('UPLOAD_CHUNK_MAX_SIZE', 8 * 1024 * 1024))
+UPLOAD_SESSION_TTL = int(getenv('UPLOAD_SESSION_TTL', 24 * 60 * 60))
+
+# Настройка отправки почты. Письма ставятся в очередь (accounts.outbox) и отправляются
+# командой send_outbox; для разработки бэкенд можно заменить на console или locmem
+EMAIL_BACKEND = getenv('EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
 EMAIL_HOST = 'smtp.yandex.ru'
 EMAIL_PORT = 465
 EMAIL_USE_TLS = False
@@ -220,8 +268,24 @@ EMAIL_HOST_PASSWORD = getenv('EMAIL_HOST_PASSWORD')
 EMAIL_SERVER = EMAIL_HOST_USER
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 EMAIL_ADMIN = EMAIL_HOST_USER
+EMAIL_TIMEOUT = int(getenv('EMAIL_TIMEOUT', 30))
+
+# Очередь писем: пауза перед повторным письмом того же вида на тот же адрес, число попыток,
+# начальная задержка повтора (удваивается) и время аренды письма отправителем, в секундах
+EMAIL_RESEND_COOLDOWN = int(getenv('EMAIL_RESEND_COOLDOWN', 60))
+OUTBOX_MAX_ATTEMPTS = int(getenv('OUTBOX_MAX_ATTEMPTS', 5))
+OUTBOX_RETRY_BASE_SECONDS = int(getenv('OUTBOX_RETRY_BASE_SECONDS', 30))
+OUTBOX_LEASE_SECONDS = int(getenv('OUTBOX_LEASE_SECONDS', 300))
+# Сколько хранить отправленные и неудачные письма (удаляет purge_reset_codes), в секундах
+OUTBOX_RETENTION_SECONDS = int(getenv('OUTBOX_RETENTION_SECONDS', 7 * 24 * 60 * 60))
+
+# Время действия кодов подтверждения почты и сброса пароля, в секундах
+CONFIRM_CODE_TTL = int(getenv('CONFIRM_CODE_TTL', 24 * 60 * 60))
+RESET_CODE_TTL = int(getenv('RESET_CODE_TTL', 15 * 60))
 
 LOGLEVEL = getenv('LOGLEVEL', 'INFO').upper()
+# Строки лога о каждом запросе (musicTrainee.timing) пишутся только при REQUEST_TIMING_LOGLEVEL=INFO
+REQUEST_TIMING_LOGLEVEL = getenv('REQUEST_TIMING_LOGLEVEL', 'WARNING').upper()
 
 logging.config.dictConfig({
     "version": 1,
@@ -243,8 +307,71 @@ logging.config.dictConfig({
             "handlers": [
                 "console"
             ]
+        },
+        "musicTrainee.timing": {
+            "level": REQUEST_TIMING_LOGLEVEL,
+            "handlers": [
+                "console"
+            ],
+            "propagate": False
         }
     }
 })
 
+# Мониторинг Sentry (musicTrainee.sentry). DSN задается только окружением; без него отправка отключена.
+SENTRY_DSN = getenv('SENTRY_DSN', '')
+SENTRY_ENVIRONMENT = getenv('SENTRY_ENVIRONMENT', 'development' if DEBUG else 'production')
+# Доля трассируемых запросов: по умолчанию и по имени URL. JSON из SENTRY_TRACES_SAMPLE_RATES
+# дополняет словарь, например {"catalog": 0.005}
+SENTRY_TRACES_SAMPLE_RATE = float(getenv('SENTRY_TRACES_SAMPLE_RATE', 0.05))
+SENTRY_TRACES_SAMPLE_RATES = {
+    # Частые запросы на чтение
+    'catalog': 0.01,
+    'catalog-detail': 0.01,
+    'my-courses': 0.01,
+    'my-course-lesson': 0.01,
+    'my-course-content': 0.01,
+    'upload-session': 0.01,
+    'token_refresh': 0.01,
+    # Редкие операции записи
+    'sing-up': 0.5,
+    'sing-up-confirm': 0.5,
+    'reset-request-password': 0.5,
+    'reset-confirm-password': 0.5,
+    'upload-complete': 0.5,
+    'reviews-bulk': 0.5,
+    # Служебные
+    'media': 0.0,
+    'schema': 0.0,
+    'swagger': 0.0,
+    **json.loads(getenv('SENTRY_TRACES_SAMPLE_RATES', '{}')),
+}
+# Пути без трассировки: статика, медиа и проверки здоровья
+SENTRY_TRACES_IGNORED_PATHS = ('/static/', '/media/', '/favicon.ico', '/health', '/metrics')
+# Доля профилируемых транзакций среди трассируемых
+SENTRY_PROFILES_SAMPLE_RATE = float(getenv('SENTRY_PROFILES_SAMPLE_RATE', 0.1))
+# Запросы дольше порога (мс) отправляются событием, даже если не попали в выборку; 0 отключает
+SENTRY_SLOW_REQUEST_MS = int(getenv('SENTRY_SLOW_REQUEST_MS', 2000))
+
+if SENTRY_DSN:
+    from musicTrainee.sentry import django_integration, traces_sampler
+
+    sentry_sdk.init(
+        dsn=SENTRY_DSN,
+        environment=SENTRY_ENVIRONMENT,
+        integrations=[django_integration()],
+        # Ошибки отправляются все, трассировки - по traces_sampler
+        sample_rate=1.0,
+        traces_sampler=traces_sampler,
+        profiles_sample_rate=SENTRY_PROFILES_SAMPLE_RATE,
+    )
+
+# Время этапов запроса (musicTrainee.timing): доля запросов, для которых собираются отпечатки SQL,
+# и число самых медленных из них, хранимых в памяти процесса
+REQUEST_TIMING_SAMPLE_RATE = float(getenv('REQUEST_TIMING_SAMPLE_RATE', 0.1))
+REQUEST_TIMING_SLOW_BUFFER = int(getenv('REQUEST_TIMING_SLOW_BUFFER', 50))
+
+# Токен для /metrics (заголовок Authorization: Bearer <токен>); без него /metrics доступен только при DEBUG
+METRICS_TOKEN = getenv('METRICS_TOKEN', '')
+
 IS_DEV_SERVER = 'runserver' in sys.argv
@@ -0,0 +1,259 @@
+import threading
+import time
+
+import sentry_sdk
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import resolve
+from sentry_sdk.transport import Transport
+
+from catalog.testing import api_client, create_user
+from musicTrainee.cache import LocalLRUCache, TwoTierCache, bump_generation, clear_local_caches
+from musicTrainee.sentry import slow_request_middleware, traces_sampler
+from musicTrainee.timing import SlowRequestBuffer, slow_requests
+
+
+class TwoTierCacheTests(SimpleTestCase):
+    """
+    Двухуровневый кэш (musicTrainee.cache) поверх LocMemCache тестов.
+    """
+
+    def setUp(self):
+        clear_local_caches()
+        cache.clear()
+
+    def counting(self, value='value', delay: float = 0):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(delay)
+            return f'{value}-{len(calls)}'
+
+        return compute, calls
+
+    def test_generation_bump_invalidates_scope(self):
+        two_tier = TwoTierCache('test-generations')
+        compute, calls = self.counting()
+        self.assertEqual(two_tier.get_or_set('course', compute, scopes=['course:a']), 'value-1')
+        self.assertEqual(two_tier.get_or_set('course', compute, scopes=['course:a']), 'value-1')
+        self.assertEqual(two_tier.get_or_set('other', compute, scopes=['course:b']), 'value-2')
+
+        bump_generation('course:a')
+        self.assertEqual(two_tier.get_or_set('course', compute, scopes=['course:a']), 'value-3')
+        # Ключи других областей не сбрасываются
+        self.assertEqual(two_tier.get_or_set('other', compute, scopes=['course:b']), 'value-2')
+        self.assertEqual(len(calls), 3)
+
+    def test_single_flight_between_threads(self):
+        two_tier = TwoTierCache('test-threads')
+        compute, calls = self.counting(delay=0.1)
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(two_tier.get_or_set('key', compute)))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['value-1'] * 8)
+        self.assertEqual(two_tier.stats['coalesced'], 7)
+
+    def test_waits_for_other_worker(self):
+        two_tier = TwoTierCache('test-workers')
+        two_tier.wait_interval = 0.01
+        compute, calls = self.counting()
+        full_key = two_tier.make_key('key')
+        # Значение вычисляет другой воркер: ключ-блокировка занят, результат появится позже
+        cache.add(f'{full_key}:lock', 1, two_tier.lock_timeout)
+        timer = threading.Timer(0.1, lambda: cache.set(full_key, 'from-worker'))
+        timer.start()
+        try:
+            self.assertEqual(two_tier.get_or_set('key', compute), 'from-worker')
+        finally:
+            timer.join()
+        self.assertEqual(calls, [])
+        self.assertEqual(two_tier.stats['waits'], 1)
+
+    def test_local_lru_bound(self):
+        local = LocalLRUCache(max_entries=2)
+        local.set('a', 1, 60)
+        local.set('b', 2, 60)
+        self.assertEqual(local.get('a'), 1)
+        local.set('c', 3, 60)
+        # Вытесняется давно не использованная запись
+        self.assertEqual((local.get('a'), local.get('c')), (1, 3))
+        self.assertNotIn('b', local._data)
+
+        local.set('expired', 4, 0.01)
+        time.sleep(0.02)
+        local.get('expired')
+        self.assertNotIn('expired', local._data)
+
+    @override_settings(CACHE_LOCAL_MAX_ENTRIES=3)
+    def test_local_tier_bounded_by_setting(self):
+        two_tier = TwoTierCache('test-bounded')
+        for index in range(10):
+            two_tier.set(index, index)
+        self.assertEqual(len(two_tier.local._data), 3)
+        # Вытесненные из процесса записи читаются из общего кэша
+        self.assertEqual(two_tier.get(0), 0)
+        self.assertEqual(two_tier.stats['shared_hits'], 1)
+
+
+class RecordingTransport(Transport):
+    """
+    Транспорт Sentry, сохраняющий события в памяти вместо отправки.
+    """
+
+    def __init__(self, options=None):
+        super().__init__(options)
+        self.events = []
+
+    def capture_envelope(self, envelope):
+        event = envelope.get_event()
+        if event is not None:
+            self.events.append(event)
+
+
+@override_settings(
+    SENTRY_TRACES_SAMPLE_RATE=0.05,
+    SENTRY_TRACES_SAMPLE_RATES={'catalog': 0.01, 'sing-up': 0.5},
+)
+class TracesSamplerTests(SimpleTestCase):
+    """
+    Выборка трассировок Sentry (musicTrainee.sentry.traces_sampler).
+    """
+
+    def sample(self, path: str, parent_sampled=None, asgi: bool = False) -> float:
+        if asgi:
+            context = {'asgi_scope': {'type': 'http', 'path': path, 'root_path': ''}}
+        else:
+            context = {'wsgi_environ': {'PATH_INFO': path}}
+        return traces_sampler({**context, 'parent_sampled': parent_sampled})
+
+    def test_rate_by_url_name(self):
+        self.assertEqual(self.sample('/api/catalog/'), 0.01)
+        self.assertEqual(self.sample('/api/auth/signup/', asgi=True), 0.5)
+        # Маршрут без своей доли и неизвестный путь получают долю по умолчанию
+        self.assertEqual(self.sample('/api/mycourses/'), 0.05)
+        self.assertEqual(self.sample('/missing/'), 0.05)
+        # Транзакции вне HTTP-запросов
+        self.assertEqual(traces_sampler({}), 0.05)
+
+    def test_ignored_paths_not_traced(self):
+        for path in ('/static/app.css', '/media/courses/1.png', '/favicon.ico', '/metrics'):
+            self.assertEqual(self.sample(path), 0.0, path)
+            # Решение вышестоящего сервиса для них не учитывается
+            self.assertEqual(self.sample(path, parent_sampled=True), 0.0, path)
+
+    def test_parent_sampled_passthrough(self):
+        self.assertEqual(self.sample('/api/catalog/', parent_sampled=True), 1.0)
+        self.assertEqual(self.sample('/api/auth/signup/', parent_sampled=False), 0.0)
+
+
+class SlowRequestMiddlewareTests(SimpleTestCase):
+    """
+    События о медленных запросах (musicTrainee.sentry.slow_request_middleware).
+    """
+
+    def setUp(self):
+        self.transport = RecordingTransport()
+        # Клиент с транспортом в памяти действует только внутри изолированной области теста
+        isolation_scope = sentry_sdk.isolation_scope()
+        scope = isolation_scope.__enter__()
+        self.addCleanup(isolation_scope.__exit__, None, None, None)
+        scope.set_client(sentry_sdk.Client(dsn='https://key@sentry.invalid/1', transport=self.transport))
+
+    def request(self, delay: float, asynchronous: bool = False):
+        request = RequestFactory().get('/api/catalog/')
+        request.resolver_match = resolve('/api/catalog/')
+
+        def get_response(request):
+            time.sleep(delay)
+            return HttpResponse(status=200)
+
+        async def aget_response(request):
+            return get_response(request)
+
+        if asynchronous:
+            return async_to_sync(slow_request_middleware(aget_response))(request)
+        return slow_request_middleware(get_response)(request)
+
+    @override_settings(SENTRY_SLOW_REQUEST_MS=10)
+    def test_slow_request_reported(self):
+        self.assertEqual(self.request(0.02).status_code, 200)
+        self.request(0.02, asynchronous=True)
+        sentry_sdk.flush()
+
+        self.assertEqual(len(self.transport.events), 2)
+        event = self.transport.events[0]
+        self.assertEqual(event['message'], 'Slow request: GET catalog')
+        self.assertEqual(event['tags']['url_name'], 'catalog')
+        self.assertEqual(event['fingerprint'], ['slow-request', 'catalog'])
+        self.assertGreaterEqual(event['contexts']['timing']['duration_ms'], 10)
+        self.assertEqual(event['contexts']['timing']['status'], 200)
+
+    @override_settings(SENTRY_SLOW_REQUEST_MS=10_000)
+    def test_fast_request_not_reported(self):
+        self.request(0)
+        self.request(0, asynchronous=True)
+        sentry_sdk.flush()
+        self.assertEqual(self.transport.events, [])
+
+    @override_settings(SENTRY_SLOW_REQUEST_MS=0)
+    def test_zero_threshold_disables(self):
+        self.request(0.02)
+        sentry_sdk.flush()
+        self.assertEqual(self.transport.events, [])
+
+
+class RequestTimingTests(TestCase):
+    """
+    Время этапов запроса (musicTrainee.timing).
+    """
+
+    def setUp(self):
+        clear_local_caches()
+        cache.clear()
+        slow_requests.clear()
+        self.addCleanup(slow_requests.clear)
+        self.client = api_client(create_user('student'))
+
+    @override_settings(REQUEST_TIMING_SAMPLE_RATE=0)
+    def test_server_timing_header(self):
+        response = self.client.get('/api/catalog/')
+        self.assertEqual(response.status_code, 200)
+        stages = dict(part.split(';', 1) for part in response['Server-Timing'].split(', '))
+        self.assertIn('db', stages)
+        self.assertIn('queries"', stages['db'])
+        self.assertIn('serialize', stages)
+        self.assertIn('total', stages)
+        # Без выборки отпечатки SQL не собираются
+        self.assertEqual(slow_requests.items(), [])
+
+    @override_settings(REQUEST_TIMING_SAMPLE_RATE=1)
+    def test_sampled_request_recorded(self):
+        self.client.get('/api/catalog/')
+        self.client.get('/api/catalog/missing/')
+        entries = slow_requests.items()
+        self.assertEqual({entry['url_name'] for entry in entries}, {'catalog', 'catalog-detail'})
+        entry = next(entry for entry in entries if entry['url_name'] == 'catalog')
+        self.assertEqual((entry['method'], entry['path'], entry['status']), ('GET', '/api/catalog/', 200))
+        self.assertGreater(entry['db_queries'], 0)
+        self.assertEqual(sum(query['count'] for query in entry['queries']), entry['db_queries'])
+        self.assertEqual(set(entry['stages_ms']), {'db', 'serialize', 'render', 'storage', 'smtp'})
+        self.assertTrue(all(query['fingerprint'].startswith('SELECT') for query in entry['queries']))
+
+    def test_buffer_keeps_slowest(self):
+        buffer = SlowRequestBuffer(size=2)
+        for duration in (0.3, 0.1, 0.5, 0.2):
+            buffer.add(duration, {'total': duration})
+        self.assertEqual(buffer.items(), [{'total': 0.5}, {'total': 0.3}])
+        buffer.clear()
+        self.assertEqual(buffer.items(), [])
@@ -0,0 +1,273 @@
+"""
+Время обработки запроса по этапам.
+
+``request_timing_middleware`` создает для запроса RequestTimings в contextvar, этапы
+добавляют в него время:
+
+* db - все SQL-запросы. Обертка ставится в ``execute_wrappers`` каждого соединения
+  при его создании, поэтому учитываются и запросы асинхронного ORM из других потоков;
+* serialize и render - свойства ``data`` сериализаторов DRF и ``rendered_content``
+  ответов DRF (``instrument_drf`` в MusicapiConfig.ready);
+* storage - файлы хранилища catalog.storage и загрузок catalog.uploads;
+* smtp - отправка писем (accounts.outbox).
+
+Итоги отдаются заголовком ``Server-Timing``, строкой лога в формате logfmt
+(логгер ``musicTrainee.timing`` уровня INFO, включается ``REQUEST_TIMING_LOGLEVEL``)
+с именем URL и метриками musicTrainee.metrics. Для доли ``REQUEST_TIMING_SAMPLE_RATE``
+запросов собираются еще и отпечатки SQL: самые медленные из таких запросов хранятся в
+памяти процесса (``REQUEST_TIMING_SLOW_BUFFER`` записей) и доступны персоналу через API.
+"""
+
+import contextlib
+import contextvars
+import functools
+import heapq
+import itertools
+import logging
+import random
+import re
+import threading
+import time
+from collections import Counter
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.decorators import sync_and_async_middleware
+
+from musicTrainee import metrics
+
+logger = logging.getLogger(__name__)
+
+STAGES = ('db', 'serialize', 'render', 'storage', 'smtp')
+FINGERPRINT_MAX_LENGTH = 500
+SLOW_REQUEST_QUERIES = 10
+
+_current = contextvars.ContextVar('request_timings', default=None)
+
+_COLUMNS_RE = re.compile(r'^SELECT (DISTINCT )?.+? FROM ', re.DOTALL)
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+\b')
+_IN_LIST_RE = re.compile(r'\((?:\s*%s\s*,)+\s*%s\s*\)')
+_SPACE_RE = re.compile(r'\s+')
+
+
+@functools.lru_cache(maxsize=1024)
+def sql_fingerprint(sql: str) -> str:
+    """
+    Отпечаток SQL: список столбцов SELECT свернут, литералы заменены на ``?``,
+    списки IN любой длины совпадают.
+    """
+    sql = _COLUMNS_RE.sub(r'SELECT \1... FROM ', sql)
+    sql = _STRING_RE.sub('?', sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    sql = _IN_LIST_RE.sub('(...)', sql)
+    return _SPACE_RE.sub(' ', sql).strip()[:FINGERPRINT_MAX_LENGTH]
+
+
+class RequestTimings:
+    """
+    Время этапов одного запроса в секундах.
+
+    :param sample_sql: Собирать отпечатки SQL.
+    """
+
+    def __init__(self, sample_sql: bool = False):
+        self.durations = dict.fromkeys(STAGES, 0.0)
+        self.db_queries = 0
+        self.sample_sql = sample_sql
+        self.queries = {}
+        self.depth = Counter()
+
+    def add_query(self, sql: str, duration: float) -> None:
+        self.db_queries += 1
+        self.durations['db'] += duration
+        if self.sample_sql:
+            stats = self.queries.setdefault(sql_fingerprint(sql), [0, 0.0])
+            stats[0] += 1
+            stats[1] += duration
+
+    def top_queries(self, limit: int = SLOW_REQUEST_QUERIES) -> list:
+        ordered = sorted(self.queries.items(), key=lambda item: item[1][1], reverse=True)[:limit]
+        return [
+            {'fingerprint': fingerprint, 'count': count, 'total_ms': round(duration * 1000, 2)}
+            for fingerprint, (count, duration) in ordered
+        ]
+
+
+def get_current_timings():
+    """
+    RequestTimings текущего запроса или None вне запроса.
+    """
+    return _current.get()
+
+
+@contextlib.contextmanager
+def timed(stage: str):
+    """
+    Добавляет время блока к этапу текущего запроса. Вложенные блоки того же этапа
+    не считаются повторно; вне запроса ничего не измеряется.
+    """
+    timings = _current.get()
+    if timings is None or timings.depth[stage]:
+        yield
+        return
+    timings.depth[stage] += 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.durations[stage] += time.perf_counter() - started
+        timings.depth[stage] -= 1
+
+
+def _record_query(execute, sql, params, many, context):
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.add_query(sql, time.perf_counter() - started)
+
+
+@receiver(connection_created)
+def install_query_timer(sender, connection, **kwargs):
+    # Объект соединения переживает переподключения, обертка ставится один раз
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+def _wrap_property(cls, name: str, stage: str) -> None:
+    getter = cls.__dict__[name].fget
+    if getattr(getter, 'timed_stage', None):
+        return
+
+    @functools.wraps(getter)
+    def timed_getter(self):
+        with timed(stage):
+            return getter(self)
+
+    timed_getter.timed_stage = stage
+    setattr(cls, name, property(timed_getter))
+
+
+def instrument_drf() -> None:
+    """
+    Подключает этапы serialize и render к DRF. Повторный вызов ничего не меняет.
+    """
+    from rest_framework import serializers
+    from rest_framework.response import Response
+
+    for serializer_class in (serializers.BaseSerializer, serializers.Serializer, serializers.ListSerializer):
+        _wrap_property(serializer_class, 'data', 'serialize')
+    _wrap_property(Response, 'rendered_content', 'render')
+
+
+class SlowRequestBuffer:
+    """
+    Самые медленные запросы процесса из тех, для которых собирались отпечатки SQL.
+
+    :param size: Число хранимых запросов.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self._heap = []
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def add(self, duration: float, entry: dict) -> None:
+        item = (duration, next(self._counter), entry)
+        with self._lock:
+            if len(self._heap) < self.size:
+                heapq.heappush(self._heap, item)
+            elif duration > self._heap[0][0]:
+                heapq.heapreplace(self._heap, item)
+
+    def items(self) -> list:
+        with self._lock:
+            return [entry for _, _, entry in sorted(self._heap, key=lambda item: item[0], reverse=True)]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._heap.clear()
+
+
+slow_requests = SlowRequestBuffer(getattr(settings, 'REQUEST_TIMING_SLOW_BUFFER', 50))
+
+
+def _server_timing(timings: RequestTimings, total: float) -> str:
+    parts = [f'db;dur={timings.durations["db"] * 1000:.2f};desc="{timings.db_queries} queries"']
+    for stage in STAGES[1:]:
+        if timings.durations[stage]:
+            parts.append(f'{stage};dur={timings.durations[stage] * 1000:.2f}')
+    parts.append(f'total;dur={total * 1000:.2f}')
+    return ', '.join(parts)
+
+
+def _finish(request, response, timings: RequestTimings, total: float) -> None:
+    response['Server-Timing'] = _server_timing(timings, total)
+
+    match = getattr(request, 'resolver_match', None)
+    url_name = (match.url_name if match is not None else None) or '-'
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(
+            'url_name=%s method=%s status=%s total_ms=%.1f db_queries=%d %s',
+            url_name, request.method, response.status_code, total * 1000, timings.db_queries,
+            ' '.join(f'{stage}_ms={timings.durations[stage] * 1000:.1f}' for stage in STAGES),
+        )
+
+    metrics.observe_request(
+        url_name, request.method, response.status_code, total, timings.db_queries, timings.durations['db'],
+    )
+
+    if timings.sample_sql:
+        slow_requests.add(total, {
+            'url_name': url_name,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 2),
+            'db_queries': timings.db_queries,
+            'stages_ms': {stage: round(duration * 1000, 2) for stage, duration in timings.durations.items()},
+            'queries': timings.top_queries(),
+            'at': timezone.now().isoformat(),
+        })
+
+
+@sync_and_async_middleware
+def request_timing_middleware(get_response):
+    """
+    Middleware измерения этапов запроса. Ставится первым в MIDDLEWARE.
+    """
+    def start():
+        sample_sql = random.random() < getattr(settings, 'REQUEST_TIMING_SAMPLE_RATE', 0.1)
+        timings = RequestTimings(sample_sql)
+        metrics.request_started()
+        return timings, _current.set(timings), time.perf_counter()
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            timings, token, started = start()
+            try:
+                response = await get_response(request)
+            finally:
+                _current.reset(token)
+                metrics.request_finished()
+            _finish(request, response, timings, time.perf_counter() - started)
+            return response
+    else:
+        def middleware(request):
+            timings, token, started = start()
+            try:
+                response = get_response(request)
+            finally:
+                _current.reset(token)
+                metrics.request_finished()
+            _finish(request, response, timings, time.perf_counter() - started)
+            return response
+    return middleware